@@ -0,0 +1,235 @@
+import os, re, json, time, logging, threading, unicodedata
+from array import array
+import numpy as np
+from structured_log import fields
+
+# Fuzzy name search over the Steam app list. Names are normalized (accents, case and punctuation
+# dropped) and split in trigrams; a query scores the apps sharing its trigrams by Jaccard similarity,
+# then the best candidates get a bonus for an exact, prefix or whole-word match.
+#
+# The index is a directory of immutable segments, each holding app ids, names and an inverted index
+# (sorted trigram keys, posting offsets, postings) in flat files read through memory maps.
+# segments.json lists them, oldest first. update() only writes the apps that are new or renamed
+# since the last update as a new segment, an app id of a newer segment hiding the one of older
+# segments; segments are merged back into one when there are too many or the new ones get large.
+#
+#   index = AppSearchIndex("steam_app_index")
+#   index.update(steam_api.iter_app_list())
+#   index.search("half life 2")      # [{"appid": 220, "name": "Half-Life 2", "score": 2.0}, ...]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = "steam_app_index"
+# The app list is downloaded again when the index is older than this, on the next name lookup
+MAX_AGE = 7 * 24 * 3600
+MAX_SEGMENTS = 8
+MERGE_RATIO = 0.2
+CANDIDATES = 50
+MIN_SCORE = 0.3
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+def normalize(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).casefold()
+    return _SEPARATORS.sub(" ", name).strip()
+
+def trigrams(normalized: str) -> set[int]:
+    # Padded so the start of the name and of the query weigh more. A trigram is its three code points
+    # packed in 63 bits
+    s = f"  {normalized} "
+    return {(ord(s[i]) << 42) | (ord(s[i + 1]) << 21) | ord(s[i + 2]) for i in range(len(s) - 2)}
+
+
+class Segment():
+    FILES = {"appids": np.int32, "sizes": np.int16, "name_offsets": np.int64, "names": np.uint8,
+             "trigrams": np.int64, "posting_offsets": np.int64, "postings": np.int32}
+
+    def __init__(self, path: str, name: str) -> None:
+        self.name = name
+        for f, dtype in self.FILES.items():
+            setattr(self, f, np.memmap(Segment._fn(path, name, f), dtype=dtype, mode="r"))
+        self.live = np.ones(len(self.appids), dtype=bool)
+
+    def _fn(path: str, name: str, f: str) -> str:
+        return os.path.join(path, f"{name}.{f}")
+
+    def write(path: str, name: str, apps: list[tuple[int, str]]) -> None:
+        keys = array("q")
+        rows = array("i")
+        sizes = array("h")
+        for row, (_, app_name) in enumerate(apps):
+            t = trigrams(normalize(app_name))
+            keys.extend(t)
+            rows.extend([row] * len(t))
+            sizes.append(min(len(t), 32767))
+        keys = np.frombuffer(keys, dtype=np.int64)
+        rows = np.frombuffer(rows, dtype=np.int32)
+        order = np.lexsort((rows, keys))
+        keys = keys[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        encoded = [n.encode("utf_8") for _, n in apps]
+        columns = {
+            "appids": np.array([a for a, _ in apps], dtype=np.int32),
+            "sizes": np.frombuffer(sizes, dtype=np.int16),
+            "name_offsets": np.concatenate([[0], np.cumsum([len(e) for e in encoded])]).astype(np.int64),
+            "names": np.frombuffer(b"".join(encoded) or b"\0", dtype=np.uint8),
+            "trigrams": unique_keys,
+            "posting_offsets": np.append(starts, len(keys)).astype(np.int64),
+            "postings": rows[order]
+        }
+        for f, values in columns.items():
+            values.astype(Segment.FILES[f]).tofile(Segment._fn(path, name, f))
+
+    def remove(path: str, name: str) -> None:
+        for f in Segment.FILES:
+            fn = Segment._fn(path, name, f)
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    def __len__(self) -> int:
+        return len(self.appids)
+
+    def app_name(self, row: int) -> str:
+        return bytes(self.names[self.name_offsets[row]:self.name_offsets[row + 1]]).decode("utf_8")
+
+    def candidates(self, keys: np.ndarray, limit: int) -> list[tuple[float, int]]:
+        # (Jaccard similarity, row) of the best live rows sharing trigrams with the query
+        idx = np.searchsorted(self.trigrams, keys)
+        found = idx < len(self.trigrams)
+        found[found] = self.trigrams[idx[found]] == keys[found]
+        idx = idx[found]
+        if not len(idx):
+            return []
+        postings = np.concatenate([self.postings[self.posting_offsets[i]:self.posting_offsets[i + 1]] for i in idx])
+        shared = np.bincount(postings, minlength=len(self.appids))
+        shared[~self.live] = 0
+        rows = np.flatnonzero(shared)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-shared[rows] / (len(keys) + self.sizes[rows] - shared[rows]), limit)[:limit]]
+        similarity = shared[rows] / (len(keys) + self.sizes[rows] - shared[rows])
+        return list(zip(similarity.tolist(), rows.tolist()))
+
+    def live_apps(self) -> dict[int, str]:
+        return {int(self.appids[row]): self.app_name(row) for row in np.flatnonzero(self.live)}
+
+
+class AppSearchIndex():
+    MANIFEST_FN = "segments.json"
+
+    def __init__(self, path: str = DEFAULT_PATH) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self.updated_at = None
+        self.next_segment = 1
+        self.segments = []
+        self._load()
+
+    def _load(self) -> None:
+        manifest_fn = os.path.join(self.path, self.MANIFEST_FN)
+        if not os.path.exists(manifest_fn):
+            return
+        with open(manifest_fn, mode="r", encoding="utf_8") as f:
+            manifest = json.load(f)
+        self.updated_at = manifest["updated_at"]
+        self.next_segment = manifest["next_segment"]
+        self.segments = [Segment(self.path, name) for name in manifest["segments"]]
+        # The newest segment that has an app id holds its current name
+        seen = np.empty(0, dtype=np.int32)
+        for s in reversed(self.segments):
+            s.live = ~np.isin(s.appids, seen)
+            seen = np.concatenate([seen, s.appids])
+
+    def _save_manifest(self, segment_names: list[str]) -> None:
+        manifest_fn = os.path.join(self.path, self.MANIFEST_FN)
+        with open(manifest_fn + ".tmp", mode="w", encoding="utf_8") as f:
+            json.dump({"updated_at": self.updated_at, "next_segment": self.next_segment, "segments": segment_names}, f)
+        os.replace(manifest_fn + ".tmp", manifest_fn)
+
+    def __len__(self) -> int:
+        return sum(int(s.live.sum()) for s in self.segments)
+
+    def is_stale(self, max_age: float = MAX_AGE) -> bool:
+        return self.updated_at is None or time.time() - self.updated_at > max_age
+
+    def update(self, stubs) -> int:
+        # stubs: the SteamAppStub of the whole app list. Returns how many apps were new or renamed
+        with self.lock:
+            current = {}
+            for s in self.segments:
+                current.update(s.live_apps())
+            changed = {}
+            for stub in stubs:
+                if current.get(stub.appid) != stub.name:
+                    changed[stub.appid] = stub.name
+
+            old_names = [s.name for s in self.segments]
+            names = old_names
+            if changed:
+                name = f"segment_{self.next_segment:06}"
+                self.next_segment = self.next_segment + 1
+                if len(old_names) + 1 > MAX_SEGMENTS or len(changed) > MERGE_RATIO * len(current):
+                    current.update(changed)
+                    Segment.write(self.path, name, sorted(current.items()))
+                    names = [name]
+                else:
+                    Segment.write(self.path, name, sorted(changed.items()))
+                    names = old_names + [name]
+            self.updated_at = time.time()
+            self._save_manifest(names)
+            if changed:
+                self.segments = []
+                self._load()
+                for name in set(old_names) - set(names):
+                    try:
+                        Segment.remove(self.path, name)
+                    except OSError:
+                        # Still mapped by another process (Windows), the files are left behind
+                        logger.debug(f"Could not remove merged segment {name}")
+
+        logger.info(f"Steam app index updated, {len(changed)} new or renamed apps", extra=fields(changed=len(changed), segments=len(self.segments)))
+        return len(changed)
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        q = normalize(query)
+        if not q:
+            return []
+        keys = np.array(sorted(trigrams(q)), dtype=np.int64)
+        with self.lock:
+            candidates = [(similarity, s, row) for s in self.segments for similarity, row in s.candidates(keys, CANDIDATES)]
+            candidates.sort(key=lambda c: -c[0])
+            results = []
+            for similarity, s, row in candidates[:CANDIDATES]:
+                name = s.app_name(row)
+                n = normalize(name)
+                score = similarity
+                if n == q:
+                    score = score + 1
+                elif n.startswith(q + " "):
+                    score = score + 0.5
+                elif f" {q} " in f" {n} ":
+                    score = score + 0.25
+                results.append({"appid": int(s.appids[row]), "name": name, "score": round(score, 3)})
+        results.sort(key=lambda r: (-r["score"], len(r["name"]), r["appid"]))
+        return results[:limit]
+
+    def resolve(self, text: str) -> tuple[int, str | None]:
+        # An app id as is, or the best match of a name
+        text = str(text).strip()
+        if text.isdigit():
+            return (int(text), None)
+        results = self.search(text, 1)
+        if not results or results[0]["score"] < MIN_SCORE:
+            raise Exception(f"No Steam app matches \"{text}\"")
+        return (results[0]["appid"], results[0]["name"])
+
+
+def open_index(path: str = DEFAULT_PATH, refresh: bool = False) -> AppSearchIndex:
+    # Downloads the app list when the index is missing, stale or refresh is asked
+    index = AppSearchIndex(path)
+    if refresh or index.is_stale():
+        import steam_api
+        logger.info("Downloading the Steam app list to update the app index...")
+        index.update(steam_api.iter_app_list())
+    return index
@@ -0,0 +1,99 @@
+import os, sys, json, time, random, argparse, statistics, tempfile
+
+# Steam app name search benchmark: builds the index of a synthetic app list, reopens it, times fuzzy
+# queries (names with a typo, a missing word or other casing) and checks the right app comes first,
+# then times an incremental update with a share of new and renamed apps.
+#
+#   python benchmarks/app_search_queries.py [--apps 150000] [--queries 500] [--changed 1000]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from app_search import AppSearchIndex
+from steam_api import SteamAppStub
+from synthetic_catalog import generate_app_list
+
+def _typo(rng: random.Random, name: str) -> str:
+    match rng.randrange(4):
+        case 0:
+            i = rng.randrange(len(name))
+            return name[:i] + name[i + 1:]
+        case 1:
+            i = rng.randrange(len(name) - 1)
+            return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+        case 2:
+            return name.lower().replace(":", "").replace("-", "")
+        case _:
+            words = name.split()
+            return " ".join(words[:-1]) if len(words) > 2 else name.upper()
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=150000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--changed", type=int, default=1000, help="new and renamed apps of the incremental update")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app_list = generate_app_list(args.apps, seed=args.seed)
+    # Distinct names only, a query for a name several apps share has no single right answer
+    counts = {}
+    for a in app_list:
+        counts[a["name"]] = counts.get(a["name"], 0) + 1
+    targets = rng.sample([a for a in app_list if counts[a["name"]] == 1], args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        AppSearchIndex(tmp).update(SteamAppStub.from_json(a) for a in app_list)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = AppSearchIndex(tmp)
+        open_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        top1 = top5 = 0
+        for a in targets:
+            query = _typo(rng, a["name"])
+            start = time.perf_counter()
+            results = index.search(query, 5)
+            latencies.append((time.perf_counter() - start) * 1000)
+            appids = [r["appid"] for r in results]
+            top1 = top1 + (appids[:1] == [a["appid"]])
+            top5 = top5 + (a["appid"] in appids)
+
+        renamed = [dict(a, name=a["name"] + " Renamed") for a in rng.sample(app_list, args.changed // 2)]
+        added = generate_app_list(args.changed - len(renamed), seed=args.seed + 1, first_appid=app_list[-1]["appid"] + 10)
+        updated = {a["appid"]: a for a in app_list + renamed + added}
+        start = time.perf_counter()
+        changed = index.update(SteamAppStub.from_json(a) for a in updated.values())
+        update_s = time.perf_counter() - start
+        renamed_found = sum(1 for a in renamed[:50] if index.search(a["name"], 1)[0]["appid"] == a["appid"])
+
+    results = {
+        "apps": args.apps,
+        "build_s": build_s,
+        "open_ms": open_ms,
+        "query_p50_ms": statistics.median(latencies),
+        "query_p99_ms": sorted(latencies)[int(len(latencies) * 0.99)],
+        "top1": top1 / len(targets),
+        "top5": top5 / len(targets),
+        "update_changed": changed,
+        "update_s": update_s,
+        "renamed_found": renamed_found / min(50, len(renamed))
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{args.apps} apps: build {build_s:.2f} s, open {open_ms:.1f} ms")
+        print(f"{len(targets)} fuzzy queries: p50 {results['query_p50_ms']:.2f} ms, p99 {results['query_p99_ms']:.2f} ms, "
+              f"right app first {results['top1']:.0%}, in the top 5 {results['top5']:.0%}")
+        print(f"incremental update of {changed} apps: {update_s:.2f} s, renamed apps found by their new name {results['renamed_found']:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
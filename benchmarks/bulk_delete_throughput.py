@@ -0,0 +1,77 @@
+import os, sys, json, time, argparse, contextlib, io
+
+# Bulk delete benchmark: deletes the same SKUs from a fresh stand-in project one by one with delete_game
+# (one client per SKU, errors counted), then with delete_games (one catalog fetch, a pool of workers
+# under a shared rate limit, retries, verification pass). The stand-in answers 429 to a share of the
+# requests, which delete_game cannot recover from.
+#
+#   python benchmarks/bulk_delete_throughput.py [--skus 300] [--latency 0.02] [--error-rate 0.05] [--workers 8]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import xsolla_api, xsolla_tools, resilience
+from synthetic_catalog import generate_catalog
+from standin_servers import XsollaStandIn, StandInServer
+
+PROJECT_ID = 100000
+API_KEY = "standin_api_key"
+
+def _server(args) -> StandInServer:
+    catalog = generate_catalog(args.skus, seed=args.seed, num_bundles=0)
+    return StandInServer(XsollaStandIn(catalog, PROJECT_ID, API_KEY), latency=args.latency, error_rate=args.error_rate,
+                         retry_after=args.retry_after, seed=args.seed)
+
+def _one_by_one(args) -> dict:
+    resilience.reset()
+    with _server(args) as server:
+        xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+        skus = [g["sku"] for g in xsolla_api.XsollaProjectAPI(API_KEY, PROJECT_ID).get_games()]
+        server.reset_counters()
+        failed = 0
+        start = time.perf_counter()
+        for sku in skus:
+            try:
+                xsolla_tools.delete_game(API_KEY, PROJECT_ID, sku)
+            except Exception:
+                failed = failed + 1
+        return {"total_s": time.perf_counter() - start, "requests": server.requests, "throttled": server.throttled,
+                "failed": failed, "left": len(server.app.collections["games"])}
+
+def _bulk(args) -> dict:
+    resilience.reset()
+    with _server(args) as server:
+        xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+        start = time.perf_counter()
+        results = xsolla_tools.delete_games(API_KEY, PROJECT_ID, ["*"], workers=args.workers, rate=args.rate, verify=True)
+        return {"total_s": time.perf_counter() - start, "requests": server.requests, "throttled": server.throttled,
+                "failed": sum(1 for r in results if not r["ok"]), "left": len(server.app.collections["games"])}
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every stand-in response")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After of the 429 answers, in seconds")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=200, help="delete calls per second of the bulk delete")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    # The core logs every SKU, which would dominate the timings on a terminal
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {"delete_game, one by one": _one_by_one(args), "delete_games": _bulk(args)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name:24} total {r['total_s']:7.2f} s  {r['requests']:5} requests  {r['throttled']:4} throttled  "
+                  f"{r['failed']:4} failed  {r['left']:4} games left")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+import os, sys, json, argparse, subprocess, tempfile
+
+# Decode benchmark: a GetAppList-sized document and a catalog of item list pages, decoded with the
+# stdlib, with json_codec.loads (orjson/msgspec when installed) and with the streaming parser. Every
+# case runs in a fresh interpreter so the peak RSS of one does not hide the next.
+#
+#   python benchmarks/json_decode.py [--apps 200000] [--skus 5000]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+METHODS = ["stdlib", "codec", "stream"]
+PAGE_SIZE = 50
+
+CHILD = r"""
+import sys, time, json
+sys.path.insert(0, {root!r})
+import json_codec
+
+def peak_rss_kb():
+    # VmHWM is reset by exec, ru_maxrss is not and would report the parent's peak
+    try:
+        with open("/proc/self/status") as f:
+            return int(next(l for l in f if l.startswith("VmHWM:")).split()[1])
+    except (OSError, StopIteration):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return None
+
+method, fn, path = sys.argv[1], sys.argv[2], tuple(p for p in sys.argv[3].split(".") if p)
+files = fn.split(",")
+baseline = peak_rss_kb()
+start = time.perf_counter()
+records = 0
+for f in files:
+    if method == "stream":
+        with open(f, mode="rb") as fh:
+            for _ in json_codec.JsonArrayStream(iter(lambda: fh.read(json_codec.STREAM_CHUNK_SIZE), b""), path):
+                records = records + 1
+    else:
+        with open(f, mode="rb") as fh:
+            data = fh.read()
+        doc = json.loads(data) if method == "stdlib" else json_codec.loads(data)
+        for p in path:
+            doc = doc[p]
+        records = records + len(doc)
+        del doc, data
+elapsed = time.perf_counter() - start
+peak = peak_rss_kb()
+print(json.dumps({{"seconds": elapsed, "records": records, "peak_rss_mb": (peak - baseline) / 1024 if peak is not None else None, "backend": json_codec.BACKEND}}))
+"""
+
+def _run_case(method: str, files: list[str], path: str) -> dict:
+    r = subprocess.run([sys.executable, "-c", CHILD.format(root=ROOT), method, ",".join(files), path], capture_output=True, text=True)
+    if r.returncode != 0:
+        raise Exception(f"{method} failed:\n{r.stderr}")
+    return json.loads(r.stdout)
+
+def _write_payloads(tmp: str, apps: int, skus: int) -> dict[str, tuple[list[str], str]]:
+    from synthetic_catalog import generate_catalog, generate_steam_apps
+
+    _, app_list = generate_steam_apps(0, num_listed_apps=apps)
+    app_list_fn = os.path.join(tmp, "applist.json")
+    with open(app_list_fn, mode="w", encoding="utf_8") as f:
+        json.dump({"applist": {"apps": app_list}}, f)
+
+    games = generate_catalog(skus, num_bundles=0)["games"]
+    page_fns = []
+    for n in range(0, len(games), PAGE_SIZE):
+        fn = os.path.join(tmp, f"games_{n}.json")
+        with open(fn, mode="w", encoding="utf_8") as f:
+            json.dump({"has_more": n + PAGE_SIZE < len(games), "total_items_count": len(games), "items": games[n:n + PAGE_SIZE]}, f)
+        page_fns.append(fn)
+
+    return {"GetAppList": ([app_list_fn], "applist.apps"), "get_games pages": (page_fns, "items")}
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=200000, help="apps in the GetAppList document")
+    parser.add_argument("--skus", type=int, default=5000, help="games in the item list pages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for case, (files, path) in _write_payloads(tmp, args.apps, args.skus).items():
+            size_mb = sum(os.path.getsize(f) for f in files) / 1024 / 1024
+            for method in METHODS:
+                runs = [_run_case(method, files, path) for _ in range(args.repeat)]
+                best = min(runs, key=lambda r: r["seconds"])
+                results[f"{case}/{method}"] = dict(best, size_mb=size_mb, peak_rss_mb=max(r["peak_rss_mb"] or 0 for r in runs))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name:28} {r['size_mb']:7.1f} MB  {r['seconds'] * 1000:9.1f} ms  peak RSS +{r['peak_rss_mb']:7.1f} MB  {r['records']:8} records  ({r['backend']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import os, sys, json, time, random, argparse, tempfile
+
+# Price history benchmark: records daily snapshots of every app in every Steam currency (a share of
+# the prices changing each day), then times the queries the tools run against the store.
+#
+#   python benchmarks/price_history_queries.py [--apps 10000] [--days 30] [--change-rate 0.02]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+
+from price_history import PriceHistory
+from steam_api import CURRENCIES
+
+DAY = 86400
+START = 1_700_000_000
+
+def _time(fn, repeat: int) -> tuple[float, object]:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--change-rate", type=float, default=0.02, help="share of the prices that change each day")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    appids = [10000 + i * 10 for i in range(args.apps)]
+    prices = {a: {c: rng.randint(1, 5000) * 100 - 1 for c in CURRENCIES} for a in appids}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        history = PriceHistory(tmp)
+        start = time.perf_counter()
+        for day in range(args.days):
+            for a in appids:
+                if day > 0:
+                    for c in CURRENCIES:
+                        if rng.random() < args.change_rate:
+                            prices[a][c] = prices[a][c] + rng.choice((-1, 1)) * 500
+                history.record(a, prices[a], START + day * DAY)
+        results["record"] = {"seconds": time.perf_counter() - start, "rows": len(history)}
+
+        reopened = PriceHistory(tmp)
+        results["open + index"], _ = _time(lambda: PriceHistory(tmp).latest([appids[0]]), 1)
+        queries = {
+            "latest, all apps": lambda: reopened.latest(appids),
+            "latest, 1 app": lambda: reopened.latest_prices(appids[len(appids) // 2]),
+            "changes, last 7 days": lambda: reopened.changes_since(START + (args.days - 7) * DAY),
+            "changes, last 7 days, BRL": lambda: reopened.changes_since(START + (args.days - 7) * DAY, currencies=["BRL"]),
+            "last BRL change, 1 app": lambda: reopened.last_change(appids[-1], "BRL")
+        }
+        for name, fn in queries.items():
+            seconds, result = _time(fn, args.repeat)
+            results[name] = {"seconds": seconds, "rows": len(result) if hasattr(result, "__len__") else None}
+        size = sum(os.path.getsize(os.path.join(tmp, fn)) for fn in os.listdir(tmp))
+        results["size_mb"] = size / 1024 / 1024
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'record':28} {results['record']['seconds']:9.2f} s   {results['record']['rows']:9} rows  {results['size_mb']:.1f} MB on disk")
+        print(f"{'open + index':28} {results['open + index'] * 1000:9.2f} ms")
+        for name in queries:
+            r = results[name]
+            print(f"{name:28} {r['seconds'] * 1000:9.2f} ms  {r['rows'] if r['rows'] is not None else '':>9}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
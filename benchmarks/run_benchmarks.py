@@ -0,0 +1,170 @@
+import os, sys, csv, json, time, argparse, platform, statistics, subprocess, tempfile, contextlib, io
+
+# End-to-end benchmarks of the Xsolla and Steam flows against the local stand-in servers. Every run is
+# appended to results.jsonl and compared with the previous run that used the same parameters.
+#
+#   python benchmarks/run_benchmarks.py --skus 1000 --repeat 3 [--latency 0.02] [--fail-on-regression 20]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_FN = os.path.join(BENCHMARKS_DIR, "results.jsonl")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import steam_api, xsolla_api, xsolla_tools
+from synthetic_catalog import generate_catalog, generate_steam_apps
+from standin_servers import XsollaStandIn, SteamStandIn, StandInServer
+
+PROJECT_ID = 100000
+API_KEY = "standin_api_key"
+BENCHMARK_NAMES = ["get_games", "import_from_steam", "export_csv", "import_csv", "recalculate_bundle", "retrieve_pricing_per_appid", "mirror_catalog"]
+
+def _git_commit() -> str | None:
+    r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return r.stdout.strip() if r.returncode == 0 else None
+
+def _time_runs(fn, repeat: int, servers: list[StandInServer], setup=None) -> dict:
+    times = []
+    requests = []
+    for n in range(repeat):
+        if setup is not None:
+            setup(n)
+        for s in servers:
+            s.reset_counters()
+        # The core prints progress for every item, which would dominate the timings on a terminal
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn(n)
+            times.append(time.perf_counter() - start)
+        requests.append(sum(s.requests for s in servers))
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "requests": requests[-1],
+        "throttled": sum(s.throttled for s in servers),
+        "bytes": sum(s.bytes_sent for s in servers)
+    }
+
+def run(args) -> dict:
+    catalog = generate_catalog(args.skus, seed=args.seed)
+    # Apps past the catalog size are not in the project yet, import_from_steam uses those
+    apps, app_list = generate_steam_apps(args.skus + args.repeat, seed=args.seed)
+    new_appids = sorted(apps)[args.skus:]
+
+    xsolla = StandInServer(XsollaStandIn(catalog, PROJECT_ID, API_KEY, default_limit=args.page_limit, max_limit=args.page_limit),
+                           latency=args.latency, latency_jitter=args.latency_jitter, error_rate=args.error_rate, seed=args.seed)
+    steam = StandInServer(SteamStandIn(apps, app_list), latency=args.latency, latency_jitter=args.latency_jitter,
+                          error_rate=args.error_rate, seed=args.seed + 1)
+
+    results = {}
+    with xsolla, steam, tempfile.TemporaryDirectory() as tmp:
+        xsolla_api.XSOLLA_API_URL = f"{xsolla.url}/api"
+        steam_api.STEAM_STORE_API_URL = f"{steam.url}/api"
+        steam_api.STEAM_WEB_API_URL = steam.url
+        steam_api.STEAM_API_CALL_DELAY = 0
+        servers = [xsolla, steam]
+        x = xsolla_api.XsollaProjectAPI(API_KEY, PROJECT_ID)
+        csv_fn = os.path.join(tmp, "prices.csv")
+        csv_import_fn = os.path.join(tmp, "prices_subset.csv")
+        bundle_skus = [b["sku"] for b in catalog["bundles"]]
+
+        def _make_import_subset(_) -> None:
+            xsolla_tools.export_gamekey_prices_to_csv(API_KEY, PROJECT_ID, csv_fn)
+            with open(csv_fn, mode="r", encoding="utf_8_sig", newline="") as f:
+                rows = list(csv.reader(f))
+            with open(csv_import_fn, mode="w", encoding="utf_8_sig", newline="") as f:
+                csv.writer(f).writerows(rows[:args.csv_import_rows + 1])
+
+        benchmarks = {
+            "get_games": (lambda n: x.get_games(), None),
+            "import_from_steam": (lambda n: xsolla_tools.import_from_steam(API_KEY, PROJECT_ID, new_appids[n]), None),
+            "export_csv": (lambda n: xsolla_tools.export_gamekey_prices_to_csv(API_KEY, PROJECT_ID, csv_fn), None),
+            "import_csv": (lambda n: xsolla_tools.import_gamekey_prices_from_csv(API_KEY, PROJECT_ID, csv_import_fn), _make_import_subset),
+            "recalculate_bundle": (lambda n: xsolla_tools.recalculate_bundle(API_KEY, PROJECT_ID, bundle_skus[n % len(bundle_skus)], 0.15), None),
+            "retrieve_pricing_per_appid": (lambda n: steam_api.retrieve_pricing_per_appid(new_appids[n]), None),
+            # Mirroring the project onto itself: every item is unchanged, so this is the cost of the two snapshots
+            "mirror_catalog": (lambda n: xsolla_tools.mirror_catalog(API_KEY, PROJECT_ID, API_KEY, PROJECT_ID, dry_run=True), None)
+        }
+
+        for name in args.only or BENCHMARK_NAMES:
+            fn, setup = benchmarks[name]
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = _time_runs(fn, args.repeat, servers, setup)
+
+    return results
+
+def _params(args) -> dict:
+    return {
+        "skus": args.skus,
+        "repeat": args.repeat,
+        "latency": args.latency,
+        "latency_jitter": args.latency_jitter,
+        "error_rate": args.error_rate,
+        "page_limit": args.page_limit,
+        "csv_import_rows": args.csv_import_rows,
+        "seed": args.seed
+    }
+
+def _previous_results(fn: str, params: dict) -> dict | None:
+    if not os.path.exists(fn):
+        return None
+    previous = None
+    with open(fn, mode="r", encoding="utf_8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record["params"] == params:
+                previous = record
+    return previous
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=1000, help="number of games in the synthetic catalog (100 to 50000)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every stand-in response")
+    parser.add_argument("--latency-jitter", type=float, default=0, help="random extra latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of requests answered with 429")
+    parser.add_argument("--page-limit", type=int, default=50, help="items per page on the Xsolla list endpoints")
+    parser.add_argument("--csv-import-rows", type=int, default=100, help="rows of the exported CSV that are imported back")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARK_NAMES)
+    parser.add_argument("--results", default=RESULTS_FN, help="JSON lines file the run is appended to")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="PERCENT",
+                        help="exit with 1 if a median is this much slower than the previous run with the same parameters")
+    args = parser.parse_args()
+
+    params = _params(args)
+    previous = _previous_results(args.results, params)
+    results = run(args)
+
+    regressed = False
+    for name, r in results.items():
+        line = f"{name:28} median {r['median_s'] * 1000:9.1f} ms  min {r['min_s'] * 1000:9.1f} ms  {r['requests']:6} requests"
+        if previous is not None and name in previous["results"]:
+            before = previous["results"][name]["median_s"]
+            change = (r["median_s"] - before) / before * 100 if before > 0 else 0
+            line = f"{line}  {change:+6.1f}% vs {previous['commit'] or 'previous'}"
+            if args.fail_on_regression is not None and change > args.fail_on_regression:
+                line = f"{line}  REGRESSION"
+                regressed = True
+        print(line)
+
+    if not args.no_save:
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": params,
+            "results": results
+        }
+        with open(args.results, mode="a", encoding="utf_8") as f:
+            f.write(json.dumps(record) + "\n")
+
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
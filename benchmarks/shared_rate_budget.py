@@ -0,0 +1,81 @@
+import os, sys, json, time, argparse, tempfile
+from multiprocessing import get_context
+
+# Cross-process rate limit benchmark: several processes call the Steam stand-in at once with the same
+# STEAM_API_CALL_DELAY. With one budget per process (what a module global gives), the host as a whole
+# goes over the limit as many times as there are processes; with the shared budget of rate_budget, the
+# calls of every process stay spaced by the delay.
+#
+#   python benchmarks/shared_rate_budget.py [--processes 4] [--calls 20] [--delay 0.05]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+def _worker(url: str, budget_dir: str, delay: float, appids: list[int]) -> list[float]:
+    sys.path.insert(0, ROOT)
+    import steam_api, rate_budget
+    rate_budget.configure(budget_dir)
+    steam_api.STEAM_STORE_API_URL = url
+    steam_api.STEAM_API_CALL_DELAY = delay
+    times = []
+    for appid in appids:
+        steam_api._request_from_steam_storeapi(appid, only_fields=("price_overview",))
+        times.append(time.time())
+    return times
+
+def _max_in_window(times: list[float], window: float) -> int:
+    times = sorted(times)
+    best = 0
+    start = 0
+    for end in range(len(times)):
+        while times[end] - times[start] >= window:
+            start = start + 1
+        best = max(best, end - start + 1)
+    return best
+
+def _run(args, url: str, appids: list[int], shared: bool) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs = [tmp if shared else os.path.join(tmp, str(n)) for n in range(args.processes)]
+        with get_context("spawn").Pool(args.processes) as pool:
+            start = time.perf_counter()
+            results = pool.starmap(_worker, [(url, d, args.delay, appids) for d in dirs])
+            total = time.perf_counter() - start
+    times = sorted(t for r in results for t in r)
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    return {
+        "total_s": total,
+        "calls": len(times),
+        "min_gap_ms": min(gaps) * 1000,
+        # Over any window of one second, the limit allows 1 / delay calls (+1 for the first one)
+        "max_calls_per_s": _max_in_window(times, 1.0),
+        "allowed_per_s": int(1 / args.delay) + 1
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=20, help="Steam calls per process")
+    parser.add_argument("--delay", type=float, default=0.05, help="STEAM_API_CALL_DELAY, in seconds")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    from synthetic_catalog import generate_steam_apps
+    from standin_servers import SteamStandIn, StandInServer
+    apps, app_list = generate_steam_apps(args.calls)
+    with StandInServer(SteamStandIn(apps, app_list)) as server:
+        url = f"{server.url}/api"
+        appids = sorted(apps)
+        results = {"budget per process": _run(args, url, appids, False), "shared budget": _run(args, url, appids, True)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name:20} total {r['total_s']:6.2f} s  {r['calls']:4} calls  min gap {r['min_gap_ms']:6.1f} ms  "
+                  f"max {r['max_calls_per_s']:3} calls in 1s (limit {r['allowed_per_s']})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
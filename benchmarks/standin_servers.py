@@ -0,0 +1,484 @@
+import re, os, json, time, copy, gzip, base64, random, socket, asyncio, threading, subprocess, zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from synthetic_catalog import CURRENCY_RATES, STEAM_CC_CURRENCIES
+
+# Local stand-ins for the Xsolla admin item endpoints and the Steam storefront/WebAPI endpoints used by
+# xsolla_api.py and steam_api.py. Point the clients at them by overriding XSOLLA_API_URL,
+# STEAM_STORE_API_URL and STEAM_WEB_API_URL:
+#
+#   with StandInServer(XsollaStandIn(catalog, project_id, api_key)) as server:
+#       xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+#
+# Each stand-in only implements handle(method, path, query, headers, body) -> (status, headers, body),
+# StandInServer adds the HTTP plumbing, latency, 429 injection and request counters. AsgiStandIn and
+# TlsStandInServer serve the same stand-ins over TLS with HTTP/2 and gzip (needs hypercorn).
+
+def _json_response(status: int, data) -> tuple[int, dict, bytes]:
+    return (status, {"Content-Type": "application/json"}, json.dumps(data).encode("utf_8"))
+
+def _error(status: int, message: str) -> tuple[int, dict, bytes]:
+    return _json_response(status, {"statusCode": status, "errorCode": status, "errorMessage": message})
+
+def _empty(status: int = 204) -> tuple[int, dict, bytes]:
+    return (status, {}, b"")
+
+
+class XsollaStandIn():
+    ITEM_COLLECTIONS = {
+        "game": "games",
+        "bundle": "bundles",
+        "virtual_items": "virtual_items",
+        "virtual_currency/package": "virtual_currency_packages"
+    }
+    ROUTE_REGEX = re.compile(r"^/api/v2/project/(?P<project_id>\d+)/admin/items/(?P<collection>game|bundle|virtual_items|virtual_currency/package)(?:/(?P<key>sku|id)/(?P<value>[^/]+))?/?$")
+    MERCHANT_ROUTE_REGEX = re.compile(r"^/api/v2/merchant/(?P<merchant_id>\d+)/projects/?$")
+
+    def __init__(self, catalog: dict, project_id: int, api_key: str, default_limit: int = 50, max_limit: int = 100,
+                 merchant_id: int = 1) -> None:
+        self.project_id = str(project_id)
+        self.merchant_id = str(merchant_id)
+        self.auth = "Basic " + base64.b64encode(f"{project_id}:{api_key}".encode("utf_8")).decode("ascii")
+        # XsollaMerchantAPI authenticates with the merchant id instead of the project id
+        self.merchant_auth = "Basic " + base64.b64encode(f"{merchant_id}:{api_key}".encode("utf_8")).decode("ascii")
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+        self.lock = threading.Lock()
+        self.collections = {name: [copy.deepcopy(i) for i in catalog.get(name, [])] for name in self.ITEM_COLLECTIONS.values()}
+        self.next_item_id = max([i["item_id"] for items in self.collections.values() for i in items] + [0]) + 1
+
+    def _find(self, collection: str, key: str, value: str) -> tuple[int, dict] | None:
+        for n, item in enumerate(self.collections[collection]):
+            if (key == "sku" and item["sku"] == value) or (key == "id" and str(item["item_id"]) == value):
+                return n, item
+        return None
+
+    def _find_any(self, sku: str) -> dict | None:
+        for items in self.collections.values():
+            for item in items:
+                if item["sku"] == sku:
+                    return item
+                for unit_item in item.get("unit_items", []):
+                    if unit_item["sku"] == sku:
+                        return unit_item
+        return None
+
+    def _list(self, collection: str, query: dict) -> tuple[int, dict, bytes]:
+        try:
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", [str(self.default_limit)])[0])
+        except ValueError:
+            return _error(422, "Invalid pagination parameters")
+        limit = max(1, min(limit, self.max_limit))
+        with self.lock:
+            items = self.collections[collection][offset:offset + limit]
+            has_more = offset + limit < len(self.collections[collection])
+            return _json_response(200, {"has_more": has_more, "total_items_count": len(self.collections[collection]), "items": items})
+
+    def _projects(self, merchant_id: str, query: dict) -> tuple[int, dict, bytes]:
+        if merchant_id != self.merchant_id:
+            return _error(404, f"Merchant {merchant_id} not found")
+        try:
+            offset = int(query.get("offset", ["0"])[0])
+        except ValueError:
+            return _error(422, "Invalid pagination parameters")
+        projects = [{"project_id": int(self.project_id), "name": {"en": "Stand-in project"}}]
+        return _json_response(200, {"items": projects[offset:], "has_more": False})
+
+    def _create(self, collection: str, payload: dict) -> tuple[int, dict, bytes]:
+        if "sku" not in payload:
+            return _error(422, "Property sku is required")
+        with self.lock:
+            if self._find(collection, "sku", payload["sku"]) is not None:
+                return _error(422, f"Item with SKU {payload['sku']} already exists")
+            item = self._normalize(collection, payload)
+            self.collections[collection].append(item)
+            return _json_response(201, {"item_id": item["item_id"], "sku": item["sku"]})
+
+    def _normalize(self, collection: str, payload: dict) -> dict:
+        # Fills in the read-only fields the real API adds, so what the clients PUT reads back like a GET
+        item = copy.deepcopy(payload)
+        item.setdefault("item_id", self.next_item_id)
+        self.next_item_id = max(self.next_item_id, item["item_id"]) + 1
+        item["groups"] = [g if isinstance(g, dict) else {"external_id": g, "name": {"en": g}} for g in item.get("groups", [])]
+        item.setdefault("attributes", [])
+        item.setdefault("periods", [])
+        if collection == "games":
+            item["type"] = "game"
+            for unit_item in item.get("unit_items", []):
+                unit_item.setdefault("item_id", self.next_item_id)
+                self.next_item_id = self.next_item_id + 1
+                unit_item["type"] = "game_key"
+                unit_item.setdefault("has_keys", False)
+        elif collection == "bundles":
+            item["type"] = "bundle"
+            item.setdefault("bundle_type", "standard")
+            content = []
+            for c in item.get("content", []):
+                ref = self._find_any(c["sku"])
+                content.append({
+                    "sku": c["sku"],
+                    "quantity": c["quantity"],
+                    "type": ref["type"] if ref is not None else "virtual_good",
+                    "bundle_type": ref.get("bundle_type") if ref is not None else None,
+                    "name": ref["name"] if ref is not None else {"en-US": c["sku"]}
+                })
+            item["content"] = content
+        return item
+
+    def _update(self, collection: str, key: str, value: str, payload: dict) -> tuple[int, dict, bytes]:
+        with self.lock:
+            found = self._find(collection, key, value)
+            if found is None:
+                return _error(404, f"Item {value} not found")
+            n, old = found
+            payload = dict(payload, item_id=old["item_id"])
+            self.collections[collection][n] = self._normalize(collection, payload)
+            return _empty()
+
+    def _delete(self, collection: str, key: str, value: str) -> tuple[int, dict, bytes]:
+        with self.lock:
+            found = self._find(collection, key, value)
+            if found is None:
+                return _error(404, f"Item {value} not found")
+            self.collections[collection].pop(found[0])
+            return _empty()
+
+    def handle(self, method: str, path: str, query: dict, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        m = self.MERCHANT_ROUTE_REGEX.match(path)
+        if m is not None and method == "GET":
+            if headers.get("Authorization") != self.merchant_auth:
+                return _error(401, "Invalid credentials")
+            return self._projects(m["merchant_id"], query)
+
+        if headers.get("Authorization") != self.auth:
+            return _error(401, "Invalid credentials")
+
+        m = self.ROUTE_REGEX.match(path)
+        if m is None or m["project_id"] != self.project_id:
+            return _error(404, f"No route for {path}")
+        collection = self.ITEM_COLLECTIONS[m["collection"]]
+
+        payload = None
+        if method in ("POST", "PUT"):
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return _error(422, "Invalid JSON body")
+
+        if m["key"] is None:
+            if method == "GET":
+                return self._list(collection, query)
+            if method == "POST":
+                return self._create(collection, payload)
+        else:
+            if method == "GET":
+                with self.lock:
+                    found = self._find(collection, m["key"], m["value"])
+                    if found is None:
+                        return _error(404, f"Item {m['value']} not found")
+                    return _json_response(200, found[1])
+            if method == "PUT":
+                return self._update(collection, m["key"], m["value"], payload)
+            if method == "DELETE":
+                return self._delete(collection, m["key"], m["value"])
+        return _error(405, f"{method} not allowed on {path}")
+
+
+class SteamStandIn():
+    BASIC_FIELDS = ("type", "name", "steam_appid", "required_age", "is_free", "detailed_description", "about_the_game",
+                    "short_description", "supported_languages", "header_image", "website", "pc_requirements")
+
+    def __init__(self, apps: dict, app_list: list[dict], unavailable_rate: float = 0.1) -> None:
+        self.apps = apps
+        self.app_list = app_list
+        # Share of (app, country) pairs where the app is not sold, so retrieve_pricing sees gaps like it does live
+        self.unavailable_rate = unavailable_rate
+
+    def _is_sold_in(self, appid: int, cc: str) -> bool:
+        return cc == "us" or (zlib.crc32(f"{appid}:{cc}".encode("ascii")) % 1000) / 1000 >= self.unavailable_rate
+
+    def _appdetails(self, appid: int, cc: str, filters: list[str] | None) -> dict:
+        app = self.apps.get(appid)
+        currency = STEAM_CC_CURRENCIES.get(cc, "USD")
+        if app is None or not self._is_sold_in(appid, cc):
+            return {"success": False}
+
+        initial = int(round(app["usd_price"] * CURRENCY_RATES[currency] * 100))
+        data = {k: v for k, v in app.items() if k != "usd_price"}
+        data["price_overview"] = {
+            "currency": currency,
+            "initial": initial,
+            "final": initial,
+            "discount_percent": 0,
+            "initial_formatted": "",
+            "final_formatted": f"{initial / 100:.2f} {currency}"
+        }
+
+        if filters:
+            # Like the real endpoint: "basic" expands to the basic fields, unknown filters are ignored and an
+            # empty result comes back as an empty list
+            fields = [f for name in filters for f in (self.BASIC_FIELDS if name == "basic" else (name,))]
+            data = {f: data[f] for f in fields if f in data} or []
+        return {"success": True, "data": data}
+
+    def handle(self, method: str, path: str, query: dict, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        if method != "GET":
+            return _error(405, f"{method} not allowed on {path}")
+
+        if path.rstrip("/") == "/api/appdetails":
+            cc = query.get("cc", ["us"])[0].lower()
+            filters = query["filters"][0].split(",") if "filters" in query else None
+            result = {}
+            for appid in query.get("appids", [""])[0].split(","):
+                try:
+                    result[appid] = self._appdetails(int(appid), cc, filters)
+                except ValueError:
+                    return _json_response(400, None)
+            return _json_response(200, result)
+
+        if path.rstrip("/") == "/ISteamApps/GetAppList/v2":
+            return _json_response(200, {"applist": {"apps": self.app_list}})
+
+        return _error(404, f"No route for {path}")
+
+
+class StandInServer():
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0, latency: float = 0, latency_jitter: float = 0,
+                 error_rate: float = 0, retry_after: float = 1, seed: int = 0, straggler_rate: float = 0,
+                 straggler_latency: float = 0, server_error_rate: float = 0) -> None:
+        self.app = app
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        # Share of requests that take straggler_latency more seconds, and of requests answered with a 503
+        self.straggler_rate = straggler_rate
+        self.straggler_latency = straggler_latency
+        self.server_error_rate = server_error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.throttled = 0
+            self.bytes_sent = 0
+
+    def _respond(self, method: str, raw_path: str, headers: dict, body: bytes) -> tuple[int, dict, bytes]:
+        with self.lock:
+            self.requests = self.requests + 1
+            delay = self.latency + self.rng.uniform(0, self.latency_jitter)
+            if self.rng.random() < self.straggler_rate:
+                delay = delay + self.straggler_latency
+            throttle = self.rng.random() < self.error_rate
+            server_error = self.rng.random() < self.server_error_rate
+
+        if delay > 0:
+            time.sleep(delay)
+        if server_error:
+            status, response_headers, response_body = _error(503, "Service unavailable")
+        elif throttle:
+            with self.lock:
+                self.throttled = self.throttled + 1
+            status, response_headers, response_body = _error(429, "Too many requests")
+            response_headers["Retry-After"] = str(self.retry_after)
+        else:
+            url = urlsplit(raw_path)
+            status, response_headers, response_body = self.app.handle(method, url.path, parse_qs(url.query), headers, body)
+
+        with self.lock:
+            self.bytes_sent = self.bytes_sent + len(response_body)
+        return status, response_headers, response_body
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, response_body = server._respond(self.command, self.path, dict(self.headers), body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_PUT = _handle
+            do_DELETE = _handle
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> "StandInServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+
+def make_self_signed_cert(directory: str, host: str = "127.0.0.1") -> tuple[str, str]:
+    certfile = os.path.join(directory, "standin_cert.pem")
+    keyfile = os.path.join(directory, "standin_key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", f"subjectAltName=IP:{host},DNS:localhost", "-keyout", keyfile, "-out", certfile],
+                   check=True, capture_output=True)
+    return certfile, keyfile
+
+
+class AsgiStandIn():
+    # ASGI adapter of a stand-in. Responses are gzipped when the client accepts it, gzipped request
+    # bodies are decompressed; the counters are the bytes on the wire. connections holds the client
+    # address of every connection seen, one per client on HTTP/2
+    def __init__(self, app, latency: float = 0, compress_min_bytes: int = 1024) -> None:
+        self.app = app
+        self.latency = latency
+        self.compress_min_bytes = compress_min_bytes
+        self.lock = threading.Lock()
+        self.reset_counters()
+
+    def reset_counters(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.bytes_sent = 0
+            self.bytes_received = 0
+            self.connections = set()
+            self.http_versions = set()
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        more_body = True
+        while more_body:
+            message = await receive()
+            body = body + message.get("body", b"")
+            more_body = message.get("more_body", False)
+        headers = {k.decode("latin_1").title(): v.decode("latin_1") for k, v in scope["headers"]}
+        with self.lock:
+            self.requests = self.requests + 1
+            self.bytes_received = self.bytes_received + len(body)
+            self.connections.add(tuple(scope.get("client") or ()))
+            self.http_versions.add(scope["http_version"])
+
+        if headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+        query = parse_qs(scope["query_string"].decode("latin_1"))
+        status, response_headers, response_body = self.app.handle(scope["method"], scope["path"], query, headers, body)
+
+        response_headers = dict(response_headers)
+        if "gzip" in headers.get("Accept-Encoding", "") and len(response_body) >= self.compress_min_bytes:
+            response_body = gzip.compress(response_body, compresslevel=6)
+            response_headers["Content-Encoding"] = "gzip"
+        response_headers["Content-Length"] = str(len(response_body))
+        with self.lock:
+            self.bytes_sent = self.bytes_sent + len(response_body)
+
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(k.lower().encode("latin_1"), v.encode("latin_1")) for k, v in response_headers.items()]})
+        await send({"type": "http.response.body", "body": response_body})
+
+
+class TlsStandInServer():
+    # Serves an AsgiStandIn with hypercorn over TLS, HTTP/2 or HTTP/1.1 being negotiated with ALPN
+    def __init__(self, app: AsgiStandIn, certfile: str, keyfile: str, host: str = "127.0.0.1", port: int = 0) -> None:
+        from hypercorn.config import Config
+
+        if port == 0:
+            with socket.socket() as s:
+                s.bind((host, 0))
+                port = s.getsockname()[1]
+        self.app = app
+        self.host = host
+        self.port = port
+        self.config = Config()
+        self.config.bind = [f"{host}:{port}"]
+        self.config.certfile = certfile
+        self.config.keyfile = keyfile
+        self.config.alpn_protocols = ["h2", "http/1.1"]
+        self.config.accesslog = None
+        self.config.errorlog = None
+        self.loop = None
+        self.shutdown_event = None
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return f"https://{self.host}:{self.port}"
+
+    def _run(self) -> None:
+        from hypercorn.asyncio import serve
+
+        async def _serve() -> None:
+            self.loop = asyncio.get_running_loop()
+            self.shutdown_event = asyncio.Event()
+            await serve(self.app, self.config, shutdown_trigger=self.shutdown_event.wait)
+
+        asyncio.run(_serve())
+
+    def start(self, timeout: float = 10) -> "TlsStandInServer":
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return self
+            except OSError:
+                if time.monotonic() > deadline or not self.thread.is_alive():
+                    raise Exception(f"The stand-in server did not start on {self.url}")
+                time.sleep(0.05)
+
+    def stop(self) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.shutdown_event.set)
+        self.thread.join(timeout=10)
+
+    def __enter__(self) -> "TlsStandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
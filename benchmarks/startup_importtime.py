@@ -0,0 +1,62 @@
+import os, re, sys, json, argparse, subprocess
+
+# Startup benchmark: imports each module listed in startup_budget.json in a fresh interpreter with
+# -X importtime, and fails if the import takes longer than its budget or pulls in a module that
+# should only be loaded on first use.
+#
+#   python benchmarks/startup_importtime.py [--profile out.txt]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_FN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+IMPORTTIME_REGEX = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+def measure_import(module: str) -> tuple[float, dict[str, int], str]:
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise Exception(f"Importing {module} failed:\n{r.stderr}")
+
+    cumulative = {}
+    for line in r.stderr.splitlines():
+        m = IMPORTTIME_REGEX.match(line)
+        if m is not None:
+            cumulative[m[3]] = int(m[2])
+    return cumulative[module] / 1000, cumulative, r.stderr
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", help="write the raw -X importtime output of the slowest run to this file")
+    args = parser.parse_args()
+
+    with open(BUDGET_FN, mode="r", encoding="utf_8") as f:
+        budget = json.load(f)
+
+    failed = False
+    profiles = []
+    for module, rules in budget["modules"].items():
+        runs = [measure_import(module) for _ in range(budget["runs"])]
+        best_ms = min(r[0] for r in runs)
+        _, cumulative, raw = runs[0]
+        profiles.append(f"### {module}\n{raw}")
+
+        status = "OK" if best_ms <= rules["budget_ms"] else "OVER BUDGET"
+        print(f"{module}: {best_ms:.1f} ms (budget {rules['budget_ms']} ms) {status}")
+        if best_ms > rules["budget_ms"]:
+            failed = True
+
+        eager = [m for m in rules["forbidden"] if m in cumulative]
+        if eager:
+            print(f"{module}: imports {', '.join(eager)} at startup")
+            failed = True
+
+        top_level = sorted(((t, m) for m, t in cumulative.items() if "." not in m), reverse=True)[:10]
+        for t, m in top_level:
+            print(f"    {t / 1000:8.1f} ms  {m}")
+
+    if args.profile:
+        with open(args.profile, mode="w", encoding="utf_8") as f:
+            f.write("\n".join(profiles))
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
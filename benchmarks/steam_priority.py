@@ -0,0 +1,101 @@
+import os, sys, json, time, argparse, threading, contextlib
+
+# Steam scheduling benchmark: background threads fetch prices from the Steam stand-in without pause
+# (a bulk price sync), and meanwhile an interactive job fetches the prices of one app. Measured with
+# the calls served in the order they reserved the rate limit (what a plain shared throttle gives)
+# and with request_scheduler's lanes: how long the interactive job took, how long its calls waited,
+# and how many calls the background lane still made over the same time.
+#
+#   python benchmarks/steam_priority.py [--background 8] [--delay 0.05] [--currencies 10]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import steam_api, request_scheduler, rate_budget
+from synthetic_catalog import generate_steam_apps
+from standin_servers import SteamStandIn, StandInServer
+
+
+class _ReservationOrder():
+    # The throttle without a scheduler: every thread reserves its call as soon as it asks
+    @contextlib.contextmanager
+    def turn(self):
+        ticket = request_scheduler.Ticket(request_scheduler.current_flow(), 0)
+        ticket.granted_at = ticket.enqueued_at
+        yield ticket
+
+    def stats(self) -> list[dict]:
+        return []
+
+
+def _background(appids: list[int], stop: threading.Event, calls: list) -> None:
+    with request_scheduler.lane(request_scheduler.BACKGROUND, job="price sync"):
+        n = 0
+        while not stop.is_set():
+            steam_api._request_from_steam_storeapi(appids[n % len(appids)], only_fields=("price_overview",))
+            calls.append(time.monotonic())
+            n = n + 1
+
+def _run(args, appids: list[int], scheduled: bool) -> dict:
+    steam_api.SCHEDULER = request_scheduler.RequestScheduler("steam") if scheduled else _ReservationOrder()
+    stop = threading.Event()
+    calls = []
+    threads = [threading.Thread(target=_background, args=(appids, stop, calls)) for _ in range(args.background)]
+    for t in threads:
+        t.start()
+    # Let the sync fill the queue before the interactive job starts
+    time.sleep(args.delay * args.background * 2)
+
+    waits = []
+    start = time.monotonic()
+    with request_scheduler.lane(request_scheduler.INTERACTIVE, job="import"):
+        for currency in steam_api.CURRENCIES[:args.currencies]:
+            asked = time.monotonic()
+            steam_api._request_from_steam_storeapi(appids[0], currency=currency[:2].lower(), only_fields=("price_overview",))
+            waits.append(time.monotonic() - asked)
+    end = time.monotonic()
+    stop.set()
+    for t in threads:
+        t.join()
+
+    waits.sort()
+    return {
+        "interactive_s": end - start,
+        "interactive_wait_avg_ms": sum(waits) / len(waits) * 1000,
+        "interactive_wait_max_ms": waits[-1] * 1000,
+        "background_calls": sum(1 for c in calls if start <= c <= end),
+        "lanes": steam_api.SCHEDULER.stats()
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--background", type=int, default=8, help="threads of the background price sync")
+    parser.add_argument("--delay", type=float, default=0.05, help="STEAM_API_CALL_DELAY, in seconds")
+    parser.add_argument("--currencies", type=int, default=10, help="calls of the interactive job")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    apps, app_list = generate_steam_apps(20)
+    with StandInServer(SteamStandIn(apps, app_list, unavailable_rate=0)) as server:
+        steam_api.STEAM_STORE_API_URL = f"{server.url}/api"
+        steam_api.STEAM_API_CALL_DELAY = args.delay
+        appids = sorted(apps)
+        results = {}
+        for name, scheduled in (("reservation order", False), ("scheduled lanes", True)):
+            # A budget of its own, so a previous run (or another process) does not skew the timings
+            rate_budget.BUCKETS["steam"] = rate_budget.SharedTokenBucket(f"steam_priority_benchmark_{os.getpid()}_{int(scheduled)}")
+            results[name] = _run(args, appids, scheduled)
+            rate_budget.BUCKETS.pop("steam").close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name:18} interactive job {r['interactive_s']:5.2f} s  call wait avg {r['interactive_wait_avg_ms']:6.0f} ms  "
+                  f"max {r['interactive_wait_max_ms']:6.0f} ms  {r['background_calls']:4} background calls meanwhile")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
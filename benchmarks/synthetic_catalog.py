@@ -0,0 +1,149 @@
+import random
+
+# Deterministic synthetic data for the stand-in servers: an Xsolla project catalog and a set of
+# Steam apps, shaped like the real API payloads the clients read.
+
+CURRENCY_RATES = {"USD": 1, "GBP": 0.8, "EUR": 0.92, "RUB": 90, "BRL": 5, "JPY": 150, "MYR": 4.7, "PHP": 56,
+                  "SGD": 1.35, "THB": 36, "VND": 24000, "KRW": 1300, "UAH": 38, "MXN": 17, "CAD": 1.35,
+                  "AUD": 1.5, "NZD": 1.6, "NOK": 10.5, "PLN": 4, "CHF": 0.9, "CNY": 7.2, "INR": 83, "CLP": 900,
+                  "PEN": 3.7, "COP": 3900, "ZAR": 18.5, "HKD": 7.8, "TWD": 31, "SAR": 3.75, "AED": 3.67,
+                  "ILS": 3.7, "KZT": 450, "KWD": 0.31, "QAR": 3.64, "CRC": 520, "UYU": 39}
+
+# Steam's cc parameter -> currency, as retrieve_pricing_per_appid derives it (first two letters, lowercased)
+STEAM_CC_CURRENCIES = {c[:2].lower(): c for c in CURRENCY_RATES}
+
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore et "
+         "dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip. ")
+
+def _prices(rng: random.Random, usd: float, currencies: list[str]) -> list[dict]:
+    return [{
+        "amount": round(usd * CURRENCY_RATES[c], 0 if CURRENCY_RATES[c] >= 100 else 2),
+        "currency": c,
+        "is_default": c == "USD",
+        "is_enabled": True
+        } for c in currencies]
+
+def generate_catalog(num_skus: int, seed: int = 0, num_bundles: int = None, description_length: int = 2000) -> dict:
+    rng = random.Random(seed)
+    currencies = list(CURRENCY_RATES)
+    num_bundles = num_bundles if num_bundles is not None else max(1, num_skus // 20)
+
+    games = []
+    for i in range(num_skus):
+        appid = 10000 + i * 10
+        name = f"Synthetic Game {i}"
+        sku = f"{appid}_synthetic_game_{i}"
+        usd = rng.choice([4.99, 9.99, 14.99, 19.99, 29.99, 39.99, 59.99])
+        games.append({
+            "item_id": i + 1,
+            "sku": sku,
+            "name": {"en-US": name},
+            "type": "game",
+            "description": {"en-US": LOREM[:200]},
+            "long_description": {"en-US": (LOREM * (description_length // len(LOREM) + 1))[:description_length]},
+            "image_url": f"https://cdn.example.com/{sku}.jpg",
+            "is_enabled": True,
+            "is_free": False,
+            "is_show_in_store": True,
+            "groups": [],
+            "attributes": [],
+            "periods": [],
+            "unit_items": [{
+                "item_id": num_skus + i + 1,
+                "sku": f"{sku}_Steam",
+                "name": {"en-US": f"{name}_Steam"},
+                "type": "game_key",
+                "drm_name": "Steam",
+                "drm_sku": "steam",
+                "has_keys": True,
+                "is_free": False,
+                "is_enabled": True,
+                "prices": _prices(rng, usd, ["USD"] + rng.sample(currencies[1:], rng.randint(20, len(currencies) - 1)))
+            }]
+        })
+
+    virtual_items = [{
+        "item_id": 2 * num_skus + i + 1,
+        "sku": f"synthetic_item_{i}",
+        "name": {"en-US": f"Synthetic Item {i}"},
+        "type": "virtual_good",
+        "groups": [],
+        "prices": _prices(rng, rng.choice([0.99, 1.99, 4.99]), currencies)
+    } for i in range(max(1, num_skus // 10))]
+
+    bundles = []
+    for i in range(num_bundles):
+        content_games = rng.sample(games, min(len(games), rng.randint(2, 4)))
+        content = [{"sku": g["unit_items"][0]["sku"], "quantity": 1, "type": "game_key", "name": g["unit_items"][0]["name"]} for g in content_games]
+        content.append({"sku": virtual_items[i % len(virtual_items)]["sku"], "quantity": rng.randint(1, 3), "type": "virtual_good", "name": virtual_items[i % len(virtual_items)]["name"]})
+        bundles.append({
+            "item_id": 3 * num_skus + i + 1,
+            "sku": f"synthetic_bundle_{i}",
+            "name": {"en-US": f"Synthetic Bundle {i}"},
+            "type": "bundle",
+            "bundle_type": "standard",
+            "description": {"en-US": LOREM[:120]},
+            "is_enabled": True,
+            "is_free": False,
+            "groups": [],
+            "attributes": [],
+            "periods": [],
+            "content": content,
+            "prices": _prices(rng, 49.99, currencies)
+        })
+
+    return {"games": games, "bundles": bundles, "virtual_items": virtual_items, "virtual_currency_packages": []}
+
+def generate_steam_apps(num_apps: int, seed: int = 0, first_appid: int = 10000, num_listed_apps: int = None) -> tuple[dict, list[dict]]:
+    rng = random.Random(seed)
+    apps = {}
+    for i in range(num_apps):
+        appid = first_appid + i * 10
+        usd = rng.choice([4.99, 9.99, 19.99, 59.99])
+        apps[appid] = {
+            "type": "game",
+            "name": f"Synthetic Game {i}",
+            "steam_appid": appid,
+            "required_age": 0,
+            "is_free": False,
+            "usd_price": usd,
+            "detailed_description": LOREM * 40,
+            "about_the_game": LOREM * 40,
+            "short_description": LOREM[:180],
+            "supported_languages": "English, French, German",
+            "header_image": f"https://cdn.example.com/steam/apps/{appid}/header.jpg",
+            "website": "https://example.com",
+            "pc_requirements": {"minimum": LOREM * 4, "recommended": LOREM * 4},
+            "developers": ["Synthetic Studio"],
+            "publishers": ["Synthetic Publishing"],
+            "platforms": {"windows": True, "mac": False, "linux": False},
+            "categories": [{"id": 2, "description": "Single-player"}],
+            "genres": [{"id": "1", "description": "Action"}],
+            "screenshots": [{"id": n, "path_thumbnail": f"https://cdn.example.com/{appid}/ss_{n}.600x338.jpg",
+                             "path_full": f"https://cdn.example.com/{appid}/ss_{n}.1920x1080.jpg"} for n in range(20)],
+            "movies": [{"id": n, "name": f"Trailer {n}", "thumbnail": f"https://cdn.example.com/{appid}/movie_{n}.jpg",
+                        "webm": {"480": f"https://cdn.example.com/{appid}/movie480_{n}.webm", "max": f"https://cdn.example.com/{appid}/movie_max_{n}.webm"}} for n in range(4)],
+            "recommendations": {"total": rng.randint(10, 100000)},
+            "release_date": {"coming_soon": False, "date": "Jan 1, 2020"},
+            "support_info": {"url": "https://example.com/support", "email": "support@example.com"}
+        }
+
+    num_listed_apps = num_listed_apps if num_listed_apps is not None else num_apps
+    app_list = [{"appid": first_appid + i * 10, "name": f"Synthetic Game {i}"} for i in range(num_listed_apps)]
+    return apps, app_list
+
+APP_NAME_WORDS = ["Dark", "Souls", "Star", "Legend", "Kingdom", "Dragon", "Space", "Empire", "Racing", "Simulator", "Tactics",
+                  "Shadow", "Quest", "Fantasy", "Galaxy", "Warfare", "Farm", "City", "Survival", "Heroes", "Knight", "Zombie",
+                  "Tycoon", "Chronicles", "Odyssey", "Pixel", "Arena", "Dungeon", "Ocean", "Iron", "Storm", "Crystal",
+                  "Frontier", "Mystery", "Island", "Legacy", "Rogue", "Ninja", "Robot", "Castle", "Planet", "Wild", "Night",
+                  "Blood", "Fire", "Cyber", "Puzzle", "Dream", "Sky", "Titan", "Ghost", "Hunter", "Valley", "Forge"]
+APP_NAME_SUFFIXES = ["", "", "", " II", " 2", " 3", ": Remastered", " - Soundtrack", " Deluxe Edition", ": Origins", " VR", " Demo"]
+
+def generate_app_list(num_apps: int, seed: int = 0, first_appid: int = 10000) -> list[dict]:
+    # GetAppList-like entries with varied, sometimes colliding names, for the app name search
+    rng = random.Random(seed)
+    apps = []
+    for i in range(num_apps):
+        words = rng.sample(APP_NAME_WORDS, rng.choice([1, 2, 2, 3, 3, 4]))
+        apps.append({"appid": first_appid + i * 10, "name": " ".join(words) + rng.choice(APP_NAME_SUFFIXES)})
+    return apps
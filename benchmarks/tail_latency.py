@@ -0,0 +1,113 @@
+import os, sys, json, time, argparse, statistics
+from concurrent.futures import ThreadPoolExecutor
+
+# Tail latency benchmark: sequential get_game_by_sku calls against a stand-in where a share of the
+# requests straggle, with and without hedging; then a stand-in answering 503 to everything, with and
+# without the circuit breaker, to show how long a batch takes to give up.
+#
+#   python benchmarks/tail_latency.py [--calls 300] [--straggler-rate 0.03] [--straggler-latency 2]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import xsolla_api, resilience
+from synthetic_catalog import generate_catalog
+from standin_servers import XsollaStandIn, StandInServer
+
+PROJECT_ID = 100000
+API_KEY = "standin_api_key"
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def _stragglers(args, hedging: bool) -> dict:
+    catalog = generate_catalog(args.skus, seed=args.seed, num_bundles=0)
+    skus = [g["sku"] for g in catalog["games"]]
+    resilience.reset()
+    resilience.HEDGING = hedging
+    with StandInServer(XsollaStandIn(catalog, PROJECT_ID, API_KEY), latency=args.latency, latency_jitter=args.latency / 2,
+                       straggler_rate=args.straggler_rate, straggler_latency=args.straggler_latency, seed=args.seed) as server:
+        xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+        x = xsolla_api.XsollaProjectAPI(API_KEY, PROJECT_ID)
+        latencies = []
+        start = time.perf_counter()
+        for n in range(args.calls):
+            call_start = time.perf_counter()
+            x.get_game_by_sku(skus[n % len(skus)])
+            latencies.append(time.perf_counter() - call_start)
+        total = time.perf_counter() - start
+        requests = server.requests
+    host = resilience.stats()[0]
+    return {
+        "total_s": total,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "requests": requests,
+        "hedges": host["hedges"],
+        "hedge_wins": host["hedge_wins"]
+    }
+
+def _outage(args, breaker: bool) -> dict:
+    resilience.reset()
+    resilience.HEDGING = False
+    threshold = resilience.FAILURE_THRESHOLD
+    if not breaker:
+        resilience.FAILURE_THRESHOLD = args.calls + 1
+    try:
+        with StandInServer(XsollaStandIn({}, PROJECT_ID, API_KEY), latency=args.outage_latency, server_error_rate=1) as server:
+            xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+            x = xsolla_api.XsollaProjectAPI(API_KEY, PROJECT_ID)
+
+            def _call(n: int) -> str:
+                try:
+                    x.get_game_by_sku(f"sku_{n}")
+                    return "ok"
+                except resilience.CircuitOpenError:
+                    return "rejected"
+                except Exception:
+                    return "failed"
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as pool:
+                outcomes = list(pool.map(_call, range(args.calls)))
+            return {"total_s": time.perf_counter() - start, "requests": server.requests, "rejected": outcomes.count("rejected")}
+    finally:
+        resilience.FAILURE_THRESHOLD = threshold
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--skus", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds added to every stand-in response")
+    parser.add_argument("--straggler-rate", type=float, default=0.03, help="share of the requests that straggle")
+    parser.add_argument("--straggler-latency", type=float, default=2, help="seconds a straggler takes")
+    parser.add_argument("--outage-latency", type=float, default=0.2, help="seconds the failing stand-in takes to answer 503")
+    parser.add_argument("--workers", type=int, default=4, help="threads calling the failing stand-in")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {
+        "stragglers, no hedging": _stragglers(args, False),
+        "stragglers, hedging": _stragglers(args, True),
+        "outage, no breaker": _outage(args, False),
+        "outage, breaker": _outage(args, True)
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, r in results.items():
+            if "p50_ms" in r:
+                print(f"{name:24} total {r['total_s']:7.2f} s  p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  max {r['max_ms']:7.1f} ms  "
+                      f"{r['requests']:5} requests  {r['hedges']:4} hedges ({r['hedge_wins']} won)")
+            else:
+                print(f"{name:24} total {r['total_s']:7.2f} s  {r['requests']:5} requests  {r['rejected']:5} rejected by the breaker")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
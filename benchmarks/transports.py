@@ -0,0 +1,90 @@
+import os, sys, json, time, argparse, tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Transport benchmark: a bulk job (list the games, GET then PUT every one of them from a pool of
+# workers) against the Xsolla stand-in served over TLS by hypercorn, once per transport. Reports the
+# time of each phase, the connections opened and the bytes on the wire.
+#
+#   pip install "httpx[http2,brotli]" hypercorn
+#   python benchmarks/transports.py [--skus 500] [--workers 16] [--latency 0.02]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import xsolla_api, http_transport
+from catalog_mirror import normalize_item
+from synthetic_catalog import generate_catalog
+from standin_servers import XsollaStandIn, AsgiStandIn, TlsStandInServer, make_self_signed_cert
+
+PROJECT_ID = 100000
+API_KEY = "standin_api_key"
+# (transport, compress_requests)
+CASES = [("requests", False), ("httpx", False), ("http2", False), ("http2", True)]
+
+def _run_case(name: str, compress_requests: bool, asgi: AsgiStandIn, certfile: str, workers: int) -> dict:
+    transport = http_transport.make_transport(name, compress_requests, verify=certfile)
+    x = xsolla_api.XsollaProjectAPI(API_KEY, PROJECT_ID, transport=transport)
+    phases = {}
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            asgi.reset_counters()
+            start = time.perf_counter()
+            games = x.get_games()
+            phases["list_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            list(pool.map(lambda g: x.get_game_by_sku(g["sku"]), games))
+            phases["get_s"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            list(pool.map(lambda g: x.update_game_by_sku(g["sku"], normalize_item(g, "game")), games))
+            phases["put_s"] = time.perf_counter() - start
+    finally:
+        transport.close()
+
+    return dict(phases,
+                total_s=sum(phases.values()),
+                requests=asgi.requests,
+                connections=len(asgi.connections),
+                http_versions=sorted(asgi.http_versions),
+                bytes_sent=asgi.bytes_sent,
+                bytes_received=asgi.bytes_received)
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=16, help="threads issuing the GET and PUT requests")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every stand-in response")
+    parser.add_argument("--description-length", type=int, default=2000, help="characters of the long description of every game")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    catalog = generate_catalog(args.skus, num_bundles=0, description_length=args.description_length)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        certfile, keyfile = make_self_signed_cert(tmp)
+        for name, compress_requests in CASES:
+            case = f"{name}+gzip requests" if compress_requests else name
+            runs = []
+            for _ in range(args.repeat):
+                # A fresh catalog and server per run, so every transport starts from the same state and a cold connection
+                asgi = AsgiStandIn(XsollaStandIn(catalog, PROJECT_ID, API_KEY), latency=args.latency)
+                with TlsStandInServer(asgi, certfile, keyfile) as server:
+                    xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+                    runs.append(_run_case(name, compress_requests, asgi, certfile, args.workers))
+            results[case] = min(runs, key=lambda r: r["total_s"])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for case, r in results.items():
+            print(f"{case:22} list {r['list_s'] * 1000:8.1f} ms  get {r['get_s'] * 1000:8.1f} ms  put {r['put_s'] * 1000:8.1f} ms  "
+                  f"{r['connections']:4} connections  {'/'.join(r['http_versions']):8}  "
+                  f"sent {r['bytes_sent'] / 1024:8.1f} KiB  received {r['bytes_received'] / 1024:8.1f} KiB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
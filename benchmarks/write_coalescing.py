@@ -0,0 +1,94 @@
+import os, sys, csv, json, time, argparse, contextlib, io, tempfile
+
+# Write coalescing benchmark: a session that updates the prices of every game from Steam, then imports
+# a CSV of unit item prices covering some of them, then recalculates every bundle, run against a
+# fresh stand-in project once with a PUT per update and once inside a write_behind.session. Counts the
+# PUT and GET calls the Xsolla stand-in receives and checks both runs leave the same catalog.
+#
+#   python benchmarks/write_coalescing.py [--games 40] [--csv-share 0.5] [--latency 0.02]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import xsolla_api, xsolla_tools, steam_api, write_behind, resilience
+from synthetic_catalog import generate_catalog, generate_steam_apps
+from standin_servers import XsollaStandIn, SteamStandIn, StandInServer
+
+PROJECT_ID = 100000
+API_KEY = "standin_api_key"
+
+def _count_methods(app) -> dict:
+    counts = {}
+    handle = app.handle
+
+    def _handle(method, path, query, headers, body):
+        counts[method] = counts.get(method, 0) + 1
+        return handle(method, path, query, headers, body)
+
+    app.handle = _handle
+    return counts
+
+def _write_csv(fn: str, games: list[dict], share: float) -> None:
+    # The exported layout (SKU, Sub-SKU, Default, currencies...), with every price raised by 10%
+    games = games[:int(len(games) * share)]
+    currencies = sorted({p["currency"] for g in games for p in g["unit_items"][0]["prices"]})
+    with open(fn, mode="w", encoding="utf_8_sig", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["SKU", "Sub-SKU", "Default"] + currencies)
+        for g in games:
+            unit_item = g["unit_items"][0]
+            prices = {p["currency"]: p["amount"] for p in unit_item["prices"]}
+            w.writerow([g["sku"], unit_item["sku"], "USD"] + [round(prices[c] * 1.1, 2) if c in prices else "" for c in currencies])
+
+def _session(args, csv_fn: str, coalesce: bool) -> dict:
+    resilience.reset()
+    catalog = generate_catalog(args.games, seed=args.seed, num_bundles=args.bundles)
+    apps, app_list = generate_steam_apps(args.games, seed=args.seed)
+    app = XsollaStandIn(catalog, PROJECT_ID, API_KEY)
+    counts = _count_methods(app)
+    with StandInServer(app, latency=args.latency) as server, StandInServer(SteamStandIn(apps, app_list)) as steam:
+        xsolla_api.XSOLLA_API_URL = f"{server.url}/api"
+        steam_api.STEAM_STORE_API_URL = f"{steam.url}/api"
+        steam_api.STEAM_API_CALL_DELAY = 0
+        start = time.perf_counter()
+        with write_behind.session(API_KEY, PROJECT_ID) if coalesce else contextlib.nullcontext() as buffer:
+            for g in catalog["games"]:
+                xsolla_tools.update_prices(API_KEY, PROJECT_ID, g["sku"], g["sku"].split("_")[0])
+            xsolla_tools.import_gamekey_prices_from_csv(API_KEY, PROJECT_ID, csv_fn)
+            for b in catalog["bundles"]:
+                xsolla_tools.recalculate_bundle(API_KEY, PROJECT_ID, b["sku"])
+        total = time.perf_counter() - start
+        return {"total_s": total, "puts": counts.get("PUT", 0), "gets": counts.get("GET", 0),
+                "failed": sum(1 for r in buffer.results if not r["ok"]) if coalesce else 0,
+                "catalog": {name: app.collections[name] for name in ("games", "bundles")}}
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--games", type=int, default=40)
+    parser.add_argument("--bundles", type=int, default=10)
+    parser.add_argument("--csv-share", type=float, default=0.5, help="share of the games with a row in the imported CSV")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every Xsolla stand-in response")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_fn = os.path.join(tmp, "prices.csv")
+        _write_csv(csv_fn, generate_catalog(args.games, seed=args.seed, num_bundles=args.bundles)["games"], args.csv_share)
+        # The core logs every step and warns about the currencies missing from bundles, keep the output to the results
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            results = {"PUT per update": _session(args, csv_fn, False), "write_behind.session": _session(args, csv_fn, True)}
+
+    same = results["PUT per update"].pop("catalog") == results["write_behind.session"].pop("catalog")
+    if args.json:
+        print(json.dumps({"results": results, "same_catalog": same}, indent=2))
+    else:
+        for name, r in results.items():
+            print(f"{name:22} total {r['total_s']:6.2f} s  {r['puts']:5} PUTs  {r['gets']:5} GETs  {r['failed']:3} failed")
+        print(f"same final catalog: {same}")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
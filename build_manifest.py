@@ -0,0 +1,107 @@
+import os, json, mmap, hashlib, logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = "build_manifests"
+MMAP_THRESHOLD = 16 * 1024 * 1024
+CHUNK_SIZE = 8 * 1024 * 1024
+
+def _hash_file(fn: str, size: int) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(fn, mode="rb") as f:
+        if size >= MMAP_THRESHOLD:
+            # hashlib releases the GIL on large updates, so mapped chunks hash in parallel across threads
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    for i in range(0, size, CHUNK_SIZE):
+                        h.update(view[i:i + CHUNK_SIZE])
+                finally:
+                    view.release()
+        elif size > 0:
+            h.update(f.read())
+    return h.hexdigest()
+
+def _folder_key(game_folder_path: str) -> str:
+    return hashlib.sha1(os.path.normcase(os.path.abspath(game_folder_path)).encode("utf_8")).hexdigest()[:16]
+
+def _load_json(fn: str, default):
+    if not os.path.exists(fn):
+        return default
+    with open(fn, mode="r", encoding="utf_8") as f:
+        return json.load(f)
+
+def _save_json(fn: str, data) -> None:
+    os.makedirs(os.path.dirname(fn), exist_ok=True)
+    with open(fn + ".tmp", mode="w", encoding="utf_8") as f:
+        json.dump(data, f)
+    os.replace(fn + ".tmp", fn)
+
+
+class BuildManifest():
+    def __init__(self, files: dict[str, str] = None, settings: dict = None) -> None:
+        self.files = files if files is not None else {}
+        # Description and set-as value the build was uploaded with, not part of the comparison
+        self.settings = settings if settings is not None else {}
+
+    def __eq__(self, __value: object) -> bool:
+        return isinstance(__value, BuildManifest) and self.files == __value.files
+
+    def digest(self) -> str:
+        h = hashlib.blake2b(digest_size=20)
+        for path in sorted(self.files):
+            h.update(f"{path}\0{self.files[path]}\n".encode("utf_8"))
+        return h.hexdigest()
+
+    def diff(self, other: "BuildManifest") -> tuple[list[str], list[str], list[str]]:
+        added = sorted(p for p in self.files if p not in other.files)
+        removed = sorted(p for p in other.files if p not in self.files)
+        changed = sorted(p for p in self.files if p in other.files and self.files[p] != other.files[p])
+        return added, removed, changed
+
+
+def hash_game_folder(game_folder_path: str, workers: int = None, cache_path: str = MANIFEST_PATH) -> BuildManifest:
+    cache_fn = os.path.join(cache_path, f"{_folder_key(game_folder_path)}.cache.json")
+    cache = _load_json(cache_fn, {})
+
+    files = {}
+    new_cache = {}
+    to_hash = []
+    for root, _, filenames in os.walk(game_folder_path):
+        for filename in filenames:
+            fn = os.path.join(root, filename)
+            path = os.path.relpath(fn, game_folder_path).replace(os.sep, "/")
+            st = os.stat(fn)
+            cached = cache.get(path)
+            if cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+                files[path] = cached[2]
+                new_cache[path] = cached
+            else:
+                to_hash.append((path, fn, st.st_size, st.st_mtime_ns))
+
+    if to_hash:
+        logger.info(f"Hashing {len(to_hash)} new or modified files ({len(files)} unchanged)...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashes = pool.map(lambda f: _hash_file(f[1], f[2]), to_hash)
+            for (path, _, size, mtime_ns), file_hash in zip(to_hash, hashes):
+                files[path] = file_hash
+                new_cache[path] = [size, mtime_ns, file_hash]
+
+    if new_cache != cache:
+        _save_json(cache_fn, new_cache)
+
+    return BuildManifest(files)
+
+def _uploaded_manifest_fn(game_folder_path: str, launcher_key: str, cache_path: str) -> str:
+    key_hash = hashlib.sha256(launcher_key.encode("utf_8")).hexdigest()[:16]
+    return os.path.join(cache_path, f"{_folder_key(game_folder_path)}.{key_hash}.uploaded.json")
+
+def load_uploaded_manifest(game_folder_path: str, launcher_key: str, cache_path: str = MANIFEST_PATH) -> BuildManifest | None:
+    data = _load_json(_uploaded_manifest_fn(game_folder_path, launcher_key, cache_path), None)
+    if data is None:
+        return None
+    return BuildManifest(data["files"], data["settings"])
+
+def save_uploaded_manifest(manifest: BuildManifest, game_folder_path: str, launcher_key: str, cache_path: str = MANIFEST_PATH) -> None:
+    _save_json(_uploaded_manifest_fn(game_folder_path, launcher_key, cache_path), {"files": manifest.files, "settings": manifest.settings})
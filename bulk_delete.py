@@ -0,0 +1,137 @@
+import time, random, fnmatch, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from xsolla_api import XsollaProjectAPI, XsollaAPIError
+from resilience import CircuitOpenError
+from structured_log import fields
+
+# Deletes game SKUs in bulk. SKUs and glob patterns (retired_*, promo_2019_?) are resolved against one
+# fetch of the game list, then deleted from a pool of workers that share a rate limit. Throttled (429)
+# and failing (5xx) calls, timeouts and connection errors are retried with exponential backoff, or after
+# the Retry-After of the response. With verify, the game list is fetched again at the end and every SKU
+# reported deleted is checked to be gone.
+#
+# Each SKU gets a result {"sku", "status", "ok", "attempts", "verified", "error"}, status being one of
+# deleted, already_deleted (404 on delete), not_found (nothing in the catalog matched), failed, cancelled
+# or planned (dry run).
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE = 10
+DEFAULT_RETRIES = 3
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+def _is_pattern(s: str) -> bool:
+    return any(c in s for c in "*?[")
+
+def resolve_skus(patterns: list[str], game_skus: list[str]) -> tuple[list[str], list[str]]:
+    # Returns the SKUs to delete, in catalog order and without duplicates, and the SKUs and patterns
+    # that matched nothing
+    catalog = set(game_skus)
+    matched = set()
+    unmatched = []
+    for p in patterns:
+        found = fnmatch.filter(game_skus, p) if _is_pattern(p) else [p] if p in catalog else []
+        if not found:
+            unmatched.append(p)
+        matched.update(found)
+    return [s for s in game_skus if s in matched], unmatched
+
+def _is_retryable(e: Exception) -> bool:
+    if isinstance(e, XsollaAPIError):
+        return e.status_code in RETRY_STATUSES
+    # The breaker of the host is open, retrying before it lets calls through again only adds to the load
+    if isinstance(e, CircuitOpenError):
+        return False
+    # Timeouts and connection errors of the transport
+    return True
+
+def _backoff(e: Exception, attempt: int) -> float:
+    if isinstance(e, XsollaAPIError) and e.retry_after is not None:
+        return min(e.retry_after, MAX_BACKOFF)
+    return min(BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1)
+
+
+class RateLimiter():
+    # Spaces the calls of every worker at least 1 / rate seconds apart, rate None for no limit
+    def __init__(self, rate: float = None) -> None:
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_call = 0
+
+    def wait(self, cancel_event: threading.Event = None) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(now, self.next_call)
+            self.next_call = call_at + self.interval
+        if call_at > now:
+            if cancel_event is not None:
+                cancel_event.wait(call_at - now)
+            else:
+                time.sleep(call_at - now)
+
+
+def sku_result(sku: str, status: str, attempts: int = 0, error: str = None) -> dict:
+    return {"sku": sku, "status": status, "ok": status in ("deleted", "already_deleted", "planned"), "attempts": attempts, "verified": None, "error": error}
+
+def delete_sku(x: XsollaProjectAPI, sku: str, limiter: RateLimiter, retries: int = DEFAULT_RETRIES, cancel_event: threading.Event = None) -> dict:
+    attempt = 0
+    while True:
+        if cancel_event is not None and cancel_event.is_set():
+            return sku_result(sku, "cancelled", attempt)
+        limiter.wait(cancel_event)
+        attempt = attempt + 1
+        try:
+            x.delete_game_by_sku(sku)
+            return sku_result(sku, "deleted", attempt)
+        except XsollaAPIError as e:
+            # The SKU was resolved from the catalog: it was deleted meanwhile, or by an earlier attempt
+            # whose answer was lost
+            if e.status_code == 404:
+                return sku_result(sku, "already_deleted", attempt)
+            error = e
+        except Exception as e:
+            error = e
+        if attempt > retries or not _is_retryable(error):
+            return sku_result(sku, "failed", attempt, str(error))
+        delay = _backoff(error, attempt - 1)
+        logger.warning(f"Deleting {sku} failed ({error}), retrying in {delay:.1f}s", extra=fields(sku=sku, attempt=attempt))
+        if cancel_event is not None:
+            cancel_event.wait(delay)
+        else:
+            time.sleep(delay)
+
+def delete_skus(x: XsollaProjectAPI, skus: list[str], workers: int = 4, rate: float = DEFAULT_RATE, retries: int = DEFAULT_RETRIES,
+                cancel_event: threading.Event = None, on_progress = None) -> list[dict]:
+    limiter = RateLimiter(rate)
+
+    def _run(sku: str) -> dict:
+        result = delete_sku(x, sku, limiter, retries, cancel_event)
+        if result["status"] == "failed":
+            logger.error(f"Failed to delete {sku} after {result['attempts']} attempts: {result['error']}", extra=fields(sku=sku, attempts=result["attempts"]))
+        elif result["status"] != "cancelled":
+            logger.info(f"SKU {sku} successfully deleted", extra=fields(sku=sku, attempts=result["attempts"]))
+        if on_progress is not None:
+            on_progress(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="delete") as pool:
+        return list(pool.map(_run, skus))
+
+def verify_deleted(results: list[dict], game_skus: list[str]) -> int:
+    # Marks the deleted SKUs against a fresh game list, the ones still there become failures. Returns
+    # how many are still there
+    remaining = set(game_skus)
+    still_there = 0
+    for r in results:
+        if r["status"] not in ("deleted", "already_deleted"):
+            continue
+        r["verified"] = r["sku"] not in remaining
+        if not r["verified"]:
+            still_there = still_there + 1
+            r["ok"] = False
+            r["error"] = "Still in the catalog after deletion"
+    return still_there
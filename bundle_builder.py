@@ -0,0 +1,196 @@
+import os, csv, json, logging
+from concurrent.futures import ThreadPoolExecutor
+from xsolla_api import XsollaProjectAPI
+from structured_log import fields
+
+# Creates bundles in bulk from definitions in a CSV or JSON file. All the content SKUs are checked
+# against one fetch of the catalog, prices come from PriceMatrix like in recalculate_bundle, and the
+# bundles are created from a pool of workers. A definition that fails validation only fails itself.
+#
+# CSV, one bundle per row (discount in %, content as SKU:QUANTITY separated by ";", quantity 1 if left out):
+#
+#   sku,name,content,discount,description,groups
+#   winter_pack,Winter Pack,game_a_key:1;game_b_key:1,15,,sales;winter
+#
+# JSON, a list of bundles or {"bundles": [...]}:
+#
+#   [{"sku": "winter_pack", "name": "Winter Pack", "content": [{"sku": "game_a_key", "quantity": 1}], "discount": 15}]
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURRENCY = "USD"
+
+def _localized(value) -> dict:
+    if isinstance(value, dict):
+        return value
+    return {"en": value} if value else {}
+
+def _parse_content(s: str) -> list[dict]:
+    content = []
+    for part in s.split(";"):
+        if not part.strip():
+            continue
+        sku, _, quantity = part.partition(":")
+        content.append({"sku": sku.strip(), "quantity": quantity.strip() or 1})
+    return content
+
+
+class BundleDefinition():
+    def __init__(self, sku: str, name, content: list[dict], discount: float = 0, description = None, groups: list[str] = None) -> None:
+        self.sku = sku
+        self.name = name
+        self.content = content
+        # Fraction, 0.15 for 15%
+        self.discount = discount
+        self.description = description
+        self.groups = groups or []
+        # Problems found while reading the definition, reported by errors() with the others
+        self.parse_errors = []
+
+    def __str__(self) -> str:
+        return "{} ({} items, {:.0%} off)".format(self.sku, len(self.content), self.discount)
+
+    def from_json(j: dict) -> "BundleDefinition":
+        # Never raises: what cannot be read is kept in parse_errors, so a bad definition only fails itself
+        parse_errors = []
+        if not isinstance(j, dict):
+            d = BundleDefinition("", None, [])
+            d.parse_errors.append(f"Invalid bundle definition {json.dumps(j)}, expected an object")
+            return d
+        content = j.get("content") or []
+        if isinstance(content, str):
+            content = _parse_content(content)
+        elif not isinstance(content, list):
+            parse_errors.append("Invalid content, expected a list of items")
+            content = []
+        valid_content = []
+        for n, c in enumerate(content):
+            if isinstance(c, dict) and c.get("sku"):
+                valid_content.append({"sku": str(c["sku"]).strip(), "quantity": c.get("quantity", 1)})
+            else:
+                parse_errors.append(f"Content item {n + 1} has no SKU")
+        groups = j.get("groups") or []
+        if isinstance(groups, str):
+            groups = [g.strip() for g in groups.split(";") if g.strip()]
+        discount = 0
+        try:
+            discount = float(str(j.get("discount") or 0).strip().rstrip("%")) / 100
+        except ValueError:
+            parse_errors.append(f"Invalid discount {j.get('discount')}")
+        d = BundleDefinition(
+            str(j.get("sku") or "").strip(),
+            j.get("name") or j.get("sku"),
+            valid_content,
+            discount,
+            j.get("description"),
+            groups)
+        d.parse_errors = parse_errors
+        return d
+
+    def errors(self) -> list[str]:
+        errors = list(self.parse_errors)
+        if not self.sku:
+            errors.append("Missing bundle SKU")
+        if not self.content:
+            errors.append("Bundle has no content")
+        for c in self.content:
+            try:
+                if int(c["quantity"]) < 1 or int(c["quantity"]) != float(c["quantity"]):
+                    raise ValueError()
+            except (TypeError, ValueError):
+                errors.append(f"Invalid quantity {c['quantity']} for {c['sku']}")
+        if self.discount < 0 or self.discount > 0.99:
+            errors.append("Invalid discount, it must be between 0 and 99%")
+        return errors
+
+    def content_json(self) -> list[dict]:
+        return [{"sku": c["sku"], "quantity": int(c["quantity"])} for c in self.content]
+
+    def to_payload(self, prices: list[dict]) -> dict:
+        return {
+            "sku": self.sku,
+            "name": _localized(self.name),
+            "description": _localized(self.description),
+            "groups": self.groups,
+            "content": self.content_json(),
+            "prices": prices,
+            "is_enabled": True,
+            "is_show_in_store": True
+        }
+
+
+def read_definitions(fn: str) -> list[BundleDefinition]:
+    if os.path.splitext(fn)[1].lower() == ".json":
+        with open(fn, mode="r", encoding="utf_8") as f:
+            data = json.load(f)
+        return [BundleDefinition.from_json(j) for j in (data["bundles"] if isinstance(data, dict) else data)]
+
+    with open(fn, mode="r", encoding="utf_8_sig", newline="") as f:
+        rows = [r for r in csv.DictReader(f) if any((v or "").strip() for v in r.values())]
+    if rows and not {"sku", "content"} <= set(rows[0]):
+        raise ValueError(f"{fn} must have at least the columns sku and content")
+    return [BundleDefinition.from_json(r) for r in rows]
+
+def price_bundles(definitions: list[BundleDefinition], catalog_items: list[dict], existing_skus: set[str]) -> list[dict]:
+    # Returns one plan entry per definition: {"sku", "payload", "error"}, the payload being None when the
+    # definition is invalid or one of its items is not in the catalog
+    from pricing import PriceMatrix
+
+    plan = []
+    seen = set()
+    known_skus = set(i["sku"] for i in catalog_items)
+    valid = []
+    for d in definitions:
+        errors = d.errors()
+        if d.sku in existing_skus:
+            errors.append("A bundle with this SKU already exists")
+        if d.sku in seen:
+            errors.append("Duplicate bundle SKU in the definitions")
+        seen.add(d.sku)
+        missing = [c["sku"] for c in d.content if c["sku"] not in known_skus]
+        if missing:
+            errors.append(f"Unknown SKUs: {', '.join(missing)}")
+        plan.append({"sku": d.sku, "payload": None, "error": "; ".join(errors) if errors else None})
+        if not errors:
+            valid.append((len(plan) - 1, d))
+
+    if not valid:
+        return plan
+
+    matrix = PriceMatrix.from_items(catalog_items)
+    quantities = matrix.quantities([d.content_json() for _, d in valid])
+    discounts = sorted(set(d.discount for _, d in valid))
+    totals = matrix.bundle_totals(quantities, discounts)
+    missing_currencies = matrix.missing_currencies(quantities)
+    for b, (n, d) in enumerate(valid):
+        for col in missing_currencies[b].nonzero()[0]:
+            logger.warning(f"Bundle {d.sku} will not have a price in {matrix.currencies[col]}, some of its items have none",
+                           extra=fields(bundle_sku=d.sku, currency=matrix.currencies[col]))
+        prices = matrix.to_prices(totals[b, discounts.index(d.discount)], DEFAULT_CURRENCY)
+        if not prices:
+            plan[n]["error"] = "No currency has a price for every item of the bundle"
+        else:
+            plan[n]["payload"] = d.to_payload(prices)
+    return plan
+
+def create_bundles(x: XsollaProjectAPI, plan: list[dict], workers: int = 4, cancel_event = None, on_progress = None) -> list[dict]:
+    def _run(entry: dict) -> dict:
+        result = {"sku": entry["sku"], "ok": False, "item_id": None, "prices": None, "error": entry["error"]}
+        if entry["payload"] is None:
+            logger.error(f"Skipping bundle {entry['sku']}: {entry['error']}", extra=fields(bundle_sku=entry["sku"]))
+        elif cancel_event is not None and cancel_event.is_set():
+            result["error"] = "cancelled"
+        else:
+            try:
+                item_id, _ = x.create_bundle(dict(entry["payload"]))
+                logger.info(f"Created bundle {entry['sku']}", extra=fields(bundle_sku=entry["sku"], item_id=item_id))
+                result.update(ok=True, item_id=item_id, prices=entry["payload"]["prices"])
+            except Exception as e:
+                logger.error(f"Failed to create bundle {entry['sku']}: {e}", extra=fields(bundle_sku=entry["sku"]))
+                result["error"] = str(e)
+        if on_progress is not None:
+            on_progress(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="bundles") as pool:
+        return list(pool.map(_run, plan))
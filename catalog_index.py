@@ -0,0 +1,91 @@
+import re, threading
+
+STEAM_APPID_SKU_REGEX = re.compile(r"^(\d+)_")
+
+def _localized(value, locale: str = "en-US") -> str:
+    if isinstance(value, dict):
+        return value.get(locale) or next(iter(value.values()), "") or ""
+    return value or ""
+
+def _default_price(item: dict) -> tuple[str, float] | None:
+    prices = item.get("prices") or [p for u in item.get("unit_items", []) for p in u.get("prices", [])]
+    for p in prices:
+        if p.get("is_default"):
+            return (p["currency"], p["amount"])
+    return (prices[0]["currency"], prices[0]["amount"]) if prices else None
+
+
+class CatalogEntry():
+    __slots__ = ("sku", "name", "type", "price", "steam_appid", "search_key")
+
+    def __init__(self, sku: str, name: str, type: str, price: tuple[str, float] | None) -> None:
+        self.sku = sku
+        self.name = name
+        self.type = type
+        self.price = price
+        m = STEAM_APPID_SKU_REGEX.match(sku)
+        self.steam_appid = m[1] if m is not None and type == "game" else None
+        self.search_key = f"{sku}\n{name}".lower()
+
+    def __str__(self) -> str:
+        return "{}/{}/{}".format(self.type, self.sku, self.name)
+
+    def from_json(j: dict, type: str) -> "CatalogEntry":
+        return CatalogEntry(j["sku"], _localized(j.get("name")), type, _default_price(j))
+
+
+class CatalogIndex():
+    SORT_KEYS = {
+        "sku": lambda e: e.sku.lower(),
+        "name": lambda e: e.name.lower(),
+        "type": lambda e: (e.type, e.sku.lower()),
+        "price": lambda e: (e.price is None, e.price[1] if e.price else 0)
+    }
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.entries = []
+        self.skus = set()
+        self._sorted = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add_items(self, items: list[dict], type: str) -> int:
+        # Entries are built outside the lock, the check against the known SKUs is done under it
+        entries = [CatalogEntry.from_json(i, type) for i in items]
+        with self.lock:
+            new_entries = []
+            for e in entries:
+                if e.sku not in self.skus:
+                    self.skus.add(e.sku)
+                    new_entries.append(e)
+            self.entries.extend(new_entries)
+            self._sorted = {}
+        return len(new_entries)
+
+    def snapshot(self) -> list[CatalogEntry]:
+        with self.lock:
+            return list(self.entries)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries = []
+            self.skus = set()
+            self._sorted = {}
+
+    def _sorted_entries(self, sort_key: str) -> list[CatalogEntry]:
+        # Sorted views are cached until the next page of items arrives, so typing in the filter only scans
+        with self.lock:
+            if sort_key not in self._sorted:
+                self._sorted[sort_key] = sorted(self.entries, key=self.SORT_KEYS[sort_key])
+            return self._sorted[sort_key]
+
+    def query(self, text: str = "", type: str = None, sort_key: str = "sku", descending: bool = False) -> list[CatalogEntry]:
+        entries = self._sorted_entries(sort_key)
+        terms = text.lower().split()
+        if type:
+            entries = [e for e in entries if e.type == type]
+        if terms:
+            entries = [e for e in entries if all(t in e.search_key for t in terms)]
+        return entries[::-1] if descending else entries
@@ -0,0 +1,158 @@
+import json, hashlib, logging
+from concurrent.futures import ThreadPoolExecutor
+from xsolla_api import XsollaProjectAPI
+from structured_log import fields
+
+# Mirrors games and bundles from a source project to a target project. Both catalogs are listed,
+# every item is reduced to the payload we would PUT (read-only fields dropped, prices and groups in a
+# stable order) and hashed; only items whose hash differs are written. An unchanged catalog costs
+# the list requests of the two snapshots and nothing else.
+
+logger = logging.getLogger(__name__)
+
+MIRROR_TYPES = ("game", "bundle")
+MIRROR_PAGE_LIMIT = 50
+READ_ONLY_FIELDS = ("item_id", "has_keys", "is_deleted", "type", "virtual_prices")
+
+def _normalize_prices(prices: list[dict]) -> list[dict]:
+    return sorted(({
+        "amount": float(p["amount"]),
+        "currency": p["currency"],
+        "is_default": bool(p.get("is_default")),
+        "is_enabled": p.get("is_enabled", True)
+        } for p in prices), key=lambda p: p["currency"])
+
+def normalize_item(item: dict, item_type: str) -> dict:
+    payload = {k: v for k, v in item.items() if k not in READ_ONLY_FIELDS}
+    payload["groups"] = sorted(g["external_id"] if isinstance(g, dict) else g for g in item.get("groups", []))
+    # The API rejects an empty periods list on PUT
+    if not payload.get("periods"):
+        payload.pop("periods", None)
+    if "prices" in payload:
+        payload["prices"] = _normalize_prices(payload["prices"])
+
+    if item_type == "game":
+        payload["unit_items"] = sorted(({
+            **{k: v for k, v in u.items() if k not in READ_ONLY_FIELDS},
+            "prices": _normalize_prices(u.get("prices", []))
+            } for u in item.get("unit_items", [])), key=lambda u: u["sku"])
+    elif item_type == "bundle":
+        payload["content"] = sorted(({"sku": c["sku"], "quantity": c["quantity"]} for c in item.get("content", [])), key=lambda c: c["sku"])
+    return payload
+
+def item_hash(payload: dict) -> str:
+    data = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode("utf_8"), digest_size=16).hexdigest()
+
+
+class CatalogSnapshot():
+    def __init__(self, items: dict[str, dict[str, dict]]) -> None:
+        # items[type][sku] -> normalized payload
+        self.items = items
+        self.hashes = {t: {sku: item_hash(p) for sku, p in by_sku.items()} for t, by_sku in items.items()}
+
+    def __len__(self) -> int:
+        return sum(len(i) for i in self.items.values())
+
+    def from_project(x: XsollaProjectAPI, types: tuple[str] = MIRROR_TYPES) -> "CatalogSnapshot":
+        items = {}
+        for t in types:
+            items[t] = {i["sku"]: normalize_item(i, t) for page in x.iter_item_pages(t, limit=MIRROR_PAGE_LIMIT) for i in page}
+        return CatalogSnapshot(items)
+
+
+class MirrorAction():
+    def __init__(self, action: str, item_type: str, sku: str, payload: dict = None) -> None:
+        self.action = action
+        self.item_type = item_type
+        self.sku = sku
+        self.payload = payload
+
+    def __str__(self) -> str:
+        return "{} {}/{}".format(self.action, self.item_type, self.sku)
+
+    def to_json(self) -> dict:
+        return {"action": self.action, "type": self.item_type, "sku": self.sku}
+
+
+class MirrorPlan():
+    def __init__(self, creates: list[MirrorAction], updates: list[MirrorAction], deletes: list[MirrorAction], unchanged: int) -> None:
+        self.creates = creates
+        self.updates = updates
+        self.deletes = deletes
+        self.unchanged = unchanged
+
+    def __len__(self) -> int:
+        return len(self.creates) + len(self.updates) + len(self.deletes)
+
+    def summary(self) -> dict:
+        return {"create": len(self.creates), "update": len(self.updates), "delete": len(self.deletes), "unchanged": self.unchanged}
+
+    def to_json(self) -> dict:
+        return dict(self.summary(), actions=[a.to_json() for a in self.creates + self.updates + self.deletes])
+
+    def phases(self) -> list[list[MirrorAction]]:
+        # Games first, so new game keys exist before the bundles that contain them are written, and
+        # bundles are deleted before the games they contain
+        return [
+            [a for a in self.creates + self.updates if a.item_type == "game"],
+            [a for a in self.creates + self.updates if a.item_type != "game"],
+            [a for a in self.deletes if a.item_type != "game"],
+            [a for a in self.deletes if a.item_type == "game"]
+        ]
+
+
+def plan_mirror(source: CatalogSnapshot, target: CatalogSnapshot, delete_missing: bool = False) -> MirrorPlan:
+    creates, updates, deletes = [], [], []
+    unchanged = 0
+    for t, source_hashes in source.hashes.items():
+        target_hashes = target.hashes.get(t, {})
+        for sku, h in source_hashes.items():
+            if sku not in target_hashes:
+                creates.append(MirrorAction("create", t, sku, source.items[t][sku]))
+            elif target_hashes[sku] != h:
+                updates.append(MirrorAction("update", t, sku, source.items[t][sku]))
+            else:
+                unchanged = unchanged + 1
+        if delete_missing:
+            deletes.extend(MirrorAction("delete", t, sku) for sku in target_hashes if sku not in source_hashes)
+    return MirrorPlan(creates, updates, deletes, unchanged)
+
+def _apply_action(x: XsollaProjectAPI, a: MirrorAction) -> None:
+    match (a.action, a.item_type):
+        case ("create", "game"):
+            x.create_game(a.payload)
+        case ("update", "game"):
+            x.update_game_by_sku(a.sku, dict(a.payload))
+        case ("delete", "game"):
+            x.delete_game_by_sku(a.sku)
+        case ("create", "bundle"):
+            x.create_bundle(dict(a.payload))
+        case ("update", "bundle"):
+            x.update_bundle(a.sku, dict(a.payload))
+        case ("delete", "bundle"):
+            x.delete_bundle(a.sku)
+        case _:
+            raise Exception(f"Unsupported mirror action {a}")
+
+def apply_plan(x: XsollaProjectAPI, plan: MirrorPlan, workers: int = 4, cancel_event = None, on_progress = None) -> list[dict]:
+    results = []
+
+    def _run(a: MirrorAction) -> dict:
+        if cancel_event is not None and cancel_event.is_set():
+            return {**a.to_json(), "ok": False, "error": "cancelled"}
+        try:
+            _apply_action(x, a)
+            logger.info(f"{a.action.capitalize()}d {a.item_type} {a.sku}", extra=fields(action=a.action, type=a.item_type, sku=a.sku))
+            result = {**a.to_json(), "ok": True, "error": None}
+        except Exception as e:
+            logger.error(f"Failed to {a.action} {a.item_type} {a.sku}: {e}", extra=fields(action=a.action, type=a.item_type, sku=a.sku))
+            result = {**a.to_json(), "ok": False, "error": str(e)}
+        if on_progress is not None:
+            on_progress(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mirror") as pool:
+        for phase in plan.phases():
+            results.extend(pool.map(_run, phase))
+    return results
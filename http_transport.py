@@ -0,0 +1,131 @@
+import gzip, threading
+import json_codec
+
+# Transports of the Xsolla admin clients. "requests" is what the clients always did: HTTP/1.1 with a
+# new connection per call. "httpx" keeps a pool of HTTP/1.1 connections, "http2" multiplexes the
+# concurrent requests of a bulk job over one HTTP/2 connection (pip install "httpx[http2,brotli]").
+# Responses come back gzip (brotli when installed) compressed with every transport; compress_requests
+# also gzips the JSON bodies of POST/PUT requests from REQUEST_COMPRESSION_MIN_BYTES on.
+#
+#   http_transport.configure("http2", compress_requests=True)       # default of every client
+#   x = XsollaProjectAPI(api_key, project_id, transport=make_transport("http2"))
+
+TRANSPORT_NAMES = ("requests", "httpx", "http2")
+REQUEST_COMPRESSION_MIN_BYTES = 1024
+
+def _encode_json(payload, headers: dict, compress: bool) -> bytes:
+    body = json_codec.dumps(payload)
+    headers["Content-Type"] = "application/json"
+    if compress and len(body) >= REQUEST_COMPRESSION_MIN_BYTES:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return body
+
+
+class RequestsTransport():
+    def __init__(self, compress_requests: bool = False, verify = True) -> None:
+        self.name = "requests"
+        self.compress_requests = compress_requests
+        self.verify = verify
+
+    def request(self, method: str, url: str, **kwargs):
+        import requests
+        if self.compress_requests and kwargs.get("json") is not None:
+            headers = dict(kwargs.get("headers") or {})
+            kwargs["data"] = _encode_json(kwargs.pop("json"), headers, True)
+            kwargs["headers"] = headers
+        return requests.request(method, url, verify=self.verify, **kwargs)
+
+    def close(self) -> None:
+        pass
+
+
+class HttpxResponse():
+    # The parts of requests.Response the clients use
+    def __init__(self, response) -> None:
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.http_version = response.http_version
+
+    @property
+    def content(self) -> bytes:
+        return self.response.read()
+
+    def iter_content(self, chunk_size: int = None):
+        return self.response.iter_bytes(chunk_size=chunk_size)
+
+    def close(self) -> None:
+        self.response.close()
+
+    def __enter__(self) -> "HttpxResponse":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class HttpxTransport():
+    def __init__(self, http2: bool = True, compress_requests: bool = False, verify = True, max_connections: int = 20) -> None:
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("The httpx and http2 transports need httpx, install it with: pip install \"httpx[http2,brotli]\"")
+        self.name = "http2" if http2 else "httpx"
+        self.compress_requests = compress_requests
+        self.httpx = httpx
+        # The client is thread safe: on HTTP/2 the requests of every thread share one connection per host
+        self.client = httpx.Client(http2=http2, verify=verify, timeout=None, limits=httpx.Limits(max_connections=max_connections))
+
+    def request(self, method: str, url: str, params: dict = None, json = None, data: bytes = None, headers: dict = None,
+                auth: tuple = None, stream: bool = False, timeout: float = None) -> HttpxResponse:
+        headers = dict(headers or {})
+        content = data
+        if json is not None:
+            content = _encode_json(json, headers, self.compress_requests)
+        if isinstance(timeout, tuple):
+            timeout = self.httpx.Timeout(timeout[1], connect=timeout[0])
+        request = self.client.build_request(method, url, params=params, headers=headers, content=content, timeout=timeout)
+        response = self.client.send(request, auth=(str(auth[0]), str(auth[1])) if auth else None, stream=stream)
+        return HttpxResponse(response)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def make_transport(name: str = "requests", compress_requests: bool = False, verify = True):
+    if name == "requests":
+        return RequestsTransport(compress_requests, verify)
+    if name in ("httpx", "http2"):
+        return HttpxTransport(name == "http2", compress_requests, verify)
+    raise ValueError(f"Unknown transport {name}, expected one of {', '.join(TRANSPORT_NAMES)}")
+
+DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+def configure(name: str = "requests", compress_requests: bool = False, verify = True) -> None:
+    # Sets the transport of the clients created without one. It is built right away, so a missing
+    # httpx shows up here rather than on the first request
+    global DEFAULT
+    transport = make_transport(name, compress_requests, verify)
+    with _DEFAULT_LOCK:
+        previous, DEFAULT = DEFAULT, transport
+    if previous is not None:
+        previous.close()
+
+def default_transport():
+    global DEFAULT
+    transport = DEFAULT
+    if transport is None:
+        with _DEFAULT_LOCK:
+            if DEFAULT is None:
+                DEFAULT = RequestsTransport()
+            transport = DEFAULT
+    return transport
+
+def close() -> None:
+    global DEFAULT
+    with _DEFAULT_LOCK:
+        previous, DEFAULT = DEFAULT, None
+    if previous is not None:
+        previous.close()
@@ -0,0 +1,162 @@
+import threading, time, itertools, logging
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor
+from structured_log import fields
+
+logger = logging.getLogger(__name__)
+
+class JobStatus(Enum):
+    queued = 0
+    running = 1
+    done = 2
+    failed = 3
+    cancelled = 4
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job():
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, fn, args: tuple, kwargs: dict, on_change=None) -> None:
+        self.id = next(Job._ids)
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = JobStatus.queued
+        self.total = None
+        self.completed = 0
+        self.failures = 0
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._on_change = on_change
+
+    def __str__(self) -> str:
+        s = f"#{self.id} {self.name} [{self.status}]"
+        if self.total:
+            s = f"{s} {self.completed}/{self.total}"
+        eta = self.eta()
+        if eta is not None:
+            s = f"{s}, ETA {int(eta)}s"
+        return s
+
+    def _changed(self) -> None:
+        if self._on_change is not None:
+            self._on_change(self)
+
+    def is_active(self) -> bool:
+        return self.status in (JobStatus.queued, JobStatus.running)
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+        self._changed()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job #{self.id} ({self.name}) was cancelled")
+
+    def set_total(self, total: int) -> None:
+        self.total = total
+        self._changed()
+
+    def advance(self, n: int = 1) -> None:
+        self.completed = self.completed + n
+        self._changed()
+
+    def progress(self) -> float | None:
+        if not self.total:
+            return None
+        return self.completed / self.total
+
+    def eta(self) -> float | None:
+        if self.status != JobStatus.running or not self.total or self.completed == 0:
+            return None
+        elapsed = time.monotonic() - self.started_at
+        return elapsed / self.completed * (self.total - self.completed)
+
+    def for_each(self, items: list, fn) -> int:
+        # Runs fn on every item, checking for cancellation between items. Errors are reported and counted
+        # instead of aborting the remaining items.
+        self.set_total(len(items))
+        for item in items:
+            self.check_cancelled()
+            try:
+                fn(item)
+            except JobCancelled:
+                raise
+            except Exception as e:
+                self.failures = self.failures + 1
+                logger.error(str(e), extra=fields(job_id=self.id, job=self.name, item=item))
+            self.advance()
+        return self.failures
+
+
+class JobRunner():
+    def __init__(self, max_workers: int = 3, on_change=None) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.on_change = on_change
+        self.lock = threading.Lock()
+        self._jobs = []
+
+    def _changed(self, job: Job) -> None:
+        if self.on_change is not None:
+            self.on_change(job)
+
+    def submit(self, name: str, fn, *args, **kwargs) -> Job:
+        job = Job(name, fn, args, kwargs, on_change=self._changed)
+        with self.lock:
+            self._jobs.append(job)
+        self.executor.submit(self._run, job)
+        self._changed(job)
+        return job
+
+    def jobs(self) -> list[Job]:
+        with self.lock:
+            return list(self._jobs)
+
+    def active_jobs(self) -> list[Job]:
+        return [j for j in self.jobs() if j.is_active()]
+
+    def clear_finished(self, keep: int = 0) -> None:
+        with self.lock:
+            finished = [j for j in self._jobs if not j.is_active()]
+            drop = set(j.id for j in finished[:max(0, len(finished) - keep)])
+            self._jobs = [j for j in self._jobs if j.id not in drop]
+
+    def _run(self, job: Job) -> None:
+        if job.cancel_event.is_set():
+            job.status = JobStatus.cancelled
+            job.finished_at = time.monotonic()
+            self._changed(job)
+            return
+
+        job.status = JobStatus.running
+        job.started_at = time.monotonic()
+        self._changed(job)
+        try:
+            job.result = job.fn(job, *job.args, **job.kwargs)
+            job.status = JobStatus.done if job.failures == 0 else JobStatus.failed
+        except JobCancelled as e:
+            job.status = JobStatus.cancelled
+            logger.warning(str(e), extra=fields(job_id=job.id, job=job.name))
+        except Exception as e:
+            job.status = JobStatus.failed
+            job.error = e
+            logger.error(str(e), extra=fields(job_id=job.id, job=job.name))
+        job.finished_at = time.monotonic()
+        self._changed(job)
+
+    def shutdown(self, cancel: bool = True) -> None:
+        if cancel:
+            for job in self.active_jobs():
+                job.cancel()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,164 @@
+import re, json, codecs
+
+# JSON decoding for the Xsolla and Steam clients. loads() uses orjson or msgspec when one of them is
+# installed and the stdlib json module otherwise. JsonArrayStream decodes one array of a document
+# (GetAppList's applist.apps, the items of an item list page...) element by element while the
+# response is still downloading, so the whole document never has to be held in memory.
+
+try:
+    import orjson
+
+    BACKEND = "orjson"
+    loads = orjson.loads
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    try:
+        import msgspec
+
+        BACKEND = "msgspec"
+        _decoder = msgspec.json.Decoder()
+        _encoder = msgspec.json.Encoder()
+
+        def loads(data):
+            return _decoder.decode(data.encode("utf_8") if isinstance(data, str) else data)
+
+        def dumps(obj) -> bytes:
+            return _encoder.encode(obj)
+    except ImportError:
+        BACKEND = "json"
+
+        def loads(data):
+            return json.loads(data)
+
+        def dumps(obj) -> bytes:
+            return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf_8")
+
+STREAM_CHUNK_SIZE = 64 * 1024
+WHITESPACE_REGEX = re.compile(r"[ \t\n\r]*")
+
+
+class JsonArrayStream():
+    # Iterates over the elements of the array found at path, e.g. ("applist", "apps"), or at the root
+    # for path (). Every other value met on the way is decoded whole and kept in envelope under its
+    # dotted path ("has_more", "total_items_count"...); it is complete once iteration is over.
+    # Elements are decoded one at a time with the stdlib scanner, which can resume at any offset.
+
+    def __init__(self, chunks, path: tuple[str] = ()) -> None:
+        self.chunks = iter(chunks)
+        self.path = tuple(path)
+        self.envelope = {}
+        self._decoder = codecs.getincrementaldecoder("utf_8")()
+        self._scanner = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _more(self) -> bool:
+        if self._eof:
+            return False
+        # Only the unconsumed tail (at most one partial value) is kept when the next chunk comes in
+        for chunk in self.chunks:
+            text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self._buf = self._buf[self._pos:] + text
+                self._pos = 0
+                return True
+        self._buf = self._buf[self._pos:] + self._decoder.decode(b"", final=True)
+        self._pos = 0
+        self._eof = True
+        return False
+
+    def _peek(self) -> str:
+        while True:
+            self._pos = WHITESPACE_REGEX.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._more():
+                raise ValueError("Unexpected end of JSON document")
+
+    def _expect(self, c: str) -> None:
+        if self._peek() != c:
+            raise ValueError(f"Expected '{c}' at offset {self._pos}, found '{self._buf[self._pos]}'")
+        self._pos = self._pos + 1
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self._scanner.raw_decode(self._buf, self._pos)
+                # A number ending exactly at the end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._more()
+
+    def _array(self, key: str):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos = self._pos + 1
+            return
+        scan_once = self._scanner.scan_once
+        skip_whitespace = WHITESPACE_REGEX.match
+        while True:
+            # Fast path for the common case: the whole element and the separator after it are buffered.
+            # A failed scan is costly (the error counts lines up to the offset), so it only happens
+            # once per chunk, on the element cut in two.
+            buf = self._buf
+            pos = skip_whitespace(buf, self._pos).end()
+            try:
+                value, end = scan_once(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                end = len(buf)
+            if end < len(buf):
+                self._pos = end
+            else:
+                self._pos = pos
+                value = self._value()
+            yield value
+            c = self._buf[self._pos] if self._pos < len(self._buf) else None
+            if c != "," and c != "]":
+                c = self._peek()
+            self._pos = self._pos + 1
+            if c == "]":
+                return
+            if c != ",":
+                raise ValueError(f"Expected ',' or ']' in {key or 'root'} array at offset {self._pos - 1}")
+
+    def _object(self, depth: int, prefix: str):
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos = self._pos + 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            dotted = f"{prefix}{key}"
+            if depth < len(self.path) and key == self.path[depth]:
+                if depth + 1 == len(self.path):
+                    yield from self._array(dotted)
+                else:
+                    yield from self._object(depth + 1, f"{dotted}.")
+            else:
+                self.envelope[dotted] = self._value()
+            c = self._peek()
+            self._pos = self._pos + 1
+            if c == "}":
+                return
+            if c != ",":
+                raise ValueError(f"Expected ',' or '}}' after {dotted} at offset {self._pos - 1}")
+
+    def __iter__(self):
+        if self.path:
+            yield from self._object(0, "")
+        else:
+            yield from self._array("")
+
+
+def iter_response_array(response, path: tuple[str] = (), chunk_size: int = STREAM_CHUNK_SIZE) -> JsonArrayStream:
+    # response must come from requests with stream=True
+    return JsonArrayStream(response.iter_content(chunk_size=chunk_size), path)
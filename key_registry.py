@@ -0,0 +1,245 @@
+import os, json, mmap, math, hashlib, struct
+from bisect import bisect_left
+from datetime import datetime
+
+# Keys are tracked by a 64-bit blake2b digest. Each generated batch becomes a sorted
+# segment file; small segments are merged LSM-style so lookups only bisect a handful
+# of memory-mapped arrays. A Bloom filter in front skips the index for new keys.
+# numpy is only imported when a batch is added or a filter rebuilt, lookups do without it.
+
+BLOOM_CHUNK = 1 << 20
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf_8"), digest_size=8).digest(), "little")
+
+
+class BloomFilter():
+    HEADER = struct.Struct("<QQQ")
+
+    def __init__(self, num_bits: int, num_hashes: int, count: int = 0, bits: bytearray = None) -> None:
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    def for_capacity(capacity: int, error_rate: float = 0.001) -> "BloomFilter":
+        num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return BloomFilter(num_bits, num_hashes)
+
+    def capacity(self, error_rate: float = 0.001) -> int:
+        return int(self.num_bits * (math.log(2) ** 2) / -math.log(error_rate))
+
+    def _positions(self, h: int):
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, h: int) -> None:
+        bits = self.bits
+        for p in self._positions(h):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count = self.count + 1
+
+    def add_many(self, hashes) -> None:
+        # Same positions as _positions, for a uint64 array of hashes at once
+        import numpy as np
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        for start in range(0, len(hashes), BLOOM_CHUNK):
+            h = np.asarray(hashes[start:start + BLOOM_CHUNK], dtype=np.uint64)
+            h1 = h & np.uint64(0xFFFFFFFF)
+            h2 = (h >> np.uint64(32)) | np.uint64(1)
+            # Below 2**37, no overflow
+            p = ((h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.num_bits)).ravel()
+            np.bitwise_or.at(bits, p >> np.uint64(3), (np.uint8(1) << (p & np.uint64(7)).astype(np.uint8)))
+        self.count = self.count + len(hashes)
+
+    def __contains__(self, h: int) -> bool:
+        bits = self.bits
+        for p in self._positions(h):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def load(fn: str) -> "BloomFilter":
+        with open(fn, mode="rb") as f:
+            num_bits, num_hashes, count = BloomFilter.HEADER.unpack(f.read(BloomFilter.HEADER.size))
+            bits = bytearray(f.read())
+        return BloomFilter(num_bits, num_hashes, count, bits)
+
+    def save(self, fn: str) -> None:
+        with open(fn + ".tmp", mode="wb") as f:
+            f.write(self.HEADER.pack(self.num_bits, self.num_hashes, self.count))
+            f.write(self.bits)
+        os.replace(fn + ".tmp", fn)
+
+
+class _Segment():
+    def __init__(self, fn: str) -> None:
+        self.fn = fn
+        self.size = os.path.getsize(fn) // 8
+        self._file = None
+        self._mmap = None
+        self.hashes = memoryview(b"").cast("Q")
+        if self.size > 0:
+            self._file = open(fn, mode="rb")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.hashes = memoryview(self._mmap).cast("Q")
+
+    def __contains__(self, h: int) -> bool:
+        i = bisect_left(self.hashes, h)
+        return i < self.size and self.hashes[i] == h
+
+    def array(self):
+        import numpy as np
+        if self._mmap is None:
+            return np.zeros(0, dtype=np.uint64)
+        return np.frombuffer(self._mmap, dtype=np.uint64)
+
+    def close(self) -> None:
+        self.hashes.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+
+
+class KeyRegistry():
+    MANIFEST_FN = "registry.json"
+    KEYS_FN = "keys.txt"
+    BLOOM_FN = "bloom.bin"
+    MERGE_FANOUT = 4
+
+    def __init__(self, path: str, use_bloom_filter: bool = True, bloom_capacity: int = 10_000_000) -> None:
+        self.path = path
+        self.use_bloom_filter = use_bloom_filter
+        self.bloom_capacity = bloom_capacity
+        os.makedirs(path, exist_ok=True)
+
+        manifest_fn = os.path.join(path, self.MANIFEST_FN)
+        if os.path.exists(manifest_fn):
+            with open(manifest_fn, mode="r", encoding="utf_8") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"next_segment": 0, "segments": [], "batches": []}
+
+        self.segments = [_Segment(os.path.join(path, s)) for s in self.manifest["segments"]]
+
+        self.bloom = None
+        if use_bloom_filter:
+            bloom_fn = os.path.join(path, self.BLOOM_FN)
+            if os.path.exists(bloom_fn):
+                self.bloom = BloomFilter.load(bloom_fn)
+            if self.bloom is None or self.bloom.count != len(self):
+                self._rebuild_bloom_filter()
+
+    def __len__(self) -> int:
+        return sum(s.size for s in self.segments)
+
+    def __contains__(self, key: str) -> bool:
+        return self._contains_hash(_key_hash(key))
+
+    def _contains_hash(self, h: int) -> bool:
+        if self.bloom is not None and h not in self.bloom:
+            return False
+        return any(h in s for s in self.segments)
+
+    def find_existing(self, keys: list[str]) -> list[str]:
+        seen = set()
+        existing = []
+        for key in keys:
+            h = _key_hash(key)
+            if h in seen or self._contains_hash(h):
+                existing.append(key)
+            seen.add(h)
+        return existing
+
+    def add_batch(self, keys: list[str], source: str = "") -> int:
+        existing = self.find_existing(keys)
+        if existing:
+            raise Exception(f"{len(existing)} keys are already registered, e.g. {existing[0]}")
+
+        import numpy as np
+        hashes = np.sort(np.fromiter((_key_hash(k) for k in keys), dtype=np.uint64, count=len(keys)))
+        self._write_segment(hashes)
+        self._merge_segments()
+
+        batch_id = len(self.manifest["batches"]) + 1
+        self.manifest["batches"].append({
+            "batch": batch_id,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "count": len(keys),
+            "source": source
+        })
+        self._save_manifest()
+
+        # Only once the index has them: keys.txt never lists a key that is not registered
+        with open(os.path.join(self.path, self.KEYS_FN), mode="a", encoding="utf_8") as f:
+            f.writelines(k + "\n" for k in keys)
+
+        if self.bloom is not None:
+            if len(self) > self.bloom.capacity():
+                self.bloom_capacity = max(self.bloom_capacity, len(self) * 2)
+                self._rebuild_bloom_filter()
+            else:
+                self.bloom.add_many(hashes)
+                self.bloom.save(os.path.join(self.path, self.BLOOM_FN))
+
+        return batch_id
+
+    def batches(self) -> list[dict]:
+        return list(self.manifest["batches"])
+
+    def iter_keys(self):
+        fn = os.path.join(self.path, self.KEYS_FN)
+        if not os.path.exists(fn):
+            return
+        with open(fn, mode="r", encoding="utf_8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def close(self) -> None:
+        for s in self.segments:
+            s.close()
+        self.segments = []
+
+    def _write_segment(self, hashes) -> None:
+        fn = f"{self.manifest['next_segment']:06d}.idx"
+        self.manifest["next_segment"] = self.manifest["next_segment"] + 1
+        with open(os.path.join(self.path, fn), mode="wb") as f:
+            hashes.tofile(f)
+        self.manifest["segments"].append(fn)
+        self.segments.append(_Segment(os.path.join(self.path, fn)))
+
+    def _merge_segments(self) -> None:
+        import numpy as np
+        old_files = []
+        while len(self.segments) > 1 and self.segments[-2].size <= self.MERGE_FANOUT * self.segments[-1].size:
+            newer = self.segments.pop()
+            older = self.segments.pop()
+            self.manifest["segments"] = self.manifest["segments"][:-2]
+            # Both runs are already sorted, so the stable sort (timsort) merges them in linear time
+            merged = np.sort(np.concatenate([older.array(), newer.array()]), kind="stable")
+            older.close()
+            newer.close()
+            old_files.extend([older.fn, newer.fn])
+            self._write_segment(merged)
+
+        # Only drop merged segments once the manifest no longer points at them
+        if old_files:
+            self._save_manifest()
+            for fn in old_files:
+                os.remove(fn)
+
+    def _rebuild_bloom_filter(self) -> None:
+        self.bloom = BloomFilter.for_capacity(max(self.bloom_capacity, len(self) * 2))
+        for s in self.segments:
+            self.bloom.add_many(s.array())
+        self.bloom.save(os.path.join(self.path, self.BLOOM_FN))
+
+    def _save_manifest(self) -> None:
+        fn = os.path.join(self.path, self.MANIFEST_FN)
+        with open(fn + ".tmp", mode="w", encoding="utf_8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(fn + ".tmp", fn)
@@ -0,0 +1,224 @@
+import os, time, logging, threading
+from datetime import datetime
+import numpy as np
+from structured_log import fields
+
+# Steam prices seen by retrieve_pricing_per_appid, one row per (appid, currency) whenever the price
+# differs from the last one stored, so the history stays compact and every row after the first of
+# its series is a price change. Rows are appended to one file per column and read back through
+# memory maps; index.i8 keeps the row numbers sorted by (appid, currency), rows of a series being in
+# the order they were appended, and is extended when new rows show up.
+#
+# Amounts are stored as Steam reports them, in hundredths of the currency (JPY too), currencies by
+# their ISO 4217 numeric code and timestamps as Unix seconds.
+
+logger = logging.getLogger(__name__)
+
+CURRENCY_CODES = {
+    "USD": 840, "GBP": 826, "EUR": 978, "RUB": 643, "BRL": 986, "JPY": 392, "MYR": 458, "PHP": 608, "SGD": 702,
+    "THB": 764, "VND": 704, "KRW": 410, "UAH": 980, "MXN": 484, "CAD": 124, "AUD": 36, "NZD": 554, "NOK": 578,
+    "PLN": 985, "CHF": 756, "CNY": 156, "INR": 356, "CLP": 152, "PEN": 604, "COP": 170, "ZAR": 710, "HKD": 344,
+    "TWD": 901, "SAR": 682, "AED": 784, "ILS": 376, "KZT": 398, "KWD": 414, "QAR": 634, "CRC": 188, "UYU": 858
+}
+CURRENCY_NAMES = np.full(1000, "", dtype="U3")
+CURRENCY_NAMES[list(CURRENCY_CODES.values())] = list(CURRENCY_CODES)
+
+COLUMNS = {"appid": np.int32, "currency": np.int16, "timestamp": np.int64, "amount": np.int64}
+RECORD_DTYPE = np.dtype([("appid", np.int32), ("currency", "U3"), ("timestamp", np.int64), ("amount", np.int64)])
+CHANGE_DTYPE = np.dtype([("appid", np.int32), ("currency", "U3"), ("timestamp", np.int64), ("old_amount", np.int64), ("amount", np.int64)])
+
+def _timestamp(t) -> int:
+    if t is None:
+        return int(time.time())
+    return int(t.timestamp()) if isinstance(t, datetime) else int(t)
+
+def _currency_codes(currencies: list[str] | None) -> np.ndarray | None:
+    if currencies is None:
+        return None
+    currencies = [c.strip().upper() for c in currencies]
+    unknown = [c for c in currencies if c not in CURRENCY_CODES]
+    if unknown:
+        raise ValueError(f"Unknown currency {unknown[0]}")
+    return np.array([CURRENCY_CODES[c] for c in currencies], dtype=np.int16)
+
+def _records(dtype: np.dtype, **columns) -> np.ndarray:
+    n = len(columns["appid"])
+    records = np.empty(n, dtype=dtype)
+    for name, values in columns.items():
+        records[name] = CURRENCY_NAMES[values] if name == "currency" else values
+    return records
+
+
+class PriceHistory():
+    INDEX_FN = "index.i8"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._repair()
+        self._columns = None
+        self._order = None
+        self._group_keys = None
+        self._latest = None
+        self._latest_map = None
+        self._last_timestamp = 0
+
+    def _column_fn(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.{np.dtype(COLUMNS[name]).kind}{np.dtype(COLUMNS[name]).itemsize}")
+
+    def _file_rows(self) -> dict[str, int]:
+        rows = {}
+        for name, dtype in COLUMNS.items():
+            fn = self._column_fn(name)
+            rows[name] = os.path.getsize(fn) // np.dtype(dtype).itemsize if os.path.exists(fn) else 0
+        return rows
+
+    def _repair(self) -> None:
+        # A crash between the column writes leaves some columns longer than others, their extra rows are dropped
+        rows = self._file_rows()
+        n = min(rows.values())
+        for name, count in rows.items():
+            if count > n:
+                with open(self._column_fn(name), mode="r+b") as f:
+                    f.truncate(n * np.dtype(COLUMNS[name]).itemsize)
+
+    def __len__(self) -> int:
+        return min(self._file_rows().values())
+
+    def _load(self) -> dict[str, np.ndarray]:
+        # Maps the columns (and brings the index up to date) on first use after each append
+        if self._columns is not None:
+            return self._columns
+        n = len(self)
+        columns = {name: np.memmap(self._column_fn(name), dtype=dtype, mode="r", shape=(n,)) if n > 0 else np.empty(0, dtype=dtype)
+                   for name, dtype in COLUMNS.items()}
+        self._columns = columns
+        self._update_index(columns, n)
+        return columns
+
+    def _update_index(self, columns: dict[str, np.ndarray], n: int) -> None:
+        group_keys = columns["appid"].astype(np.int64) * 1000 + columns["currency"]
+        index_fn = os.path.join(self.path, self.INDEX_FN)
+        indexed = os.path.getsize(index_fn) // 8 if os.path.exists(index_fn) else 0
+        if indexed > n:
+            indexed = 0
+        order = np.fromfile(index_fn, dtype=np.int64, count=indexed) if indexed > 0 else np.empty(0, dtype=np.int64)
+
+        if indexed < n:
+            # Rows of the tail come after every indexed row of their series, so they go in after them
+            tail = indexed + np.argsort(group_keys[indexed:], kind="stable")
+            positions = np.searchsorted(group_keys[order], group_keys[tail], side="right")
+            order = np.insert(order, positions, tail)
+            with open(index_fn + ".tmp", mode="wb") as f:
+                order.tofile(f)
+            os.replace(index_fn + ".tmp", index_fn)
+
+        self._order = order
+        self._group_keys = group_keys[order]
+        self._latest = None
+
+    def _latest_rows(self) -> np.ndarray:
+        # Row of the newest price of every series: the last one of each run of equal keys in index order
+        if self._latest is None:
+            keys = self._group_keys
+            ends = np.flatnonzero(np.append(keys[1:] != keys[:-1], True)) if len(keys) > 0 else np.empty(0, dtype=np.int64)
+            self._latest = self._order[ends]
+        return self._latest
+
+    def _filter(self, columns: dict[str, np.ndarray], rows: np.ndarray, appids, currencies) -> np.ndarray:
+        if appids is not None:
+            rows = rows[np.isin(columns["appid"][rows], np.asarray(list(appids), dtype=np.int32))]
+        codes = _currency_codes(currencies)
+        if codes is not None:
+            rows = rows[np.isin(columns["currency"][rows], codes)]
+        return rows
+
+    def record(self, appid: int, prices: dict[str, int], t = None) -> int:
+        # prices: currency -> amount in hundredths, e.g. {"USD": 1999}. Returns the number of rows written
+        timestamp = _timestamp(t)
+        with self.lock:
+            # Later writes only need the newest price of each series, the index is brought up to date on the next read
+            if self._latest_map is None:
+                columns = self._load()
+                latest = self._latest_rows()
+                self._latest_map = dict(zip(zip(columns["appid"][latest].tolist(), columns["currency"][latest].tolist()), columns["amount"][latest].tolist()))
+                self._last_timestamp = int(columns["timestamp"][-1]) if len(columns["timestamp"]) > 0 else 0
+
+            unknown = [c for c in prices if c not in CURRENCY_CODES]
+            if unknown:
+                logger.warning(f"Not recording the prices of app {appid} in unknown currencies {', '.join(unknown)}", extra=fields(appid=appid, currencies=unknown))
+            changed = [(CURRENCY_CODES[c], int(a)) for c, a in prices.items()
+                       if c in CURRENCY_CODES and self._latest_map.get((int(appid), CURRENCY_CODES[c])) != int(a)]
+            if not changed:
+                return 0
+            # Rows must stay in time order: after the clock stepped back, they get the last timestamp
+            if timestamp < self._last_timestamp:
+                logger.debug(f"Clock is behind the last recorded prices, recording app {appid} at {datetime.fromtimestamp(self._last_timestamp)}",
+                             extra=fields(appid=appid, timestamp=timestamp, last_timestamp=self._last_timestamp))
+                timestamp = self._last_timestamp
+            values = {
+                "appid": np.full(len(changed), appid, dtype=np.int32),
+                "currency": np.array([c for c, _ in changed], dtype=np.int16),
+                "timestamp": np.full(len(changed), timestamp, dtype=np.int64),
+                "amount": np.array([a for _, a in changed], dtype=np.int64)
+            }
+            # The maps are dropped before the files grow, they are recreated on the next read
+            self._columns = None
+            for name, dtype in COLUMNS.items():
+                with open(self._column_fn(name), mode="ab") as f:
+                    values[name].astype(dtype).tofile(f)
+            for code, amount in changed:
+                self._latest_map[(int(appid), code)] = amount
+            self._last_timestamp = timestamp
+            return len(changed)
+
+    def latest(self, appids: list[int] = None, currencies: list[str] = None) -> np.ndarray:
+        with self.lock:
+            columns = self._load()
+            rows = self._filter(columns, self._latest_rows(), appids, currencies)
+            return _records(RECORD_DTYPE, **{name: columns[name][rows] for name in COLUMNS})
+
+    def latest_prices(self, appid: int) -> dict[str, float]:
+        return {r["currency"]: int(r["amount"]) / 100 for r in self.latest([appid])}
+
+    def history(self, appid: int, currency: str = None) -> np.ndarray:
+        with self.lock:
+            columns = self._load()
+            key = int(appid) * 1000
+            start = np.searchsorted(self._group_keys, key, side="left")
+            end = np.searchsorted(self._group_keys, key + 1000, side="left")
+            rows = self._filter(columns, self._order[start:end], None, [currency] if currency else None)
+            return _records(RECORD_DTYPE, **{name: columns[name][rows] for name in COLUMNS})
+
+    def changes_since(self, since, appids: list[int] = None, currencies: list[str] = None) -> np.ndarray:
+        # Rows are appended in time order, so the candidates are a suffix of the columns; the first row
+        # of a series is not a change
+        with self.lock:
+            columns = self._load()
+            n = len(columns["timestamp"])
+            first = np.searchsorted(columns["timestamp"], _timestamp(since), side="left")
+            rows = np.arange(first, n, dtype=np.int64)
+            rows = self._filter(columns, rows, appids, currencies)
+
+            rank = np.empty(n, dtype=np.int64)
+            rank[self._order] = np.arange(n, dtype=np.int64)
+            positions = rank[rows]
+            has_previous = positions > 0
+            has_previous[has_previous] = self._group_keys[positions[has_previous] - 1] == self._group_keys[positions[has_previous]]
+            rows, positions = rows[has_previous], positions[has_previous]
+            previous = self._order[positions - 1]
+
+            return _records(CHANGE_DTYPE, appid=columns["appid"][rows], currency=columns["currency"][rows],
+                            timestamp=columns["timestamp"][rows], old_amount=columns["amount"][previous], amount=columns["amount"][rows])
+
+    def last_change(self, appid: int, currency: str) -> datetime | None:
+        h = self.history(appid, currency)
+        return datetime.fromtimestamp(int(h["timestamp"][-1])) if len(h) > 1 else None
+
+    def close(self) -> None:
+        with self.lock:
+            self._columns = None
+            self._order = None
+            self._group_keys = None
+            self._latest = None
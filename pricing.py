@@ -0,0 +1,75 @@
+import numpy as np
+
+# Number of decimal places kept when rounding bundle prices, per currency
+DEFAULT_DECIMALS = 2
+CURRENCY_DECIMALS = {"JPY": 0, "KRW": 0, "VND": 0, "CLP": 0}
+
+class PriceMatrix():
+    def __init__(self, skus: list[str], currencies: list[str], amounts: np.ndarray, mask: np.ndarray) -> None:
+        self.skus = skus
+        self.currencies = currencies
+        self.amounts = amounts
+        self.mask = mask
+        self.sku_index = {sku: i for i, sku in enumerate(skus)}
+        self.decimals = np.array([CURRENCY_DECIMALS.get(c, DEFAULT_DECIMALS) for c in currencies])
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def from_items(items: list[dict]) -> "PriceMatrix":
+        skus = []
+        seen = set()
+        for item in items:
+            if item["sku"] not in seen:
+                seen.add(item["sku"])
+                skus.append(item["sku"])
+        currencies = sorted(set(p["currency"] for item in items for p in item["prices"]))
+        sku_index = {sku: i for i, sku in enumerate(skus)}
+        currency_index = {c: i for i, c in enumerate(currencies)}
+
+        amounts = np.zeros((len(skus), len(currencies)))
+        mask = np.zeros((len(skus), len(currencies)), dtype=bool)
+        for item in items:
+            row = sku_index[item["sku"]]
+            for p in item["prices"]:
+                col = currency_index[p["currency"]]
+                amounts[row, col] = p["amount"]
+                mask[row, col] = True
+
+        return PriceMatrix(skus, currencies, amounts, mask)
+
+    def quantities(self, bundles: list[list[dict]]) -> np.ndarray:
+        q = np.zeros((len(bundles), len(self.skus)))
+        for b, content in enumerate(bundles):
+            for c in content:
+                if c["sku"] not in self.sku_index:
+                    raise Exception(f"No pricing data found for SKU {c['sku']}")
+                q[b, self.sku_index[c["sku"]]] += c["quantity"]
+        return q
+
+    def missing_currencies(self, quantities: np.ndarray) -> np.ndarray:
+        # [bundles x skus] x [skus x currencies] -> number of bundle items without a price in each currency
+        return (quantities > 0).astype(float) @ (~self.mask).astype(float) > 0
+
+    def round(self, amounts: np.ndarray) -> np.ndarray:
+        scale = 10.0 ** self.decimals
+        return np.round(amounts * scale) / scale
+
+    def bundle_totals(self, quantities: np.ndarray, discounts: list[float] = (0,)) -> np.ndarray:
+        discounts = np.asarray(discounts, dtype=float)
+        if np.any(discounts < 0) or np.any(discounts > 0.99):
+            raise Exception("Invalid value. Discount must be a float between 0 and 1")
+
+        totals = quantities @ np.where(self.mask, self.amounts, 0)
+        # [bundles x 1 x currencies] * [1 x discounts x 1] -> [bundles x discounts x currencies]
+        discounted = self.round(totals[:, None, :] * (1 - discounts)[None, :, None])
+        discounted[np.broadcast_to(self.missing_currencies(quantities)[:, None, :], discounted.shape)] = np.nan
+        return discounted
+
+    def to_prices(self, row: np.ndarray, default_currency: str = "USD") -> list[dict]:
+        return [{
+            "currency": c,
+            "amount": float(a),
+            "is_default": c == default_currency,
+            "is_enabled": True
+            } for c, a in zip(self.currencies, row) if not np.isnan(a)]
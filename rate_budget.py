@@ -0,0 +1,132 @@
+import os, time, struct, logging, tempfile, threading
+from structured_log import fields
+
+# Call budgets shared by every process of the host: the GUI, cron CLI runs and worker processes all
+# draw from the same token bucket per API, so together they stay within one limit. The bucket of a
+# budget is a 16-byte file in DIRECTORY (tokens left, time of the last update), read and updated
+# under an exclusive file lock (fcntl, msvcrt on Windows). A call takes its token right away, even
+# when that leaves the bucket negative, and sleeps until its turn: callers are served in the order
+# they asked, and the lock is never held while waiting.
+#
+#   rate_budget.acquire("steam", interval=1.5)       # at most one call every 1.5s across processes
+#
+# Processes sharing a budget should use the same interval. If DIRECTORY cannot be used, the budget
+# falls back to this process only.
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY = os.path.join(tempfile.gettempdir(), "xsolla_tools_rate_budget")
+STATE = struct.Struct("<dd")
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(fd: int) -> None:
+        # LK_LOCK gives up after 10 attempts of 1s, a busy budget keeps waiting. The lock is on a byte
+        # past the state, msvcrt locks are mandatory and would block the holder's own reads
+        os.lseek(fd, STATE.size, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+    def _unlock(fd: int) -> None:
+        os.lseek(fd, STATE.size, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+
+    def _unlock(fd: int) -> None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class SharedTokenBucket():
+    def __init__(self, name: str, directory: str = None) -> None:
+        self.name = name
+        # File locks do not exclude the threads of one process from each other
+        self.lock = threading.Lock()
+        self.fd = None
+        self.state = None
+        directory = directory or DIRECTORY
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self.fd = os.open(os.path.join(directory, f"{name}.bucket"), os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o666)
+        except OSError as e:
+            logger.warning(f"Cannot share the {name} call budget with other processes ({e}), it only covers this process",
+                           extra=fields(budget=name))
+
+    def _read(self) -> tuple[float, float] | None:
+        if self.fd is None:
+            return self.state
+        data = os.pread(self.fd, STATE.size, 0) if hasattr(os, "pread") else self._seek_read()
+        return STATE.unpack(data) if len(data) == STATE.size else None
+
+    def _seek_read(self) -> bytes:
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        return os.read(self.fd, STATE.size)
+
+    def _write(self, tokens: float, updated_at: float) -> None:
+        if self.fd is None:
+            self.state = (tokens, updated_at)
+            return
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, STATE.pack(tokens, updated_at))
+
+    def reserve(self, interval: float, burst: int = 1) -> float:
+        # Takes a token and returns how long to wait before using it. Time is wall clock, the only
+        # clock the processes share; a clock going back only refills nothing
+        with self.lock:
+            if self.fd is not None:
+                _lock(self.fd)
+            try:
+                now = time.time()
+                state = self._read()
+                tokens, updated_at = state if state is not None else (burst, now)
+                tokens = min(burst, tokens + max(0, now - updated_at) / interval) - 1
+                self._write(tokens, now)
+            finally:
+                if self.fd is not None:
+                    _unlock(self.fd)
+        return -tokens * interval if tokens < 0 else 0
+
+    def acquire(self, interval: float, burst: int = 1) -> float:
+        # Returns the seconds waited
+        wait = self.reserve(interval, burst)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+def bucket(name: str) -> SharedTokenBucket:
+    with _BUCKETS_LOCK:
+        if name not in BUCKETS:
+            BUCKETS[name] = SharedTokenBucket(name)
+        return BUCKETS[name]
+
+def acquire(name: str, interval: float, burst: int = 1) -> float:
+    # interval: seconds between calls across every process, 0 or None for no limit
+    if not interval:
+        return 0
+    return bucket(name).acquire(interval, burst)
+
+def configure(directory: str) -> None:
+    # Changes the directory of the budgets, the ones already open are closed
+    global DIRECTORY
+    with _BUCKETS_LOCK:
+        DIRECTORY = directory
+        for b in BUCKETS.values():
+            b.close()
+        BUCKETS.clear()
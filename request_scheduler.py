@@ -0,0 +1,158 @@
+import time, heapq, logging, itertools, threading, contextlib
+from collections import deque
+from structured_log import fields
+
+# Orders the calls of this process waiting on a rate-limited API. The threads of the process take
+# turns: only the thread whose turn it is reserves a call from the rate limit (and sleeps until it may
+# send), the others wait here, so the next call is chosen when a slot frees up instead of when it was
+# asked for. A call joining a long price sync then waits for one call, not for the whole backlog.
+#
+# Calls are grouped in flows, one per lane and job, and served by start-time fair queuing: each flow
+# gets a share of the calls proportional to its weight (the weight of its lane times the weight of the
+# job), a flow that has been idle starts at the current virtual time instead of being owed past turns,
+# and every waiting call keeps the tag it got when it arrived, so the background lane slows down behind
+# interactive calls but is never starved. The lane and job are set per thread:
+#
+#   with request_scheduler.lane(request_scheduler.INTERACTIVE, job="import 620"):
+#       xsolla_tools.import_from_steam(api_key, project_id, "620")
+#
+# Calls made outside of lane() go to the background lane, in one flow per thread.
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANE_WEIGHTS = {INTERACTIVE: 16, BACKGROUND: 1}
+WAIT_WINDOW = 200
+
+_local = threading.local()
+
+@contextlib.contextmanager
+def lane(name: str, job: str = None, weight: float = 1):
+    # Calls of the current thread go to lane name, in the flow of job with the given weight
+    if name not in LANE_WEIGHTS:
+        raise ValueError(f"Unknown lane {name}, expected one of {', '.join(LANE_WEIGHTS)}")
+    previous = getattr(_local, "flow", None)
+    _local.flow = (name, job if job is not None else threading.current_thread().name, weight)
+    try:
+        yield
+    finally:
+        _local.flow = previous
+
+def current_flow() -> tuple[str, str, float]:
+    flow = getattr(_local, "flow", None)
+    return flow if flow is not None else (BACKGROUND, threading.current_thread().name, 1)
+
+
+class LaneStats():
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.queued = 0
+        self.max_queued = 0
+        self.calls = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.waits = deque(maxlen=WAIT_WINDOW)
+
+    def to_json(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "lane": self.name,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "calls": self.calls,
+            "wait_avg_ms": self.wait_total / self.calls * 1000 if self.calls else None,
+            "wait_p95_ms": waits[int(len(waits) * 0.95)] * 1000 if waits else None,
+            "wait_max_ms": self.wait_max * 1000
+        }
+
+
+class Ticket():
+    def __init__(self, flow: tuple[str, str, float], queued_ahead: int) -> None:
+        self.lane = flow[0]
+        self.job = flow[1]
+        self.queued_ahead = queued_ahead
+        self.event = threading.Event()
+        self.enqueued_at = time.monotonic()
+        self.granted_at = None
+
+
+class RequestScheduler():
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.lock = threading.Lock()
+        self.busy = False
+        self.waiting = []
+        self.virtual_time = 0.0
+        # Finish tag of the last call of each flow
+        self.finish = {}
+        self._seq = itertools.count()
+        self.lanes = {name: LaneStats(name) for name in LANE_WEIGHTS}
+
+    def _enqueue(self, ticket: Ticket, weight: float) -> None:
+        key = (ticket.lane, ticket.job)
+        start = max(self.virtual_time, self.finish.get(key, 0.0))
+        self.finish[key] = start + 1 / (LANE_WEIGHTS[ticket.lane] * max(weight, 1e-6))
+        heapq.heappush(self.waiting, (start, next(self._seq), ticket))
+        stats = self.lanes[ticket.lane]
+        stats.queued = stats.queued + 1
+        if self.busy:
+            stats.max_queued = max(stats.max_queued, stats.queued)
+
+    def _grant_next(self) -> None:
+        # Called with the lock held, when the turn is free
+        if not self.waiting:
+            self.busy = False
+            # Idle: no flow is owed anything anymore
+            self.finish.clear()
+            return
+        start, _, ticket = heapq.heappop(self.waiting)
+        self.virtual_time = start
+        self.busy = True
+        self.lanes[ticket.lane].queued = self.lanes[ticket.lane].queued - 1
+        ticket.granted_at = time.monotonic()
+        ticket.event.set()
+
+    def _release(self, ticket: Ticket) -> None:
+        wait = time.monotonic() - ticket.enqueued_at
+        with self.lock:
+            stats = self.lanes[ticket.lane]
+            stats.calls = stats.calls + 1
+            stats.wait_total = stats.wait_total + wait
+            stats.wait_max = max(stats.wait_max, wait)
+            stats.waits.append(wait)
+            self._grant_next()
+
+    @contextlib.contextmanager
+    def turn(self):
+        # Waits for the turn of the calling thread, which reserves its call from the rate limit inside
+        # the block. The wait recorded for the lane ends with the block
+        flow = current_flow()
+        with self.lock:
+            ticket = Ticket(flow, len(self.waiting) + (1 if self.busy else 0))
+            self._enqueue(ticket, flow[2])
+            if not self.busy:
+                self._grant_next()
+        ticket.event.wait()
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+        if ticket.queued_ahead:
+            logger.debug(f"{self.name} call of {ticket.lane} lane waited {time.monotonic() - ticket.enqueued_at:.2f}s behind {ticket.queued_ahead} calls",
+                         extra=fields(scheduler=self.name, lane=ticket.lane, job=ticket.job, queued_ahead=ticket.queued_ahead))
+
+    def queued(self) -> int:
+        with self.lock:
+            return len(self.waiting)
+
+    def stats(self) -> list[dict]:
+        with self.lock:
+            return [s.to_json() for s in self.lanes.values()]
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            queued = {name: s.queued for name, s in self.lanes.items()}
+            self.lanes = {name: LaneStats(name) for name in LANE_WEIGHTS}
+            for name, n in queued.items():
+                self.lanes[name].queued = n
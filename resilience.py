@@ -0,0 +1,176 @@
+import time, logging, threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from structured_log import fields
+
+# Timeouts, hedging and circuit breaking for the HTTP calls of the Xsolla and Steam clients. Every
+# call goes through call(url, send):
+#  - while the circuit breaker of the host is open (FAILURE_THRESHOLD failures in a row: errors,
+#    timeouts, 5xx), calls fail at once with CircuitOpenError; after OPEN_SECONDS one trial call is
+#    let through, and its outcome closes or reopens the breaker
+#  - with HEDGING on, an idempotent call still running after the p95 latency of its host gets a
+#    duplicate, and the first answer wins. Until HEDGE_MIN_SAMPLES calls were timed, HEDGE_DEFAULT_DELAY is used
+# TIMEOUT is (connect, read) in seconds, the clients pass it to every request.
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = (10, 30)
+HEDGING = False
+HEDGE_MIN_SAMPLES = 20
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.05
+LATENCY_WINDOW = 200
+FAILURE_THRESHOLD = 5
+OPEN_SECONDS = 30
+
+def _is_failure(response) -> bool:
+    return response.status_code >= 500
+
+def _close(future) -> None:
+    # The losing copy of a hedged call: its response is not used, give the connection back
+    if future.exception() is None and hasattr(future.result(), "close"):
+        future.result().close()
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"{host} is failing, calls to it are paused for {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class HostState():
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.calls = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def p95(self) -> float | None:
+        with self.lock:
+            latencies = sorted(self.latencies)
+        return latencies[int(len(latencies) * 0.95)] if latencies else None
+
+    def hedge_delay(self) -> float:
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, self.p95())
+
+    def before_call(self) -> None:
+        with self.lock:
+            self.calls = self.calls + 1
+            if self.opened_at is None:
+                return
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < OPEN_SECONDS or self.trial_running:
+                self.rejected = self.rejected + 1
+                raise CircuitOpenError(self.host, max(0, OPEN_SECONDS - elapsed))
+            # Half open: this call is the trial
+            self.trial_running = True
+
+    def record(self, latency: float, ok: bool) -> None:
+        with self.lock:
+            self.trial_running = False
+            if ok:
+                self.latencies.append(latency)
+                self.failures = 0
+                if self.opened_at is not None:
+                    self.opened_at = None
+                    logger.info(f"{self.host} answers again, circuit breaker closed", extra=fields(host=self.host))
+                return
+            self.failures = self.failures + 1
+            if self.opened_at is not None or self.failures >= FAILURE_THRESHOLD:
+                if self.opened_at is None:
+                    logger.warning(f"{self.failures} failed calls in a row to {self.host}, pausing calls to it for {OPEN_SECONDS}s",
+                                   extra=fields(host=self.host, failures=self.failures))
+                self.opened_at = time.monotonic()
+
+    def to_json(self) -> dict:
+        p95 = self.p95()
+        return {
+            "host": self.host,
+            "state": "closed" if self.opened_at is None else "open",
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "consecutive_failures": self.failures,
+            "p95_ms": p95 * 1000 if p95 is not None else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
+
+
+HOSTS = {}
+_HOSTS_LOCK = threading.Lock()
+_POOL = None
+
+def host_state(url: str) -> HostState:
+    host = urlsplit(url).netloc
+    with _HOSTS_LOCK:
+        if host not in HOSTS:
+            HOSTS[host] = HostState(host)
+        return HOSTS[host]
+
+def _pool() -> ThreadPoolExecutor:
+    global _POOL
+    with _HOSTS_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+        return _POOL
+
+def _hedged(send, state: HostState, before_hedge = None):
+    primary = _pool().submit(send)
+    done, _ = wait([primary], timeout=state.hedge_delay())
+    if not done and before_hedge is not None:
+        before_hedge()
+    if primary.done():
+        return primary.result()
+
+    with state.lock:
+        state.hedges = state.hedges + 1
+    hedge = _pool().submit(send)
+    pending = [primary, hedge]
+    errors = []
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for f in done:
+            pending.remove(f)
+            if f.exception() is not None:
+                errors.append(f.exception())
+                continue
+            for other in pending:
+                other.add_done_callback(_close)
+            if f is hedge:
+                with state.lock:
+                    state.hedge_wins = state.hedge_wins + 1
+            return f.result()
+    raise errors[0]
+
+def call(url: str, send, idempotent: bool = False, before_hedge = None):
+    # send() makes the request and returns the response. before_hedge() runs before a duplicate is sent
+    # (the Steam clients wait for their rate limit there)
+    state = host_state(url)
+    state.before_call()
+    start = time.monotonic()
+    try:
+        response = _hedged(send, state, before_hedge) if HEDGING and idempotent else send()
+    except Exception:
+        state.record(time.monotonic() - start, False)
+        raise
+    state.record(time.monotonic() - start, not _is_failure(response))
+    return response
+
+def stats() -> list[dict]:
+    with _HOSTS_LOCK:
+        states = list(HOSTS.values())
+    return [s.to_json() for s in states]
+
+def reset() -> None:
+    with _HOSTS_LOCK:
+        HOSTS.clear()
@@ -1,8 +1,13 @@
-import re
-from time import sleep
+import re, logging
 import requests
+import tracing
+import json_codec
+import resilience
+import rate_budget
+import request_scheduler
+from structured_log import fields
 from enum import Enum
-from datetime import datetime, timedelta
+from datetime import datetime
 
 def try_date_formats(date: str, date_formats: list[str]) -> datetime:
     for f in date_formats:
@@ -200,31 +205,81 @@ class SteamApp(SteamAppStub):
         return o
 
 
-LAST_API_CALL_TIMESTAMP = None
-def _wait_for_api_flood_protection():
-    global LAST_API_CALL_TIMESTAMP
+logger = logging.getLogger(__name__)
 
-    if LAST_API_CALL_TIMESTAMP is not None:
-        delay = 1.5
-        wait_time = (LAST_API_CALL_TIMESTAMP + timedelta(seconds=delay) - datetime.now()).total_seconds()
+STEAM_STORE_API_URL = "https://store.steampowered.com/api"
+STEAM_WEB_API_URL = "https://api.steampowered.com"
+STEAM_API_CALL_DELAY = 1.5
+# Order of the Steam calls of this process, by lane and job (see request_scheduler)
+SCHEDULER = request_scheduler.RequestScheduler("steam")
 
+def _wait_for_api_flood_protection():
+    # The delay is shared with the other processes of the host (GUI, CLI runs...), Steam bans the IP,
+    # not the process. Within the process, one thread at a time holds a reservation, the next one is
+    # picked by the scheduler
+    with tracing.span("steam throttle", "wait") as span:
+        with SCHEDULER.turn() as ticket:
+            wait_time = rate_budget.acquire("steam", STEAM_API_CALL_DELAY)
         if wait_time > 0:
-            #print("Waiting {}s for the next Steam API call...".format(wait_time))
-            sleep(wait_time)
-    
-    LAST_API_CALL_TIMESTAMP = datetime.now()
-
-
-def _request_from_steam_storeapi(appid: int, apptype: str ="app", currency: str ="us", locale: str ="en"):
+            logger.debug("Waited %.2fs for the next Steam API call", wait_time)
+        if span is not None:
+            span.args["lane"] = ticket.lane
+            span.args["queued_ahead"] = ticket.queued_ahead
+            span.args["queue_wait_s"] = ticket.granted_at - ticket.enqueued_at
+
+
+def _get(url: str, stream: bool = False):
+    with tracing.span("steam GET", "http", url=url) as span:
+        # A hedged duplicate waits for the rate limit like any other call
+        r = resilience.call(url, lambda: requests.get(url, stream=stream, timeout=resilience.TIMEOUT), idempotent=not stream,
+                            before_hedge=_wait_for_api_flood_protection)
+        if span is not None:
+            span.args["status"] = r.status_code
+            span.count("steam_requests")
+            if not stream:
+                span.args["response_bytes"] = len(r.content)
+                span.count("response_bytes", len(r.content))
+        return r
+
+
+def _decode(r):
+    with tracing.span("json decode", "decode"):
+        return json_codec.loads(r.content)
+
+
+# appdetails filters: the fields of the "basic" group only come together, every other top level field
+# (price_overview, release_date, categories...) is a filter of its own
+STOREAPI_BASIC_FIELDS = ("type", "name", "steam_appid", "required_age", "is_free", "controller_support", "dlc",
+                         "detailed_description", "about_the_game", "short_description", "supported_languages", "reviews",
+                         "header_image", "capsule_image", "capsule_imagev5", "website", "pc_requirements",
+                         "mac_requirements", "linux_requirements", "legal_notice")
+
+def _storeapi_filters(only_fields: tuple[str]) -> str:
+    filters = []
+    for f in only_fields:
+        name = "basic" if f in STOREAPI_BASIC_FIELDS else f
+        if name not in filters:
+            filters.append(name)
+    return ",".join(filters)
+
+
+def _request_from_steam_storeapi(appid: int, apptype: str ="app", currency: str ="us", locale: str ="en", only_fields: tuple[str] = None):
+    # only_fields: the top level fields of the details the caller reads, None for all of them. A response
+    # with none of them is an empty dict
     _wait_for_api_flood_protection()
 
-    url = "https://store.steampowered.com/api/{}details?{}ids={}&cc={}&l={}".format(apptype, apptype, appid, currency, locale)    
+    url = "{}/{}details?{}ids={}&cc={}&l={}".format(STEAM_STORE_API_URL, apptype, apptype, appid, currency, locale)
+    filters = _storeapi_filters(only_fields) if only_fields else None
+    if filters:
+        url = "{}&filters={}".format(url, filters)
 
-    r = requests.get(url)
+    r = _get(url)
     if r.status_code != 200:
         raise Exception("Error during Steam request at {}. Error code: {}".format(url, r.status_code))
+    logger.debug("%s details of %s: %d bytes", apptype, appid, len(r.content),
+                 extra=fields(appid=appid, cc=currency, filters=filters, response_bytes=len(r.content)))
     
-    r_json = r.json()
+    r_json = _decode(r)
     r_json = r_json[str(appid)]
     
     if "success" not in r_json:
@@ -233,24 +288,28 @@ def _request_from_steam_storeapi(appid: int, apptype: str ="app", currency: str
     if not r_json["success"]:
         return None
 
-    return r_json["data"]
+    return r_json["data"] or {}
 
 
-def _request_from_steam_webapi(interface: str, method: str, parameters: list[tuple[str, str]] = None, version: int = 1):
-    _wait_for_api_flood_protection()
-    
+def _steam_webapi_url(interface: str, method: str, parameters: list[tuple[str, str]] = None, version: int = 1) -> str:
     if parameters == None or len(parameters) == 0:
         fmt_param = ""
     else:
         fmt_param = "?" + "&".join(map(lambda p: "{}={}".format(p[0], p[1]), parameters))
     
-    url = "https://api.steampowered.com/{}/{}/v{}/{}".format(interface, method, version, fmt_param)
+    return "{}/{}/{}/v{}/{}".format(STEAM_WEB_API_URL, interface, method, version, fmt_param)
+
 
-    r = requests.get(url)
+def _request_from_steam_webapi(interface: str, method: str, parameters: list[tuple[str, str]] = None, version: int = 1):
+    _wait_for_api_flood_protection()
+    
+    url = _steam_webapi_url(interface, method, parameters, version)
+
+    r = _get(url)
     if r.status_code != 200:
         raise Exception("Error during Steam request at {}. Error code: {}".format(url, r.status_code))
         
-    return r.json()
+    return _decode(r)
 
 
 def _remove_duplicate_stubs(l: list[SteamAppStub]) -> list[SteamAppStub]:
@@ -268,20 +327,34 @@ def _remove_duplicate_stubs(l: list[SteamAppStub]) -> list[SteamAppStub]:
             prev = elem
             i = i + 1
     
-    print("Removed {} duplicate elements".format(count))
+    logger.info("Removed {} duplicate elements".format(count), extra=fields(duplicates=count))
 
     return l
 
 
+def iter_app_list():
+    # GetAppList is tens of MB: apps are decoded one by one while the response downloads, instead of
+    # building the whole document first
+    _wait_for_api_flood_protection()
+
+    url = _steam_webapi_url("ISteamApps", "GetAppList", version=2)
+    with _get(url, stream=True) as r:
+        if r.status_code != 200:
+            raise Exception("Error during Steam request at {}. Error code: {}".format(url, r.status_code))
+        for app in json_codec.iter_response_array(r, ("applist", "apps")):
+            yield SteamAppStub.from_json(app)
+
+
 def get_app_list() -> list[SteamAppStub]:
-    result = _request_from_steam_webapi("ISteamApps",  "GetAppList", version=2)
-    result = result["applist"]["apps"]
-    result_list = [SteamAppStub.from_json(r) for r in result]
-    return _remove_duplicate_stubs(result_list)
+    return _remove_duplicate_stubs(list(iter_app_list()))
+
 
+# What SteamApp.from_json reads
+APP_DETAILS_FIELDS = ("type", "name", "steam_appid", "required_age", "is_free", "website", "release_date", "support_info",
+                      "developers", "publishers", "categories", "genres", "metacritic", "recommendations")
 
 def get_stub_details(stub: SteamAppStub) -> SteamApp:
-    j = _request_from_steam_storeapi(stub.appid)
+    j = _request_from_steam_storeapi(stub.appid, only_fields=APP_DETAILS_FIELDS)
 
     if j is None:
         return None
@@ -293,21 +366,33 @@ CURRENCIES = ["USD", "GBP", "EUR", "RUB", "BRL", "JPY", "MYR", "PHP", "SGD",
               "PLN", "CHF", "CNY", "INR", "CLP", "PEN", "COP", "ZAR", "HKD",
               "TWD", "SAR", "AED", "ILS", "KZT", "KWD", "QAR", "CRC", "UYU"]
 
+# Set to a price_history.PriceHistory to keep the prices retrieve_pricing_per_appid fetches
+PRICE_HISTORY = None
+
 def retrieve_pricing_per_appid(appid, currency_list=CURRENCIES):
     prices = {}
+    minor_units = {}
+    checked_free = False
 
     for currency in currency_list:
-        print("Getting {} price for AppID {}...".format(currency, appid))
+        logger.debug("Getting %s price for AppID %s...", currency, appid, extra=fields(appid=appid, currency=currency))
         cc = currency[:2].lower()
-        data = _request_from_steam_storeapi(appid, currency=cc)
-        if not data:
+        # is_free brings the whole "basic" group with it, it is only asked until one call answered
+        only_fields = ("price_overview",) if checked_free else ("is_free", "price_overview")
+        data = _request_from_steam_storeapi(appid, currency=cc, only_fields=only_fields)
+        if data is None:
             #game is not sold in that currency
             continue
-        if data["is_free"]:
-            print("Game is free - no prices needed")
-            return {}
+        if not checked_free:
+            checked_free = True
+            if data.get("is_free"):
+                logger.info("Game is free - no prices needed", extra=fields(appid=appid))
+                return {}
         if "price_overview" not in data:
             continue
         prices[currency] = data["price_overview"]["initial"] / 100
-    
+        minor_units[currency] = data["price_overview"]["initial"]
+
+    if PRICE_HISTORY is not None and minor_units:
+        PRICE_HISTORY.record(int(appid), minor_units)
     return prices
\ No newline at end of file
@@ -0,0 +1,120 @@
+import sys, json, queue, logging, threading
+
+# The core modules log through logging.getLogger(__name__), with structured fields passed as
+#
+#   logger.info("Deleting SKU %s...", sku, extra=fields(sku=sku))
+#
+# configure() puts a QueueHandler on the root logger: the calling thread only enqueues the record,
+# a listener thread hands it to the sinks (GUI terminal, stderr, JSON lines file...) added with
+# add_sink(). Levels can be set per module, e.g. {"steam_api": "DEBUG", "xsolla_api": "WARNING"}.
+# logging.handlers is only imported by configure(), the core modules just need fields().
+
+DEFAULT_LEVEL = "INFO"
+
+def fields(**kwargs) -> dict:
+    return {"fields": kwargs}
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if record.levelno >= logging.WARNING:
+            message = f"{record.levelname}: {message}"
+        return message
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, default=str)
+
+
+class _FanOutHandler(logging.Handler):
+    # QueueListener's handler list is fixed once it is created, sinks come and go through this one
+    def __init__(self) -> None:
+        super().__init__()
+        self.sinks = []
+        self.sinks_lock = threading.Lock()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        with self.sinks_lock:
+            sinks = list(self.sinks)
+        for sink in sinks:
+            if record.levelno >= sink.level:
+                sink.handle(record)
+
+
+QUEUE = None
+LISTENER = None
+FAN_OUT = None
+_CONFIGURE_LOCK = threading.Lock()
+
+def parse_module_levels(s: str) -> dict[str, str]:
+    # "steam_api=DEBUG,xsolla_api=WARNING" -> {"steam_api": "DEBUG", "xsolla_api": "WARNING"}
+    levels = {}
+    for item in (s or "").split(","):
+        if not item.strip():
+            continue
+        if "=" not in item:
+            raise ValueError(f"Invalid log level setting {item}, expected module=LEVEL")
+        module, level = item.split("=", 1)
+        levels[module.strip()] = level.strip().upper()
+    return levels
+
+def set_levels(level: str = DEFAULT_LEVEL, module_levels: dict[str, str] = None) -> None:
+    logging.getLogger().setLevel(level.upper())
+    for module, module_level in (module_levels or {}).items():
+        logging.getLogger(module).setLevel(module_level.upper())
+
+def configure(level: str = DEFAULT_LEVEL, module_levels: dict[str, str] = None) -> None:
+    global QUEUE, LISTENER, FAN_OUT
+    from logging.handlers import QueueHandler, QueueListener
+    with _CONFIGURE_LOCK:
+        if LISTENER is None:
+            QUEUE = queue.SimpleQueue()
+            FAN_OUT = _FanOutHandler()
+            LISTENER = QueueListener(QUEUE, FAN_OUT)
+            LISTENER.start()
+            logging.getLogger().addHandler(QueueHandler(QUEUE))
+    set_levels(level, module_levels)
+
+def add_sink(handler: logging.Handler, formatter: logging.Formatter = None) -> logging.Handler:
+    if formatter is not None:
+        handler.setFormatter(formatter)
+    with FAN_OUT.sinks_lock:
+        FAN_OUT.sinks.append(handler)
+    return handler
+
+def remove_sink(handler: logging.Handler) -> None:
+    with FAN_OUT.sinks_lock:
+        FAN_OUT.sinks.remove(handler)
+
+def add_stream_sink(stream=None, level: str = "NOTSET") -> logging.Handler:
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    handler.setLevel(level)
+    return add_sink(handler, ConsoleFormatter())
+
+def add_json_file_sink(fn: str, level: str = "NOTSET") -> logging.Handler:
+    handler = logging.FileHandler(fn, mode="a", encoding="utf_8")
+    handler.setLevel(level)
+    return add_sink(handler, JsonLinesFormatter())
+
+def shutdown() -> None:
+    # Waits until every queued record reached the sinks
+    global LISTENER
+    from logging.handlers import QueueHandler
+    with _CONFIGURE_LOCK:
+        if LISTENER is not None:
+            LISTENER.stop()
+            LISTENER = None
+            for handler in [h for h in logging.getLogger().handlers if isinstance(h, QueueHandler)]:
+                logging.getLogger().removeHandler(handler)
+            for sink in FAN_OUT.sinks:
+                sink.flush()
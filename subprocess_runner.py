@@ -0,0 +1,148 @@
+import asyncio, codecs, re, threading, time, logging
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_REGEX = re.compile(r"\[=*\s*\] % (\d{1,3}\.\d{2})")
+BYTES_REGEX = re.compile(r"(\d+(?:\.\d+)?)\s*([KMGT]?i?B)\s*(?:/|of)\s*(\d+(?:\.\d+)?)\s*([KMGT]?i?B)(?!/s)")
+RATE_REGEX = re.compile(r"(\d+(?:\.\d+)?)\s*([KMGT]?i?B)/s")
+LINE_SPLIT_REGEX = re.compile(r"\r\n|\r|\n")
+
+_UNITS = {"B": 1, "KB": 1000, "MB": 1000**2, "GB": 1000**3, "TB": 1000**4,
+          "KIB": 1024, "MIB": 1024**2, "GIB": 1024**3, "TIB": 1024**4}
+
+def _to_bytes(value: str, unit: str) -> int:
+    return int(float(value) * _UNITS[unit.upper()])
+
+
+class SubprocessCancelled(Exception):
+    pass
+
+
+class ProgressEvent():
+    def __init__(self, source: str, percent: float, bytes_done: int = None, bytes_total: int = None, rate: int = None, text: str = "") -> None:
+        self.source = source
+        self.percent = percent
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.rate = rate
+        self.text = text
+
+    def __str__(self) -> str:
+        return self.text or f"{self.source}: {self.percent:.2f}%"
+
+    def from_line(source: str, line: str) -> "ProgressEvent":
+        m = PROGRESS_REGEX.search(line)
+        if m is None:
+            return None
+        o = ProgressEvent(source, float(m[1]), text=line)
+        b = BYTES_REGEX.search(line)
+        if b is not None:
+            o.bytes_done = _to_bytes(b[1], b[2])
+            o.bytes_total = _to_bytes(b[3], b[4])
+        r = RATE_REGEX.search(line)
+        if r is not None:
+            o.rate = _to_bytes(r[1], r[2])
+        return o
+
+
+class SubprocessRunner():
+    def __init__(self, source: str = "", on_line=None, on_progress=None, progress_interval: float = 0.5,
+                 timeout: float = None, cancel_event: threading.Event = None) -> None:
+        self.source = source
+        self.on_line = on_line if on_line is not None else self._print_line
+        self.on_progress = on_progress if on_progress is not None else self._print_progress
+        self.progress_interval = progress_interval
+        self.timeout = timeout
+        self.cancel_event = cancel_event
+        self._last_progress_time = 0
+        self._pending_progress = None
+
+    def _print_line(self, stream: str, line: str) -> None:
+        logger.info(f"[{self.source}] {line}" if self.source else line)
+
+    def _print_progress(self, event: ProgressEvent) -> None:
+        self._print_line("stdout", event.text)
+
+    def _handle_line(self, stream: str, line: str) -> None:
+        if not line.strip():
+            return
+        event = ProgressEvent.from_line(self.source, line)
+        if event is None:
+            self._flush_progress()
+            self.on_line(stream, line)
+            return
+
+        # Progress bars are redrawn many times a second, only let a few through
+        now = time.monotonic()
+        if now - self._last_progress_time >= self.progress_interval or event.percent >= 100:
+            self._pending_progress = None
+            self._last_progress_time = now
+            self.on_progress(event)
+        else:
+            self._pending_progress = event
+
+    def _flush_progress(self) -> None:
+        if self._pending_progress is not None:
+            event = self._pending_progress
+            self._pending_progress = None
+            self._last_progress_time = time.monotonic()
+            self.on_progress(event)
+
+    async def _read_stream(self, stream: asyncio.StreamReader, name: str) -> None:
+        decoder = codecs.getincrementaldecoder("utf_8")(errors="replace")
+        buffer = ""
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            buffer = buffer + decoder.decode(chunk)
+            lines = LINE_SPLIT_REGEX.split(buffer)
+            buffer = lines.pop()
+            for line in lines:
+                self._handle_line(name, line)
+
+        # Whatever is left once the pipe closes is still output
+        buffer = buffer + decoder.decode(b"", final=True)
+        if buffer:
+            self._handle_line(name, buffer)
+
+    async def _wait_for_cancel(self) -> None:
+        while not self.cancel_event.is_set():
+            await asyncio.sleep(0.1)
+
+    async def run(self, args: list[str]) -> int:
+        sp = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        readers = asyncio.gather(self._read_stream(sp.stdout, "stdout"), self._read_stream(sp.stderr, "stderr"))
+        waiters = [asyncio.ensure_future(readers)]
+        if self.cancel_event is not None:
+            waiters.append(asyncio.ensure_future(self._wait_for_cancel()))
+
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+            if waiters[0] not in done:
+                sp.kill()
+                await sp.wait()
+                if done:
+                    raise SubprocessCancelled(f"{args[0]} was cancelled")
+                raise TimeoutError(f"{args[0]} did not finish within {self.timeout}s")
+            await readers
+            code = await sp.wait()
+        finally:
+            for w in waiters:
+                w.cancel()
+
+        self._flush_progress()
+        return code
+
+    def run_sync(self, args: list[str]) -> int:
+        return asyncio.run(self.run(args))
+
+
+async def gather_bounded(coroutines: list, max_concurrency: int) -> list:
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _bounded(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*[_bounded(c) for c in coroutines], return_exceptions=True)
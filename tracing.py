@@ -0,0 +1,267 @@
+import os, io, json, time, threading, functools, itertools, contextlib
+
+# Lightweight tracing for the xsolla_tools workflows. Every workflow is an operation span, every
+# "Step N" inside it a step span, and the HTTP calls, Steam throttling waits and JSON decoding are
+# child spans that add their counts (requests, bytes...) to all the spans above them.
+#
+#   tracing.enable(profile=True)
+#   xsolla_tools.import_from_steam(...)
+#   tracing.TRACER.export_chrome_trace("trace.json")    # open in chrome://tracing or ui.perfetto.dev
+#
+# Tracing is off by default and span() is then a shared no-op context manager. In profiling mode each
+# operation also gets a cProfile and a tracemalloc summary, attached to the span args.
+
+PROFILE_TOP_FUNCTIONS = 15
+PROFILE_TOP_ALLOCATIONS = 10
+# Leaf spans of these categories also add their duration to the enclosing spans, as "<category>_s",
+# so an operation shows how much of its time went to HTTP calls, throttling waits and JSON decoding
+TIMED_CATEGORIES = ("http", "wait", "decode")
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Span():
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, category: str, args: dict, parent: "Span" = None) -> None:
+        self.id = next(Span._ids)
+        self.name = name
+        self.category = category
+        self.args = args
+        self.parent = parent
+        self.counters = {}
+        self.thread_id = threading.get_ident()
+        self.thread_name = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.duration() * 1000:.1f} ms)"
+
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def count(self, name: str, n: int = 1) -> None:
+        # Counts go to every open span of the thread, so an operation sees the requests made by its steps
+        span = self
+        while span is not None:
+            span.counters[name] = span.counters.get(name, 0) + n
+            span = span.parent
+
+
+class _OperationProfile():
+    # cProfile can only run one profiler at a time and tracemalloc is process wide, so concurrent
+    # operations skip profiling instead of mixing their numbers
+    lock = threading.Lock()
+
+    def __init__(self) -> None:
+        self.profiler = None
+        self.snapshot = None
+
+    def start(self) -> bool:
+        if not self.lock.acquire(blocking=False):
+            return False
+        import cProfile, tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.snapshot = tracemalloc.take_snapshot()
+        self.profiler = cProfile.Profile()
+        try:
+            self.profiler.enable()
+        except ValueError:
+            self.profiler = None
+        return True
+
+    def stop(self, span: Span) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+        import pstats, tracemalloc
+        try:
+            if self.profiler is not None:
+                out = io.StringIO()
+                pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+                span.args["cprofile"] = out.getvalue()
+
+            _, peak = tracemalloc.get_traced_memory()
+            diff = tracemalloc.take_snapshot().compare_to(self.snapshot, "lineno")
+            span.args["memory_peak_bytes"] = peak
+            span.args["memory_top_allocations"] = [str(d) for d in diff[:PROFILE_TOP_ALLOCATIONS]]
+        finally:
+            self.lock.release()
+
+
+class Tracer():
+    def __init__(self) -> None:
+        self.enabled = False
+        self.profile = False
+        self.lock = threading.Lock()
+        self.spans = []
+        self.origin = time.perf_counter()
+        self._local = threading.local()
+
+    def _stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Span | None:
+        stack = self._stack() if self.enabled else None
+        return stack[-1] if stack else None
+
+    def _push(self, name: str, category: str, args: dict) -> Span:
+        stack = self._stack()
+        span = Span(name, category, args, stack[-1] if stack else None)
+        stack.append(span)
+        return span
+
+    def _pop(self, span: Span) -> None:
+        span.end = time.perf_counter()
+        stack = self._stack()
+        # Step spans are closed implicitly, so the span may not be on top anymore
+        while stack:
+            top = stack.pop()
+            if top is span:
+                break
+            top.end = span.end
+            self._record(top)
+        if span.category in TIMED_CATEGORIES and span.parent is not None:
+            span.parent.count(f"{span.category}_s", span.end - span.start)
+        self._record(span)
+
+    def _record(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    @contextlib.contextmanager
+    def _span(self, name: str, category: str, args: dict):
+        span = self._push(name, category, args)
+        try:
+            yield span
+        except Exception as e:
+            span.args["error"] = str(e)
+            raise
+        finally:
+            self._pop(span)
+
+    def span(self, name: str, category: str = "span", **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, category, args)
+
+    def step(self, name: str) -> None:
+        # Ends the previous step of the current operation (if any) and starts a new one. The step stays
+        # open until the next step or the end of the operation.
+        if not self.enabled:
+            return
+        stack = self._stack()
+        if stack and stack[-1].category == "step":
+            self._pop(stack[-1])
+        self._push(name, "step", {})
+
+    def count(self, name: str, n: int = 1) -> None:
+        span = self.current()
+        if span is not None:
+            span.count(name, n)
+
+    @contextlib.contextmanager
+    def _operation(self, name: str, args: dict):
+        profile = _OperationProfile() if self.profile else None
+        profiling = profile is not None and profile.start()
+        with self._span(name, "operation", args) as span:
+            try:
+                yield span
+            finally:
+                stack = self._stack()
+                if stack and stack[-1].category == "step":
+                    self._pop(stack[-1])
+                if profiling:
+                    profile.stop(span)
+
+    def operation(self, name: str, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._operation(name, args)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.spans = []
+
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+        with self.lock:
+            spans = list(self.spans)
+
+        events = []
+        for thread_id, thread_name in {(s.thread_id, s.thread_name) for s in spans}:
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id, "args": {"name": thread_name}})
+        for s in sorted(spans, key=lambda s: s.start):
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "pid": pid,
+                "tid": s.thread_id,
+                "ts": (s.start - self.origin) * 1e6,
+                "dur": (s.end - s.start) * 1e6,
+                "args": dict(s.args, **s.counters)
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, fn: str) -> None:
+        with open(fn, mode="w", encoding="utf_8") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+    def summary(self) -> str:
+        # Time per operation and step, with where it went: HTTP calls, throttling waits and JSON decoding
+        with self.lock:
+            spans = [s for s in self.spans if s.category in ("operation", "step")]
+        lines = []
+        for s in sorted(spans, key=lambda s: s.start):
+            indent = "    " if s.category == "step" else ""
+            counters = ", ".join(f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in sorted(s.counters.items()))
+            lines.append(f"{indent}{s}{' [' + counters + ']' if counters else ''}")
+            if s.category == "operation" and "cprofile" in s.args:
+                lines.append(s.args["cprofile"])
+                lines.append(f"Peak traced memory: {s.args['memory_peak_bytes'] / 1024:.0f} KiB")
+                lines.extend(s.args["memory_top_allocations"])
+        return "\n".join(lines)
+
+
+TRACER = Tracer()
+
+def enable(profile: bool = False) -> Tracer:
+    TRACER.enabled = True
+    TRACER.profile = profile
+    return TRACER
+
+def span(name: str, category: str = "span", **args):
+    return TRACER.span(name, category, **args)
+
+def step(name: str) -> None:
+    TRACER.step(name)
+
+def count(name: str, n: int = 1) -> None:
+    TRACER.count(name, n)
+
+def operation(*arg_names: str):
+    # Decorator for workflow functions: wraps every call in an operation span named after the function,
+    # with the named arguments (SKU, appid...) as span args
+    def decorator(fn):
+        signature = None
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            nonlocal signature
+            if not TRACER.enabled:
+                return fn(*args, **kwargs)
+            if signature is None:
+                import inspect
+                signature = inspect.signature(fn)
+            bound = signature.bind_partial(*args, **kwargs)
+            span_args = {n: bound.arguments[n] for n in arg_names if n in bound.arguments}
+            with TRACER._operation(fn.__name__, span_args):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
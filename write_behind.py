@@ -0,0 +1,176 @@
+import copy, time, logging, threading, contextlib
+from concurrent.futures import ThreadPoolExecutor
+import xsolla_api
+from bulk_delete import _is_retryable, _backoff
+from structured_log import fields
+
+# Write-behind buffer of the game and bundle updates of one project. While it is registered
+# (start()), update_game_by_sku and update_bundle of every XsollaProjectAPI of the project only store
+# the payload, and the reads of that item (get_game_by_sku, get_bundle, the item lists) return it:
+# the next GET-modify-PUT of the same SKU builds on it, so a session that updates the prices of a
+# game, then imports a CSV touching its unit items, then recalculates a bundle, ends with one PUT per
+# touched SKU carrying every change. flush() writes the buffered payloads from a pool of workers, on
+# demand or every flush_interval seconds; an update fails at the flush instead of in the call that
+# made it. Throttled and failing writes are retried with backoff like the bulk delete; a write that
+# still fails goes back to the buffer for the next flush, unless a newer update replaced it or the API
+# rejected the payload. Deleting an item drops its buffered update, and its write if one is running.
+#
+#   with write_behind.session(api_key, project_id) as buffer:
+#       xsolla_tools.update_prices(api_key, project_id, sku, appid)
+#       xsolla_tools.import_gamekey_prices_from_csv(api_key, project_id, fn)
+#   buffer.results                               # one entry per PUT: type, sku, updates, ok, error
+
+logger = logging.getLogger(__name__)
+
+RETRIES = 3
+
+class WriteBehind():
+    def __init__(self, api_key: str, project_id: str, workers: int = 4, flush_interval: float = None, transport = None) -> None:
+        self.api = xsolla_api.XsollaProjectAPI(api_key, project_id, transport)
+        self.project_id = str(project_id)
+        self.workers = workers
+        self.lock = threading.Lock()
+        # Flushes run one at a time, two PUTs of the same SKU could otherwise land out of order
+        self.flush_lock = threading.Lock()
+        self.pending = {}
+        # Payloads being written, still returned to reads until their PUT is done
+        self.in_flight = {}
+        self.results = []
+        self.updates = 0
+        self._stop = threading.Event()
+        self._timer = None
+        if flush_interval:
+            self._timer = threading.Thread(target=self._flush_loop, args=(flush_interval,), daemon=True, name="write-behind")
+            self._timer.start()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def put(self, item_type: str, sku: str, payload) -> None:
+        # The payload of a GET-modify-PUT already holds the earlier buffered changes, it replaces them
+        with self.lock:
+            entry = self.pending.get((item_type, sku))
+            self.pending[(item_type, sku)] = {"payload": copy.deepcopy(payload), "updates": entry["updates"] + 1 if entry else 1}
+            self.updates = self.updates + 1
+        logger.debug(f"Buffered update of {item_type} {sku}", extra=fields(type=item_type, sku=sku))
+
+    def get(self, item_type: str, sku: str):
+        with self.lock:
+            entry = self.pending.get((item_type, sku)) or self.in_flight.get((item_type, sku))
+            return copy.deepcopy(entry["payload"]) if entry is not None else None
+
+    def discard(self, item_type: str, sku: str) -> None:
+        with self.lock:
+            self.pending.pop((item_type, sku), None)
+            # A write still running for the item is not requeued when it fails
+            entry = self.in_flight.pop((item_type, sku), None)
+            if entry is not None:
+                entry["discarded"] = True
+
+    def _put_once(self, item_type: str, sku: str, payload) -> None:
+        if item_type == "game":
+            self.api._update_game_by_sku(sku, copy.deepcopy(payload))
+        else:
+            self.api._update_bundle(sku, copy.deepcopy(payload))
+
+    def _write(self, key: tuple[str, str], entry: dict) -> dict:
+        item_type, sku = key
+        result = {"type": item_type, "sku": sku, "updates": entry["updates"], "ok": False, "attempts": 0, "requeued": False, "error": None}
+        rejected = False
+        try:
+            while True:
+                result["attempts"] = result["attempts"] + 1
+                try:
+                    self._put_once(item_type, sku, entry["payload"])
+                    result["ok"] = True
+                    break
+                except Exception as e:
+                    retryable = _is_retryable(e)
+                    # An answer of the API that retrying does not change, unlike an open circuit breaker
+                    rejected = isinstance(e, xsolla_api.XsollaAPIError) and not retryable
+                    if result["attempts"] > RETRIES or not retryable:
+                        logger.error(f"Failed to write {item_type} {sku}: {e}", extra=fields(type=item_type, sku=sku, attempts=result["attempts"]))
+                        result["error"] = str(e)
+                        break
+                    wait = _backoff(e, result["attempts"] - 1)
+                    logger.warning(f"Write of {item_type} {sku} failed ({e}), retrying in {wait:.1f}s",
+                                   extra=fields(type=item_type, sku=sku, attempt=result["attempts"]))
+                    time.sleep(wait)
+        finally:
+            with self.lock:
+                if self.in_flight.get(key) is entry:
+                    del self.in_flight[key]
+                # The calls that made these updates were told they succeeded: keep them for the next
+                # flush. A newer put was built on this payload and already holds its changes. A payload
+                # the API rejects (422, 404...) or an item deleted meanwhile would fail again, it is dropped
+                if not result["ok"] and not rejected and not entry.get("discarded") and key not in self.pending:
+                    self.pending[key] = entry
+                    result["requeued"] = True
+        return result
+
+    def flush(self) -> list[dict]:
+        with self.flush_lock:
+            with self.lock:
+                batch, self.pending = self.pending, {}
+                self.in_flight.update(batch)
+            if not batch:
+                return []
+            with ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="write-behind") as pool:
+                results = list(pool.map(lambda kv: self._write(*kv), batch.items()))
+        updates = sum(r["updates"] for r in results)
+        logger.info(f"Wrote {len(results)} items for {updates} updates to project {self.project_id}",
+                    extra=fields(project_id=self.project_id, puts=len(results), updates=updates, failed=sum(1 for r in results if not r["ok"])))
+        self.results.extend(results)
+        return results
+
+    def _flush_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def close(self) -> list[dict]:
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        return self.flush()
+
+
+_LOCK = threading.Lock()
+
+def start(api_key: str, project_id: str, workers: int = 4, flush_interval: float = None, transport = None, replace: bool = True) -> WriteBehind:
+    # Registers a buffer for the project. An existing one is flushed and replaced, or returned when
+    # replace is False
+    with _LOCK:
+        previous = xsolla_api.WRITE_BEHIND.get(str(project_id))
+        if previous is not None and not replace:
+            return previous
+        buffer = WriteBehind(api_key, project_id, workers, flush_interval, transport)
+        xsolla_api.WRITE_BEHIND[str(project_id)] = buffer
+    if previous is not None:
+        previous.close()
+    return buffer
+
+def stop(project_id: str) -> list[dict]:
+    # Unregisters the buffer of the project and writes what it still holds. Returns the results of
+    # every write of the buffer, the timed flushes included
+    with _LOCK:
+        buffer = xsolla_api.WRITE_BEHIND.pop(str(project_id), None)
+    if buffer is None:
+        return []
+    buffer.close()
+    if len(buffer):
+        logger.error(f"{len(buffer)} buffered updates of project {buffer.project_id} could not be written",
+                     extra=fields(project_id=buffer.project_id, unwritten=len(buffer)))
+    return buffer.results
+
+def stop_all() -> list[dict]:
+    return [r for project_id in list(xsolla_api.WRITE_BEHIND) for r in stop(project_id)]
+
+
+@contextlib.contextmanager
+def session(api_key: str, project_id: str, workers: int = 4, flush_interval: float = None, transport = None):
+    buffer = start(api_key, project_id, workers, flush_interval, transport)
+    try:
+        yield buffer
+    finally:
+        stop(project_id)
@@ -1,11 +1,80 @@
 from typing import Any
-import requests
+import logging
+import tracing
+import json_codec
+import http_transport
+import resilience
+import rate_budget
+
+XSOLLA_API_URL = "https://store.xsolla.com/api"
+# Seconds between two Xsolla calls, across every process of the host (see rate_budget), 0 for no limit
+XSOLLA_API_CALL_DELAY = 0
+# Write-behind buffers of game and bundle updates, by project id (see write_behind). With
+# WRITE_BEHIND_AUTO = (workers, flush_interval), a project gets one on its first update
+WRITE_BEHIND = {}
+WRITE_BEHIND_AUTO = None
+
+logger = logging.getLogger(__name__)
+
+def _wait_for_api_budget() -> None:
+    if XSOLLA_API_CALL_DELAY:
+        with tracing.span("xsolla throttle", "wait"):
+            rate_budget.acquire("xsolla", XSOLLA_API_CALL_DELAY)
+
+def _send(method: str, url: str, transport = None, **kwargs):
+    if transport is None:
+        transport = http_transport.default_transport()
+    kwargs.setdefault("timeout", resilience.TIMEOUT)
+    _wait_for_api_budget()
+    with tracing.span(f"xsolla {method}", "http", url=url, transport=transport.name) as span:
+        # Only plain GETs are hedged, a duplicated PUT/POST/DELETE could apply twice
+        response = resilience.call(url, lambda: transport.request(method, url, **kwargs), idempotent=method == "GET" and not kwargs.get("stream"),
+                                   before_hedge=_wait_for_api_budget)
+        if span is not None:
+            span.args["status"] = response.status_code
+            span.count("xsolla_requests")
+            if not kwargs.get("stream"):
+                span.count("response_bytes", len(response.content))
+        return response
+
+def _decode(response) -> Any:
+    with tracing.span("json decode", "decode"):
+        return json_codec.loads(response.content)
+
+class XsollaAPIError(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: float = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        # Seconds from the Retry-After header of a throttled call
+        self.retry_after = retry_after
+
 
 class XsollaProjectAPI:
-    def __init__(self, api_key: str, project_id: int) -> None:
+    def __init__(self, api_key: str, project_id: int, transport = None) -> None:
         self.api_key = api_key
         self.project_id = project_id
         self.auth = (project_id, api_key)
+        # None uses http_transport.default_transport()
+        self.transport = transport
+
+    def _send(self, method: str, url: str, **kwargs):
+        return _send(method, url, self.transport, **kwargs)
+
+    def _write_behind(self, create: bool = False):
+        buffer = WRITE_BEHIND.get(str(self.project_id))
+        if buffer is None and create and WRITE_BEHIND_AUTO is not None:
+            import write_behind
+            buffer = write_behind.start(self.api_key, self.project_id, *WRITE_BEHIND_AUTO, replace=False)
+        return buffer
+
+    def _pending(self, item_type: str, sku: str) -> Any:
+        # The buffered payload of an item, so reads see the updates that are not written yet
+        buffer = self._write_behind()
+        return buffer.get(item_type, sku) if buffer is not None else None
+
+    def _with_pending(self, item_type: str, item: dict) -> dict:
+        pending = self._pending(item_type, item.get("sku"))
+        return item if pending is None else pending
 
     def _raise_exc(self, response) -> None:
         if response.status_code == 401:
@@ -14,58 +83,114 @@ class XsollaProjectAPI:
             error = "Game not found"
         elif response.status_code == 422:
             error = "Invalid request"
+        elif response.status_code == 429:
+            error = "Too many requests"
         else:
             error = f"Unknown error"
-        response_json = response.json()
+        response_json = _decode(response)
         errormsg = f"[{response.status_code}] {error}. See error message: {response_json["errorMessage"]}."
         if "errorMessageExtended" in response_json:
             errormsg = f"{errormsg} See extended error message: {response_json["errorMessageExtended"]}"
-            
-        raise Exception(errormsg)
 
-### GET GAMES LIST
+        try:
+            retry_after = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            retry_after = None
+        raise XsollaAPIError(errormsg, response.status_code, retry_after)
 
-    #TO-DO: Handle non-200 responses
-    def get_games(self) -> list[Any]:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game"
+### GET ITEM LISTS
+
+    ITEM_LIST_PATHS = {
+        "game": "game",
+        "bundle": "bundle",
+        "virtual_item": "virtual_items",
+        "virtual_currency_package": "virtual_currency/package"
+    }
+
+    def iter_item_pages(self, item_type: str, limit: int = None):
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/{self.ITEM_LIST_PATHS[item_type]}"
         has_more = True
-        games = []
+        offset = 0
 
         while has_more:
-            query = {"offset": len(games)}
-            response = requests.get(url, params=query, auth=self.auth)
-            json_data = response.json()
-            has_more = "has_more" in json_data and json_data["has_more"]
-            games.extend(json_data["items"])
+            query = {"offset": offset}
+            if limit:
+                query["limit"] = limit
+            response = self._send("GET", url, params=query, auth=self.auth)
+            if response.status_code != 200:
+                self._raise_exc(response)
+            json_data = _decode(response)
+            has_more = "has_more" in json_data and json_data["has_more"] and len(json_data["items"]) > 0
+            offset = offset + len(json_data["items"])
+            yield [self._with_pending(item_type, i) for i in json_data["items"]]
 
-        return games
+    def iter_items(self, item_type: str, limit: int = None, fields: tuple[str] = None):
+        # Like iter_item_pages, but items are decoded one by one while each page downloads, and only
+        # the given fields are kept (the long descriptions of a large catalog add up)
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/{self.ITEM_LIST_PATHS[item_type]}"
+        offset = 0
+
+        while True:
+            query = {"offset": offset}
+            if limit:
+                query["limit"] = limit
+            count = 0
+            with self._send("GET", url, params=query, auth=self.auth, stream=True) as response:
+                if response.status_code != 200:
+                    self._raise_exc(response)
+                items = json_codec.iter_response_array(response, ("items",))
+                for item in items:
+                    count = count + 1
+                    item = self._with_pending(item_type, item)
+                    yield item if fields is None else {k: item[k] for k in fields if k in item}
+            offset = offset + count
+            if not items.envelope.get("has_more") or count == 0:
+                return
+
+    def _get_all_items(self, item_type: str) -> list[Any]:
+        return [i for page in self.iter_item_pages(item_type) for i in page]
+
+    def get_games(self) -> list[Any]:
+        return self._get_all_items("game")
+
+    def get_bundles(self) -> list[Any]:
+        return self._get_all_items("bundle")
+
+    def get_virtual_items(self) -> list[Any]:
+        return self._get_all_items("virtual_item")
+
+    def get_virtual_currency_packages(self) -> list[Any]:
+        return self._get_all_items("virtual_currency_package")
 
 ### CREATE GAME
         
     def create_game(self, payload: Any) -> Any:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game"
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game"
         headers = {"Content-Type": "application/json"}
-        response = requests.post(url, json=payload, headers=headers, auth=self.auth)
+        response = self._send("POST", url, json=payload, headers=headers, auth=self.auth)
         if response.status_code != 201:
             self._raise_exc(response)
-        response_json = response.json()
+        response_json = _decode(response)
         return (response_json["item_id"], response_json["sku"])
             
 
 ### GET GAME DETAILS
     
     def _get_game(self, url) -> Any:
-        response = requests.get(url, auth=self.auth)
+        response = self._send("GET", url, auth=self.auth)
     
         if response.status_code != 200:
             self._raise_exc(response)
-        return response.json()            
+        return _decode(response)            
         
     def get_game_by_id(self, id: int) -> Any:
-        return self._get_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/id/{id}")
+        return self._get_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/id/{id}")
     
     def get_game_by_sku(self, sku: str) -> Any:
-        return self._get_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/sku/{sku}")
+        pending = self._pending("game", sku)
+        if pending is not None:
+            return pending
+        return self._get_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/sku/{sku}")
 
 ### UPDATE GAME
 
@@ -73,51 +198,78 @@ class XsollaProjectAPI:
         if "periods" in payload and len(payload["periods"]) == 0:
             payload.pop("periods")
 
-        response = requests.put(url, auth=self.auth, json=payload, headers={"Content-Type": "application/json"})
+        response = self._send("PUT", url, auth=self.auth, json=payload, headers={"Content-Type": "application/json"})
         if response.status_code != 204:
             self._raise_exc(response)            
 
     def update_game_by_id(self, game_id: int, payload) -> None:
-        self._update_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/id/{game_id}", payload)
+        self._update_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/id/{game_id}", payload)
                             
     def update_game_by_sku(self, sku: str, payload) -> None:
-        self._update_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/sku/{sku}", payload)
+        # With a write-behind buffer, the update is written on the next flush
+        buffer = self._write_behind(create=True)
+        if buffer is not None:
+            buffer.put("game", sku, payload)
+            return
+        self._update_game_by_sku(sku, payload)
+
+    def _update_game_by_sku(self, sku: str, payload) -> None:
+        self._update_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/sku/{sku}", payload)
 
 ### DELETE GAME
 
     def _delete_game(self, url) -> None:
-        response = requests.delete(url, auth=self.auth)
+        response = self._send("DELETE", url, auth=self.auth)
         if response.status_code != 204:
             self._raise_exc(response)            
     
     def delete_game_by_id(self, game_id: int) -> None:
-        self._delete_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/id/{game_id}")
+        self._delete_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/id/{game_id}")
 
     def delete_game_by_sku(self, sku: str) -> None:
-        self._delete_game(f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/game/sku/{sku}")
+        buffer = self._write_behind()
+        if buffer is not None:
+            buffer.discard("game", sku)
+        self._delete_game(f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/game/sku/{sku}")
 
 ### CREATE BUNDLE
 
-    #TO-DO
-    def create_bundle(self) -> None:
-        pass
+    def create_bundle(self, payload) -> Any:
+        payload["groups"] = list([c["external_id"] if isinstance(c, dict) else c for c in payload.get("groups", [])])
+        payload["content"] = list({ "sku": c["sku"], "quantity": c["quantity"] } for c in payload["content"])
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/bundle"
+        response = self._send("POST", url, json=payload, headers={"Content-Type": "application/json"}, auth=self.auth)
+        if response.status_code != 201:
+            self._raise_exc(response)
+        response_json = _decode(response)
+        return (response_json["item_id"], response_json["sku"])
 
 ### GET BUNDLE
 
     def get_bundle(self, sku: str) -> Any:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
-        response = requests.get(url, auth=self.auth)
+        pending = self._pending("bundle", sku)
+        if pending is not None:
+            return pending
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
+        response = self._send("GET", url, auth=self.auth)
         if response.status_code != 200:
             self._raise_exc(response)   
-        return response.json()
+        return _decode(response)
 
 ### UPDATE BUNDLE
 
     def update_bundle(self, sku, payload) -> None:
-        payload["groups"] = list([c["external_id"] for c in payload["groups"]])
+        buffer = self._write_behind(create=True)
+        if buffer is not None:
+            buffer.put("bundle", sku, payload)
+            return
+        self._update_bundle(sku, payload)
+
+    def _update_bundle(self, sku, payload) -> None:
+        payload["groups"] = list([c["external_id"] if isinstance(c, dict) else c for c in payload["groups"]])
         payload["content"] = list({ "sku": c["sku"], "quantity": c["quantity"] } for c in payload["content"])
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
-        response = requests.put(url, auth=self.auth, json=payload, headers={"Content-Type": "application/json"})
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
+        response = self._send("PUT", url, auth=self.auth, json=payload, headers={"Content-Type": "application/json"})
         if response.status_code != 204:
             self._raise_exc(response)
         return
@@ -125,8 +277,11 @@ class XsollaProjectAPI:
 ### DELETE BUNDLE
 
     def delete_bundle(self, sku) -> None:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
-        response = requests.delete(url, auth=self.auth)
+        buffer = self._write_behind()
+        if buffer is not None:
+            buffer.discard("bundle", sku)
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/bundle/sku/{sku}"
+        response = self._send("DELETE", url, auth=self.auth)
         if response.status_code != 204:
             self._raise_exc(response)
         return
@@ -134,37 +289,41 @@ class XsollaProjectAPI:
 ### GET VIRTUAL CURRENCY PACKAGE
 
     def get_virtual_currency_package(self, sku) -> None:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/virtual_currency/package/sku/{sku}"
-        response = requests.get(url, auth=self.auth)
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/virtual_currency/package/sku/{sku}"
+        response = self._send("GET", url, auth=self.auth)
         if response.status_code != 200:
             self._raise_exc(response)
-        return response.json()
+        return _decode(response)
 
 ### GET VIRTUAL ITEM
     
     def get_virtual_item(self, sku) -> None:
-        url = f"https://store.xsolla.com/api/v2/project/{self.project_id}/admin/items/virtual_items/sku/{sku}"
-        response = requests.get(url, auth=self.auth)
+        url = f"{XSOLLA_API_URL}/v2/project/{self.project_id}/admin/items/virtual_items/sku/{sku}"
+        response = self._send("GET", url, auth=self.auth)
         if response.status_code != 200:
             self._raise_exc(response)
-        return response.json()
+        return _decode(response)
 
 class XsollaMerchantAPI:
-    def __init__(self, api_key: str, merchant_id: int):
+    def __init__(self, api_key: str, merchant_id: int, transport = None):
         self.api_key = api_key
         self.merchant_id = merchant_id
         self.auth = (merchant_id, api_key)
+        self.transport = transport
+
+    def _send(self, method: str, url: str, **kwargs):
+        return _send(method, url, self.transport, **kwargs)
 
     def get_projects(self) -> list[int]:
-        url = f"https://store.xsolla.com/api/v2/merchant/{self.merchant_id}/projects"
+        url = f"{XSOLLA_API_URL}/v2/merchant/{self.merchant_id}/projects"
         has_more = True
         projects = []
         
         while has_more:
             query = {"offset": len(projects)}
-            response = requests.get(url, params=query, auth=self.auth)
-            json_data = response.json()
-            print(json_data)
+            response = self._send("GET", url, params=query, auth=self.auth)
+            json_data = _decode(response)
+            logger.debug("Got %d projects (offset %d)", len(json_data["items"]), len(projects))
             has_more = json_data["has_more"]
             projects.extend([i["project_id"] for i in json_data["items"]])
         
@@ -1,9 +1,22 @@
-import subprocess, qrcode, csv
-from ulid import ULID
+import threading, csv, io, os, json, hashlib, zipfile, filecmp, shutil, logging
 from steam_api import _request_from_steam_storeapi as steam_request, retrieve_pricing_per_appid
 from xsolla_api import XsollaProjectAPI
-from qrcode.image.styledpil import StyledPilImage
-from qrcode.image.styles.colormasks import SolidFillColorMask
+from key_registry import KeyRegistry
+import tracing
+from structured_log import fields
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from subprocess_runner import SubprocessRunner
+
+# qrcode/PIL, ulid, numpy and the asyncio subprocess machinery are only imported by the
+# functions that need them, so importing this module (and starting the GUI) stays cheap.
+
+logger = logging.getLogger(__name__)
+
+def _step(n: int, text: str, span: str = None) -> None:
+    # Logs "Step n: text..." and starts the matching step span, named span when the log line carries details
+    logger.info(f"Step {n}: {text}...")
+    tracing.step(span if span is not None else text)
 
 ###################
 
@@ -46,118 +59,211 @@ def _import_from_steam_generate_payload(sku: str, game_info: str, prices) -> dic
 
     return payload
 
-def import_from_steam(api_key: str, project_id: str, steam_app_id: str) -> None:
-    try:        
-        print("Step 1: Retrieving game info from Steam...")
-        game_info = steam_request(appid=steam_app_id)
+# The Steam details import_from_steam reads
+STEAM_IMPORT_FIELDS = ("name", "steam_appid", "short_description", "header_image")
 
-        print("Step 2: Retrieving prices from Steam...")
-        game_prices = retrieve_pricing_per_appid(appid=steam_app_id)
+@tracing.operation("steam_app_id")
+def import_from_steam(api_key: str, project_id: str, steam_app_id: str) -> str:
+    _step(1, "Retrieving game info from Steam")
+    game_info = steam_request(appid=steam_app_id, only_fields=STEAM_IMPORT_FIELDS)
+    if game_info is None:
+        raise Exception(f"Steam app {steam_app_id} not found")
 
-        print("Step 3: Retrieve games list from project...")
-        x = XsollaProjectAPI(api_key, project_id)
-        games = x.get_games()
+    _step(2, "Retrieving prices from Steam")
+    game_prices = retrieve_pricing_per_appid(appid=steam_app_id)
 
-        print("Step 4: Adding on Xsolla...")
-        sku = _import_from_steam_generate_sku(games, game_info)
-        p = _import_from_steam_generate_payload(sku, game_info, game_prices)
-        x.create_game(p)
+    _step(3, "Retrieve games list from project")
+    x = XsollaProjectAPI(api_key, project_id)
+    games = x.get_games()
 
-        print(f"Game {steam_app_id} imported successfully.")
+    _step(4, "Adding on Xsolla")
+    sku = _import_from_steam_generate_sku(games, game_info)
+    p = _import_from_steam_generate_payload(sku, game_info, game_prices)
+    x.create_game(p)
 
-    except Exception as e:
-        print(f"Error: {e}")
+    logger.info(f"Game {steam_app_id} imported successfully.", extra=fields(steam_app_id=steam_app_id, sku=sku))
+    return sku
 
 ###################
 
+@tracing.operation("game_sku")
 def delete_game(api_key: str, project_id: str, game_sku: str) -> None:
-    try:        
-        print(f"Deleting SKU {game_sku}...")
-        x = XsollaProjectAPI(api_key, project_id)
-        x.delete_game_by_sku(game_sku)
-        print(f"SKU {game_sku} successfully deleted")
+    logger.info(f"Deleting SKU {game_sku}...", extra=fields(sku=game_sku))
+    x = XsollaProjectAPI(api_key, project_id)
+    x.delete_game_by_sku(game_sku)
+    logger.info(f"SKU {game_sku} successfully deleted", extra=fields(sku=game_sku))
+
+def _game_skus(x: XsollaProjectAPI) -> list[str]:
+    return [g["sku"] for g in x.iter_items("game", fields=("sku",))]
+
+@tracing.operation("project_id", "dry_run")
+def delete_games(api_key: str, project_id: str, patterns: list[str], workers: int = 4, rate: float = None, retries: int = None,
+                 verify: bool = False, dry_run: bool = False, cancel_event: threading.Event = None, on_progress = None) -> list[dict]:
+    from bulk_delete import DEFAULT_RATE, DEFAULT_RETRIES, resolve_skus, delete_skus, verify_deleted, sku_result
+    x = XsollaProjectAPI(api_key, project_id)
+
+    _step(1, f"Resolving {len(patterns)} SKUs and patterns against the games of project {project_id}", "Resolving SKUs")
+    skus, unmatched = resolve_skus(patterns, _game_skus(x))
+    results = [sku_result(p, "not_found", error="No game matches this SKU or pattern") for p in unmatched]
+    for r in results:
+        logger.warning(f"{r['sku']}: {r['error']}", extra=fields(sku=r["sku"]))
+
+    if dry_run:
+        logger.info(f"{len(skus)} games would be deleted.", extra=fields(skus=len(skus)))
+        return [sku_result(s, "planned") for s in skus] + results
+
+    _step(2, f"Deleting {len(skus)} games", "Deleting games")
+    deleted = delete_skus(x, skus, workers, rate or DEFAULT_RATE, DEFAULT_RETRIES if retries is None else retries, cancel_event, on_progress)
+
+    if verify:
+        _step(3, "Checking that the deleted games are gone", "Verifying")
+        still_there = verify_deleted(deleted, _game_skus(x))
+        if still_there:
+            logger.error(f"{still_there} games are still in the catalog after being deleted", extra=fields(still_there=still_there))
 
-    except Exception as e:
-        print(f"Error: {e}")
+    failed = sum(1 for r in deleted if not r["ok"])
+    logger.info(f"{len(deleted) - failed} of {len(deleted)} games deleted.", extra=fields(deleted=len(deleted) - failed, failed=failed))
+    return deleted + results
 
 ###################
 
-def recalculate_bundle(api_key: str, project_id: str, bundle_sku: str, discount: float = 0) -> None:
+def _bundle_item_prices(x: XsollaProjectAPI, item: dict, game_key_data_cache: list) -> list[dict]:
+    item_sku = item["sku"]
+    match item["type"]:
+        case "virtual_good":
+            return x.get_virtual_item(item_sku)["prices"]
+        case "bundle":
+            if item["bundle_type"] == "virtual_currency_package":
+                return x.get_virtual_currency_package(item_sku)["prices"]
+            elif item["bundle_type"] == "standard":
+                return x.get_bundle(item_sku)["prices"]
+        case "game_key":
+            if not game_key_data_cache:
+                game_key_data_cache.extend(x.get_games())
+            return [i for g in game_key_data_cache for i in g["unit_items"] if i["sku"] == item_sku][0]["prices"]
+
+@tracing.operation("bundle_sku", "discount")
+def recalculate_bundle(api_key: str, project_id: str, bundle_sku: str, discount: float = 0) -> list[dict]:
     if discount < 0 or discount > 0.99:
         raise Exception("Invalid value. Discount must be a float between 0 and 1")
     
     x = XsollaProjectAPI(api_key, project_id)
     
-    print("Step 1: Pulling bundle data...")
+    _step(1, "Pulling bundle data")
     bundle_data = x.get_bundle(bundle_sku)
     bundle_items = bundle_data["content"]
-    bundle_price: dict = {}
 
     game_key_data_cache = []
+    priced_items = []
 
-    print("Step 2: Grabbing prices for individual bundle items...")
+    _step(2, "Grabbing prices for individual bundle items")
     for item in bundle_items:
         item_sku = item["sku"]
-        item_qty = item["quantity"]
-
-        print(f"Grabbing prices for SKU {item_sku}...")
-        match item["type"]:
-            case "virtual_good":
-                item_prices = x.get_virtual_item(item_sku)["prices"]
-                pass
-            case "bundle":
-                if item["bundle_type"] == "virtual_currency_package":
-                    item_prices = x.get_virtual_currency_package(item_sku)["prices"]
-                    pass
-                elif item["bundle_type"] == "standard":
-                    item_prices = x.get_bundle(item_sku)["prices"]
-                    pass
-            case "game_key":
-                if not game_key_data_cache:
-                    game_key_data_cache = x.get_games()
-                item_prices = [i for g in game_key_data_cache for i in g["unit_items"] if i["sku"] == item_sku][0]["prices"]
-
-        print(f"{item_sku}: {item_prices[0]["currency"]} {item_prices[0]["amount"]}")
-        if not bundle_price:
-            for price in item_prices:
-                currency = price["currency"]
-                bundle_price[currency] = price["amount"] * item_qty
-        else:
-            currency_list = list(bundle_price.keys())
-            for currency in currency_list:
-                item_currency_prices = [p for p in item_prices if p["currency"] == currency]
-                if len(item_currency_prices) == 0:
-                    print(f"WARNING: Unable to find pricing in {currency} for {item_sku}. Final pricing for bundle {bundle_sku} will not have pricing in {currency}.")
-                    bundle_price.pop(currency)
-                else:
-                    bundle_price[currency] = bundle_price[currency] + item_currency_prices[0]["amount"] * item_qty
-
-    for currency in bundle_price:
-        bundle_price[currency] = round(bundle_price[currency] * (1 - discount), 2)
+        logger.debug(f"Grabbing prices for SKU {item_sku}...", extra=fields(sku=item_sku))
+        item_prices = _bundle_item_prices(x, item, game_key_data_cache)
+        logger.info(f"{item_sku}: {item_prices[0]["currency"]} {item_prices[0]["amount"]}", extra=fields(sku=item_sku, currency=item_prices[0]["currency"], amount=item_prices[0]["amount"]))
+        priced_items.append({"sku": item_sku, "prices": item_prices})
+
+    import numpy as np
+    from pricing import PriceMatrix
+    matrix = PriceMatrix.from_items(priced_items)
+    quantities = matrix.quantities([bundle_items])
+    for col in np.flatnonzero(matrix.missing_currencies(quantities)[0]):
+        currency = matrix.currencies[col]
+        for item_sku in [item["sku"] for item in bundle_items if not matrix.mask[matrix.sku_index[item["sku"]], col]]:
+            logger.warning(f"Unable to find pricing in {currency} for {item_sku}. Final pricing for bundle {bundle_sku} will not have pricing in {currency}.", extra=fields(sku=item_sku, bundle_sku=bundle_sku, currency=currency))
+    bundle_price = matrix.bundle_totals(quantities, [discount])[0, 0]
     
-    print("Step 3: Submitting new prices to Xsolla...")
-    bundle_price_fmt = [{
-        "currency": c,
-        "amount": bundle_price[c],
-        "is_default": c == "USD",
-        "is_enabled": True
-        } for c in bundle_price]
-    bundle_data["prices"] = bundle_price_fmt
+    _step(3, "Submitting new prices to Xsolla")
+    bundle_data["prices"] = matrix.to_prices(bundle_price)
     x.update_bundle(bundle_sku, bundle_data)
-    print("Bundle prices updated successfully.")
+    logger.info("Bundle prices updated successfully.", extra=fields(bundle_sku=bundle_sku))
+    return bundle_data["prices"]
+
+def _catalog_price_items(x: XsollaProjectAPI) -> tuple[list[dict], list[dict]]:
+    games = x.get_games()
+    bundles = x.get_bundles()
+    items = [{"sku": i["sku"], "prices": i["prices"]} for g in games for i in g["unit_items"]]
+    items.extend({"sku": i["sku"], "prices": i["prices"]} for i in x.get_virtual_items())
+    items.extend({"sku": i["sku"], "prices": i["prices"]} for i in x.get_virtual_currency_packages())
+    items.extend({"sku": b["sku"], "prices": b["prices"]} for b in bundles)
+    return items, bundles
+
+@tracing.operation("discounts")
+def simulate_bundle_discounts(api_key: str, project_id: str, discounts: list[float], bundle_skus: list[str] = None,
+                              cancel_event: threading.Event = None) -> dict:
+    x = XsollaProjectAPI(api_key, project_id)
+
+    _step(1, "Pulling catalog data")
+    items, bundles = _catalog_price_items(x)
+    if bundle_skus is not None:
+        bundles = [b for b in bundles if b["sku"] in bundle_skus]
+    if cancel_event is not None and cancel_event.is_set():
+        logger.warning("Simulation cancelled before pricing the bundles.")
+        return {}
+
+    _step(2, f"Pricing {len(bundles)} bundles at {len(discounts)} discount tiers")
+    from pricing import PriceMatrix
+    matrix = PriceMatrix.from_items(items)
+
+    # A bundle with items missing from the catalog gets an error entry, the others are still priced
+    result = {}
+    valid = []
+    for bundle in bundles:
+        missing = [c["sku"] for c in bundle["content"] if c["sku"] not in matrix.sku_index]
+        if missing:
+            result[bundle["sku"]] = {"error": f"No pricing data found for SKUs {', '.join(missing)}"}
+            logger.warning(f"{bundle['sku']}: no pricing data found for SKUs {', '.join(missing)}", extra=fields(bundle_sku=bundle['sku'], missing=missing))
+        else:
+            valid.append(bundle)
+    totals = matrix.bundle_totals(matrix.quantities([b["content"] for b in valid]), discounts)
+
+    for b, bundle in enumerate(valid):
+        if cancel_event is not None and cancel_event.is_set():
+            logger.warning(f"Simulation cancelled after {b} of {len(valid)} bundles.", extra=fields(done=b, total=len(valid)))
+            break
+        result[bundle["sku"]] = {d: {p["currency"]: p["amount"] for p in matrix.to_prices(totals[b, t])} for t, d in enumerate(discounts)}
+        usd = " / ".join(f"{d:.0%}: {result[bundle['sku']][d].get('USD')}" for d in discounts)
+        logger.info(f"{bundle['sku']}: USD {usd}", extra=fields(bundle_sku=bundle['sku'], usd=usd))
+
+    return result
+
+@tracing.operation("fn")
+def build_bundles(api_key: str, project_id: str, fn: str, workers: int = 4, dry_run: bool = False, cancel_event = None, on_progress = None) -> list[dict]:
+    from bundle_builder import read_definitions, price_bundles, create_bundles
+    x = XsollaProjectAPI(api_key, project_id)
+
+    _step(1, f"Reading bundle definitions from {fn}", "Reading bundle definitions")
+    definitions = read_definitions(fn)
+
+    _step(2, f"Pulling catalog data to validate and price {len(definitions)} bundles", "Pulling catalog data")
+    items, bundles = _catalog_price_items(x)
+    plan = price_bundles(definitions, items, set(b["sku"] for b in bundles))
+    invalid = sum(1 for p in plan if p["payload"] is None)
+    if invalid:
+        logger.warning(f"{invalid} of {len(plan)} bundle definitions are invalid and will be skipped", extra=fields(invalid=invalid))
+
+    if dry_run:
+        return [{"sku": p["sku"], "ok": p["payload"] is not None, "item_id": None, "prices": p["payload"]["prices"] if p["payload"] else None, "error": p["error"]} for p in plan]
+
+    _step(3, f"Creating {len(plan) - invalid} bundles", "Creating bundles")
+    results = create_bundles(x, plan, workers, cancel_event, on_progress)
+    logger.info(f"{sum(1 for r in results if r['ok'])} of {len(results)} bundles created.")
+    return results
 
 ###################
 
-def update_prices(api_key: str, project_id: str, game_sku: str, steam_app_id: str) -> None:
+@tracing.operation("game_sku", "steam_app_id")
+def update_prices(api_key: str, project_id: str, game_sku: str, steam_app_id: str) -> dict:
 
-    print("Step 1: Retrieving prices from Steam...")
+    _step(1, "Retrieving prices from Steam")
     game_prices = retrieve_pricing_per_appid(steam_app_id)
 
-    print("Step 2: Retrieving SKU data from Xsolla...")
+    _step(2, "Retrieving SKU data from Xsolla")
     x = XsollaProjectAPI(api_key, project_id)
     game_info = x.get_game_by_sku(game_sku)
 
-    print("Step 3: Apply new prices...")
+    _step(3, "Apply new prices")
     conv_game_prices = list([{
         "amount": game_prices[c],
         "currency": c,
@@ -171,40 +277,62 @@ def update_prices(api_key: str, project_id: str, game_sku: str, steam_app_id: st
     else:
         game_info["prices"] = conv_game_prices
     
-    print("Step 3: Uploading new prices to Xsolla...")
+    _step(4, "Uploading new prices to Xsolla")
     x.update_game_by_sku(game_sku, game_info)
 
-    print("SKU prices updated successfully!")
+    logger.info("SKU prices updated successfully!", extra=fields(sku=game_sku, currencies=len(game_prices)))
+    return game_prices
 
 ###################
 
-def _run_subprocess(args) -> int:
+async def _run_subprocess_async(args, runner: "SubprocessRunner" = None) -> int:
+    from subprocess_runner import SubprocessRunner
+    runner = runner if runner is not None else SubprocessRunner()
     try:
-        sp = subprocess.Popen(args=args, stdout=subprocess.PIPE, text=True)
-    except Exception as e:
-        print(e)
+        return await runner.run(args)
+    except OSError as e:
+        logger.error(str(e))
         return 404
-    
-    while True:
-        line = sp.stdout.readline()
-        if line != "":
-            print(line, end="")
-        
-        code = sp.poll()
-        if code is not None:
-            break
-    return code
 
-def publish_launcher_build(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value) -> None:
+def _run_subprocess(args, runner: "SubprocessRunner" = None) -> int:
+    import asyncio
+    return asyncio.run(_run_subprocess_async(args, runner))
+
+async def _publish_launcher_build_async(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value, runner: "SubprocessRunner" = None, skip_unchanged: bool = True) -> bool:
+    import asyncio
+    from build_manifest import hash_game_folder, load_uploaded_manifest, save_uploaded_manifest
+    prefix = f"[{runner.source}] " if runner is not None and runner.source else ""
+
+    logger.info(f"{prefix}Step 0: Checking game folder for changes since the last upload...")
+    manifest = await asyncio.to_thread(hash_game_folder, game_folder_path)
+    manifest.settings = {"build_description": build_description, "set_as_value": set_as_value}
+    last_manifest = load_uploaded_manifest(game_folder_path, launcher_key)
+    if last_manifest is None:
+        logger.info(f"{prefix}No previous upload found for this folder, uploading all {len(manifest.files)} files.")
+    elif manifest == last_manifest:
+        if last_manifest.settings != manifest.settings:
+            # Same files, but e.g. a draft to publish or a new description: the update step still has to run
+            logger.info(f"{prefix}Game folder is identical to the last uploaded build, but its description or set-as value changed. Updating the build.",
+                        extra=fields(game_folder_path=game_folder_path, set_as_value=set_as_value))
+        elif skip_unchanged:
+            logger.info(f"{prefix}Game folder is identical to the last uploaded build ({manifest.digest()}). Skipping upload.", extra=fields(game_folder_path=game_folder_path, digest=manifest.digest()))
+            return True
+        else:
+            logger.info(f"{prefix}Game folder is identical to the last uploaded build, uploading anyway.")
+    else:
+        added, removed, changed = manifest.diff(last_manifest)
+        logger.info(f"{prefix}{len(added)} files added, {len(removed)} removed and {len(changed)} changed since the last upload.")
+        for path in (added + removed + changed)[:20]:
+            logger.info(f"{prefix}  {'+' if path in added else '-' if path in removed else '~'} {path}")
 
-    print(f"Step 1: Initializing build upload...")
+    logger.info(f"{prefix}Step 1: Initializing build upload...")
     init_command = [build_loader_path, "--init", "--api-key", launcher_key, "--game-path", game_folder_path]
-    code = _run_subprocess(init_command)
+    code = await _run_subprocess_async(init_command, runner)
     if code != 0:
-        print(f"init_command finished with error {code}")
-        return
+        logger.error(f"{prefix}init_command finished with error {code}", extra=fields(game_folder_path=game_folder_path, code=code))
+        return False
 
-    print(f"Step 2: Starting build upload...")
+    logger.info(f"{prefix}Step 2: Starting build upload...")
     update_command = [build_loader_path, "--update", "--game-path", game_folder_path]
     if build_description:
         update_command.extend(["--descr", build_description])
@@ -212,22 +340,109 @@ def publish_launcher_build(launcher_key, game_folder_path, build_loader_path, bu
         update_command.append("--set-build-on-test")
     elif set_as_value == "published":
         update_command.append("--set-build-on-master")
-    code = _run_subprocess(update_command)
+    code = await _run_subprocess_async(update_command, runner)
     if code != 0:
-        print(f"init_command finished with error {code}")
-        return
+        logger.error(f"{prefix}update_command finished with error {code}", extra=fields(game_folder_path=game_folder_path, code=code))
+        return False
     
-    print(f"Build uploaded successfully!")
+    save_uploaded_manifest(manifest, game_folder_path, launcher_key)
+    logger.info(f"{prefix}Build uploaded successfully!", extra=fields(game_folder_path=game_folder_path, digest=manifest.digest()))
+    return True
+
+@tracing.operation("game_folder_path")
+def publish_launcher_build(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value, runner: "SubprocessRunner" = None, skip_unchanged: bool = True) -> bool:
+    import asyncio
+    return asyncio.run(_publish_launcher_build_async(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value, runner, skip_unchanged))
+
+@tracing.operation()
+def publish_launcher_builds(builds: list[dict], build_loader_path: str, max_concurrency: int = 2,
+                            timeout: float = None, cancel_event: threading.Event = None, on_progress = None) -> list[dict]:
+    # Each build is a dict with launcher_key, game_folder_path and optional build_description/set_as_value
+    import asyncio
+    from subprocess_runner import SubprocessRunner, gather_bounded
+
+    async def _publish_all():
+        coroutines = []
+        for build in builds:
+            runner = SubprocessRunner(source=os.path.basename(os.path.normpath(build["game_folder_path"])),
+                                      timeout=timeout, cancel_event=cancel_event, on_progress=on_progress)
+            coroutines.append(_publish_launcher_build_async(build["launcher_key"], build["game_folder_path"], build_loader_path,
+                                                            build.get("build_description"), build.get("set_as_value"), runner,
+                                                            build.get("skip_unchanged", True)))
+        return await gather_bounded(coroutines, max_concurrency)
+
+    results = []
+    for build, result in zip(builds, asyncio.run(_publish_all())):
+        if isinstance(result, BaseException):
+            logger.error(f"Error uploading {build['game_folder_path']}: {result}", extra=fields(game_folder_path=build['game_folder_path']))
+            results.append({"game_folder_path": build["game_folder_path"], "success": False, "error": str(result)})
+        else:
+            results.append({"game_folder_path": build["game_folder_path"], "success": result, "error": None})
+    return results
+
+###################
+
+@tracing.operation("source_project_id", "target_project_id", "dry_run")
+def mirror_catalog(source_api_key: str, source_project_id: str, target_api_key: str, target_project_id: str,
+                   types: tuple[str] = None, delete_missing: bool = False, dry_run: bool = False, workers: int = 4,
+                   cancel_event: threading.Event = None, on_progress = None) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+    from catalog_mirror import MIRROR_TYPES, CatalogSnapshot, plan_mirror, apply_plan
+    types = tuple(types) if types else MIRROR_TYPES
+    source = XsollaProjectAPI(source_api_key, source_project_id)
+    target = XsollaProjectAPI(target_api_key, target_project_id)
+
+    _step(1, f"Taking snapshots of projects {source_project_id} and {target_project_id}", "Taking snapshots")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        source_snapshot, target_snapshot = pool.map(lambda x: CatalogSnapshot.from_project(x, types), [source, target])
+
+    _step(2, "Comparing item hashes")
+    plan = plan_mirror(source_snapshot, target_snapshot, delete_missing)
+    summary = plan.summary()
+    logger.info(f"{summary['create']} items to create, {summary['update']} to update, {summary['delete']} to delete and {summary['unchanged']} unchanged.", extra=fields(**summary))
+    for action in plan.creates + plan.updates + plan.deletes:
+        logger.debug(str(action), extra=fields(**action.to_json()))
+
+    if dry_run or len(plan) == 0:
+        return dict(plan.to_json(), dry_run=dry_run, results=[])
+
+    _step(3, f"Applying {len(plan)} changes to project {target_project_id}", "Applying changes")
+    results = apply_plan(target, plan, workers, cancel_event, on_progress)
+    failed = sum(1 for r in results if not r["ok"])
+    logger.info(f"Mirror finished, {len(results) - failed} changes applied and {failed} failed.", extra=fields(applied=len(results) - failed, failed=failed))
+    return dict(plan.to_json(), dry_run=dry_run, results=results)
 
 ###################
 
-def generate_keys(fn: str, num_of_keys: int):
+def _generate_key() -> str:
+    from ulid import ULID
+    ulid = str(ULID())
+    return ulid[:6]+"-"+ulid[6:12]+"-"+ulid[12:19]+"-"+ulid[19:]
+
+@tracing.operation("num_of_keys")
+def generate_keys(fn: str, num_of_keys: int, registry: KeyRegistry = None) -> list[str]:
+    keys = [_generate_key() for _ in range(num_of_keys)]
+
+    if registry is not None:
+        logger.info(f"Checking {num_of_keys} keys against {len(registry)} previously issued keys...")
+        existing = registry.find_existing(keys)
+        while existing:
+            logger.info(f"Regenerating {len(existing)} keys that were already issued...")
+            existing = set(existing)
+            keys = [k for k in keys if k not in existing]
+            keys.extend(_generate_key() for _ in range(num_of_keys - len(keys)))
+            existing = registry.find_existing(keys)
+
     with open(fn, mode="w", encoding="utf_8") as f:
-        for _ in range(num_of_keys):
-            ulid = str(ULID())
-            ulid = ulid[:6]+"-"+ulid[6:12]+"-"+ulid[12:19]+"-"+ulid[19:]
-            f.write(ulid+"\n")
-    print("f{num_of_keys} keys successfully generated at {fn}!")
+        for key in keys:
+            f.write(key+"\n")
+
+    if registry is not None:
+        batch_id = registry.add_batch(keys, source=fn)
+        logger.info(f"Keys registered as batch #{batch_id} ({len(registry)} keys issued in total).", extra=fields(batch_id=batch_id, total_keys=len(registry)))
+
+    logger.info(f"{num_of_keys} keys successfully generated at {fn}!", extra=fields(keys=num_of_keys, fn=fn))
+    return keys
 
 ###################
 
@@ -237,22 +452,116 @@ XSOLLA_PALE_BLUE = (102,95,160)
 XSOLLA_BLACK = (24,23,27)
 XSOLLA_WHITE = (255,255,255)
 
-def generate_qrcode(project_id, sku, sku_type, fn):
-    URL = f"https://purchase.xsolla.com/pages/buy?type={sku_type}&project_id={project_id}&sku={sku}&ui_settings=eyJ0aGVtZSI6ICJkYXJrIn0"
+QRCODE_LOGO_PATH = "logo.png"
+QRCODE_CACHE_PATH = "qrcode_cache"
+QRCODE_STYLE = {"front_color": XSOLLA_MAGENTA, "back_color": XSOLLA_WHITE, "error_correction": "H"}
+
+def _qrcode_url(project_id, sku, sku_type) -> str:
+    return f"https://purchase.xsolla.com/pages/buy?type={sku_type}&project_id={project_id}&sku={sku}&ui_settings=eyJ0aGVtZSI6ICJkYXJrIn0"
+
+_QRCODE_ASSETS = {}
+def _qrcode_assets(logo_path: str = QRCODE_LOGO_PATH) -> tuple:
+    # The logo and color mask are loaded once per process and reused for every code
+    if logo_path not in _QRCODE_ASSETS:
+        from PIL import Image
+        from qrcode.image.styles.colormasks import SolidFillColorMask
+        with Image.open(logo_path) as logo:
+            logo.load()
+            logo_image = logo.copy()
+        color_mask = SolidFillColorMask(front_color=QRCODE_STYLE["front_color"], back_color=QRCODE_STYLE["back_color"])
+        _QRCODE_ASSETS[logo_path] = (logo_image, color_mask)
+    return _QRCODE_ASSETS[logo_path]
+
+def _render_qrcode(url: str, logo_path: str = QRCODE_LOGO_PATH) -> bytes:
+    import qrcode
+    from qrcode.image.styledpil import StyledPilImage
+    logo_image, color_mask = _qrcode_assets(logo_path)
     qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H)
-    qr.add_data(URL)
-    qr.make_image(image_factory=StyledPilImage,color_mask=SolidFillColorMask(front_color=XSOLLA_MAGENTA,back_color=XSOLLA_WHITE),embeded_image_path="logo.png").save(fn)
-    
+    qr.add_data(url)
+    img = qr.make_image(image_factory=StyledPilImage, color_mask=color_mask, embeded_image=logo_image)
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+def _qrcode_style_signature(logo_path: str) -> str:
+    with open(logo_path, mode="rb") as f:
+        logo_hash = hashlib.sha256(f.read()).hexdigest()
+    return json.dumps({**QRCODE_STYLE, "logo": logo_hash}, sort_keys=True)
+
+def _qrcode_cache_key(url: str, style_signature: str) -> str:
+    return hashlib.sha256(f"{url}\n{style_signature}".encode("utf_8")).hexdigest()
+
+def generate_qrcode(project_id, sku, sku_type, fn):
+    with open(fn, mode="wb") as f:
+        f.write(_render_qrcode(_qrcode_url(project_id, sku, sku_type)))
+
+@tracing.operation("output")
+def generate_qrcodes(entries: list[tuple[str, str, str]], output: str, workers: int = None, cache_path: str = QRCODE_CACHE_PATH) -> list[str]:
+    style_signature = _qrcode_style_signature(QRCODE_LOGO_PATH)
+    os.makedirs(cache_path, exist_ok=True)
+
+    jobs = []
+    names = set()
+    for project_id, sku, sku_type in entries:
+        name = f"{project_id}_{sku}.png"
+        if name in names:
+            continue
+        names.add(name)
+        url = _qrcode_url(project_id, sku, sku_type)
+        cache_fn = os.path.join(cache_path, _qrcode_cache_key(url, style_signature) + ".png")
+        jobs.append((name, url, cache_fn))
+
+    missing = [(url, cache_fn) for _, url, cache_fn in jobs if not os.path.exists(cache_fn)]
+    logger.info(f"Rendering {len(missing)} QR codes ({len(jobs) - len(missing)} unchanged, taken from cache)...")
+
+    if len(missing) > 1 and workers != 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rendered = pool.map(_render_qrcode, [url for url, _ in missing], chunksize=max(1, len(missing) // 64))
+            for (_, cache_fn), png in zip(missing, rendered):
+                with open(cache_fn, mode="wb") as f:
+                    f.write(png)
+    else:
+        for url, cache_fn in missing:
+            with open(cache_fn, mode="wb") as f:
+                f.write(_render_qrcode(url))
+
+    if output.lower().endswith(".zip"):
+        logger.info(f"Saving {len(jobs)} QR codes to {output}...")
+        # PNGs are already compressed, storing them avoids paying for deflate twice
+        with zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_STORED) as z:
+            for name, _, cache_fn in jobs:
+                z.write(cache_fn, arcname=name)
+        outputs = [output]
+    else:
+        logger.info(f"Saving {len(jobs)} QR codes to {output}...")
+        os.makedirs(output, exist_ok=True)
+        outputs = []
+        for name, _, cache_fn in jobs:
+            fn = os.path.join(output, name)
+            if not (os.path.exists(fn) and filecmp.cmp(fn, cache_fn, shallow=False)):
+                shutil.copyfile(cache_fn, fn)
+            outputs.append(fn)
+
+    logger.info(f"{len(jobs)} QR codes successfully generated!", extra=fields(qrcodes=len(jobs), rendered=len(missing), output=output))
+    return outputs
+
 ###################
 
-def export_gamekey_prices_to_csv(api_key: str, project_id: str, fn: str):
+@tracing.operation("fn")
+def export_gamekey_prices_to_csv(api_key: str, project_id: str, fn: str, cancel_event: threading.Event = None) -> int:
     x = XsollaProjectAPI(api_key, project_id)
-    print(f"Getting gamekey price data for project {project_id}...")
-    games = x.get_games()
-    skus_with_prices = [[game, sku] for game in games for sku in game['unit_items'] if len(sku['prices']) > 0]
+    logger.info(f"Getting gamekey price data for project {project_id}...", extra=fields(project_id=project_id))
+    skus_with_prices = []
+    for game in x.iter_items("game", fields=("sku", "unit_items")):
+        # No partial file is written on cancel
+        if cancel_event is not None and cancel_event.is_set():
+            logger.warning(f"Export cancelled, {fn} was not written.", extra=fields(fn=fn))
+            return 0
+        skus_with_prices.extend([game, sku] for sku in game['unit_items'] if len(sku['prices']) > 0)
     currencies = sorted(list(set([price['currency'] for _, sku in skus_with_prices for price in sku['prices']])))
 
-    print(f"Saving gamekey price data to {fn}...")
+    logger.info(f"Saving gamekey price data to {fn}...")
     with open(fn, mode="w", encoding="utf_8_sig", newline="") as f:
         csv_writer = csv.writer(f)
         csv_writer.writerow(["SKU", "Sub-SKU", "Default"] + currencies)
@@ -272,12 +581,14 @@ def export_gamekey_prices_to_csv(api_key: str, project_id: str, fn: str):
                     raise Exception("API error: returned two prices for the same currency??")
             csv_writer.writerow(csv_line)
 
-    print(f"Done!")
+    logger.info("Done!", extra=fields(rows=len(skus_with_prices), fn=fn))
+    return len(skus_with_prices)
 
-def import_gamekey_prices_from_csv(api_key: str, project_id: str, fn: str):
+@tracing.operation("fn")
+def import_gamekey_prices_from_csv(api_key: str, project_id: str, fn: str, cancel_event: threading.Event = None) -> int:
     x = XsollaProjectAPI(api_key, project_id)
 
-    print(f"Opening and parsing {fn}...")
+    logger.info(f"Opening and parsing {fn}...")
     with open(fn, mode="r", encoding="utf_8_sig") as f:
         csv_reader = csv.reader(f)
         header = None
@@ -289,10 +600,13 @@ def import_gamekey_prices_from_csv(api_key: str, project_id: str, fn: str):
                 skus.append(line)
 
     currencies = header[3:]
-    for sku in skus:
+    for n, sku in enumerate(skus):
+        if cancel_event is not None and cancel_event.is_set():
+            logger.warning(f"Import cancelled after {n} of {len(skus)} rows.", extra=fields(done=n, total=len(skus), fn=fn))
+            return n
         game_name = sku[0]
         sku_name = sku[1]
-        print(f"Parsing CSV data for {sku_name}...")
+        logger.debug(f"Parsing CSV data for {sku_name}...", extra=fields(sku=sku_name))
         default_currency = sku[2]
         amounts = sku[3:]
         if len(amounts) != len(currencies):
@@ -305,20 +619,17 @@ def import_gamekey_prices_from_csv(api_key: str, project_id: str, fn: str):
                 'is_active': True
             } for a, c in zip(amounts, currencies) if a != '']
 
-        print(f"Retrieving data for {sku_name}...")
+        logger.debug(f"Retrieving data for {sku_name}...", extra=fields(sku=game_name))
         
-        try:
-            payload = x.get_game_by_sku(game_name)
-        except Exception as e:
-            print(str(e))
-            return
+        payload = x.get_game_by_sku(game_name)
         
         #dumb fixes
         if "periods" in payload and len(payload["periods"]) == 0:
             payload.pop("periods")    
         subsku_payload = [sku for sku in payload['unit_items'] if sku['sku'] == sku_name][0]
         subsku_payload['prices'] = new_prices
-        print(f"Updating {sku_name} with new prices...")
+        logger.info(f"Updating {sku_name} with new prices...", extra=fields(sku=sku_name, currencies=len(new_prices)))
         x.update_game_by_sku(game_name, payload)
 
-    print(f"Done!")
\ No newline at end of file
+    logger.info("Done!", extra=fields(rows=len(skus), fn=fn))
+    return len(skus)
\ No newline at end of file
@@ -0,0 +1,448 @@
+import os, sys, csv, json, logging, argparse, contextlib, threading
+from concurrent.futures import ThreadPoolExecutor
+from structured_log import fields
+
+# Headless entry point for cron/CI runs. Log records go to stderr, the JSON result goes to stdout.
+# Exit codes: 0 when everything succeeded, 1 when at least one item failed, 2 on invalid usage.
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# Named after the module, run as a script __name__ is __main__
+logger = logging.getLogger("xsolla_tools_cli")
+
+def tools():
+    import xsolla_tools
+    return xsolla_tools
+
+def _read_items(args, columns: int = 1) -> list:
+    items = list(args.items)
+    if args.input:
+        with open(args.input, mode="r", encoding="utf_8_sig", newline="") as f:
+            for row in csv.reader(f):
+                row = [c.strip() for c in row]
+                if not row or not row[0] or row[0].startswith("#"):
+                    continue
+                items.append(row[0] if columns == 1 else row[:columns])
+    if columns > 1:
+        items = [i.split(":", columns - 1) if isinstance(i, str) else i for i in items]
+        if any(len(i) != columns for i in items):
+            raise ValueError(f"Each item must have {columns} fields")
+    return items
+
+def _run_batch(items: list, fn, jobs: int) -> list[dict]:
+    def _run_one(item) -> dict:
+        try:
+            return {"item": item, "ok": True, "result": fn(item), "error": None}
+        except Exception as e:
+            logger.error(f"{item}: {e}" if item is not None else str(e), extra=fields(item=item))
+            return {"item": item, "ok": False, "result": None, "error": str(e)}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        return list(pool.map(_run_one, items))
+
+def _run_single(fn) -> list[dict]:
+    return _run_batch([None], lambda _: fn(), 1)
+
+def _run_whole(fn) -> list[dict]:
+    # For the commands whose core returns one result per item: a failure before any item is done
+    # (catalog fetch, auth, network...) becomes a single failed result instead of escaping main
+    try:
+        return fn()
+    except Exception as e:
+        logger.error(str(e))
+        return [{"item": None, "ok": False, "result": None, "error": str(e)}]
+
+def _require(value, name: str) -> str:
+    if not value:
+        raise ValueError(f"Missing {name}")
+    return value
+
+###################
+
+def _open_price_history(args) -> None:
+    import steam_api
+    if not args.no_price_history:
+        from price_history import PriceHistory
+        steam_api.PRICE_HISTORY = PriceHistory(args.price_history)
+
+def _app_index_opener(args):
+    # The index is only opened by the first item given by name, opening it may download the app list.
+    # A failure fails the items given by name, the app ids still go through
+    lock = threading.Lock()
+    state = {}
+
+    def _open():
+        with lock:
+            if "index" not in state and "error" not in state:
+                import app_search
+                try:
+                    state["index"] = app_search.open_index(args.app_index)
+                except Exception as e:
+                    state["error"] = e
+            if "error" in state:
+                raise Exception(f"Cannot open the Steam app index: {state['error']}")
+            return state["index"]
+    return _open
+
+def _steam_appid(open_index, app: str) -> str:
+    if app.strip().isdigit():
+        return app
+    appid, name = open_index().resolve(app)
+    logger.info(f"\"{app}\" is Steam app {appid} ({name})", extra=fields(app=app, appid=appid))
+    return str(appid)
+
+def cmd_import_from_steam(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    _open_price_history(args)
+    open_index = _app_index_opener(args)
+    return _run_batch(_read_items(args), lambda app: tools().import_from_steam(api_key, project_id, _steam_appid(open_index, app)), args.jobs)
+
+def cmd_update_prices(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    _open_price_history(args)
+    open_index = _app_index_opener(args)
+    return _run_batch(_read_items(args, columns=2), lambda i: tools().update_prices(api_key, project_id, i[0], _steam_appid(open_index, i[1])), args.jobs)
+
+def cmd_search_apps(args) -> list[dict]:
+    queries = _read_items(args)
+
+    def _search() -> list[dict]:
+        import app_search
+        index = app_search.open_index(args.app_index, refresh=args.refresh)
+        return [{"item": query, "ok": bool(results), "result": results, "error": None if results else "No Steam app matches"}
+                for query, results in ((q, index.search(q, args.limit)) for q in queries)]
+    return _run_whole(_search)
+
+def cmd_prices(args) -> list[dict]:
+    from datetime import datetime
+    from price_history import PriceHistory, _currency_codes
+    appids = [int(a) for a in _read_items(args)] or None
+    currencies = [c.strip().upper() for c in args.currency.split(",")] if args.currency else None
+    # Checked before the query, an unknown currency is a usage error
+    _currency_codes(currencies)
+    since = datetime.fromisoformat(args.since) if args.since else None
+
+    def _query() -> list[dict]:
+        history = PriceHistory(args.price_history)
+        if since is not None:
+            changes = history.changes_since(since, appids, currencies)
+            return [{"item": int(c["appid"]), "ok": True, "error": None, "result": {
+                "currency": str(c["currency"]),
+                "time": datetime.fromtimestamp(int(c["timestamp"])).isoformat(),
+                "old_amount": int(c["old_amount"]) / 100,
+                "amount": int(c["amount"]) / 100
+                }} for c in changes]
+        if args.history:
+            records = [r for appid in appids or [] for r in history.history(appid) if currencies is None or str(r["currency"]) in currencies]
+            return [{"item": int(r["appid"]), "ok": True, "error": None, "result": {
+                "currency": str(r["currency"]),
+                "time": datetime.fromtimestamp(int(r["timestamp"])).isoformat(),
+                "amount": int(r["amount"]) / 100
+                }} for r in records]
+        latest = {}
+        for r in history.latest(appids, currencies):
+            latest.setdefault(int(r["appid"]), {})[str(r["currency"])] = int(r["amount"]) / 100
+        return [{"item": appid, "ok": appid in latest, "result": latest.get(appid), "error": None if appid in latest else "No prices recorded"}
+                for appid in (appids or sorted(latest))]
+    return _run_whole(_query)
+
+def cmd_export_csv(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    return _run_single(lambda: tools().export_gamekey_prices_to_csv(api_key, project_id, args.fn))
+
+def cmd_import_csv(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    return _run_single(lambda: tools().import_gamekey_prices_from_csv(api_key, project_id, args.fn))
+
+def cmd_delete(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    patterns = _read_items(args)
+    if not patterns:
+        raise ValueError("Give at least one SKU or pattern to delete")
+
+    def _delete() -> list[dict]:
+        results = tools().delete_games(api_key, project_id, patterns, workers=args.jobs, rate=args.rate, retries=args.retries,
+                                       verify=args.verify, dry_run=args.dry_run)
+        return [{"item": r["sku"], "ok": r["ok"], "result": {k: r[k] for k in ("status", "attempts", "verified")}, "error": r["error"]} for r in results]
+    return _run_whole(_delete)
+
+def cmd_recalc_bundle(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    discount = args.discount / 100
+    return _run_batch(_read_items(args), lambda sku: tools().recalculate_bundle(api_key, project_id, sku, discount), args.jobs)
+
+def cmd_build_bundles(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+
+    def _build() -> list[dict]:
+        results = tools().build_bundles(api_key, project_id, args.fn, workers=args.jobs, dry_run=args.dry_run)
+        return [{"item": r["sku"], "ok": r["ok"], "result": {"item_id": r["item_id"], "prices": r["prices"]} if r["ok"] else None, "error": r["error"]} for r in results]
+    return _run_whole(_build)
+
+def cmd_simulate_discounts(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    discounts = [float(d) / 100 for d in args.discounts.split(",")]
+    skus = _read_items(args) or None
+    return _run_single(lambda: tools().simulate_bundle_discounts(api_key, project_id, discounts, skus))
+
+def cmd_mirror(args) -> list[dict]:
+    api_key, project_id = _require(args.api_key, "--api-key"), _require(args.project_id, "--project-id")
+    source_api_key = _require(args.source_api_key or api_key, "--source-api-key")
+    source_project_id = _require(args.source_project_id, "--source-project-id")
+    types = args.types.split(",") if args.types else None
+
+    def _mirror() -> list[dict]:
+        if args.plan:
+            result = tools().mirror_catalog(source_api_key, source_project_id, api_key, project_id, types, args.delete_missing, dry_run=True)
+            with open(args.plan, mode="w", encoding="utf_8") as f:
+                json.dump(result, f, indent=2)
+            return [{"item": args.plan, "ok": True, "result": {k: result[k] for k in ("create", "update", "delete", "unchanged")}, "error": None}]
+        result = tools().mirror_catalog(source_api_key, source_project_id, api_key, project_id, types, args.delete_missing, args.dry_run, workers=args.jobs)
+        if args.dry_run:
+            return [{"item": f"{a['action']} {a['type']}/{a['sku']}", "ok": True, "result": None, "error": None} for a in result["actions"]]
+        return [{"item": f"{r['action']} {r['type']}/{r['sku']}", "ok": r["ok"], "result": None, "error": r["error"]} for r in result["results"]]
+    return _run_whole(_mirror)
+
+def cmd_keys(args) -> list[dict]:
+    def _generate():
+        registry = None
+        if not args.no_registry:
+            from key_registry import KeyRegistry
+            registry = KeyRegistry(args.registry)
+        try:
+            return len(tools().generate_keys(args.fn, args.count, registry))
+        finally:
+            if registry is not None:
+                registry.close()
+    return _run_single(_generate)
+
+def cmd_qrcode(args) -> list[dict]:
+    project_id = _require(args.project_id, "--project-id")
+    entries = [(project_id, sku, args.type) for sku in _read_items(args)]
+    return _run_single(lambda: tools().generate_qrcodes(entries, args.output, workers=args.jobs))
+
+def cmd_publish_build(args) -> list[dict]:
+    launcher_key = _require(args.launcher_key, "--launcher-key")
+    builds = [{
+        "launcher_key": launcher_key,
+        "game_folder_path": folder,
+        "build_description": args.description,
+        "set_as_value": args.set_as,
+        "skip_unchanged": not args.force
+        } for folder in _read_items(args)]
+    results = tools().publish_launcher_builds(builds, args.build_loader, max_concurrency=args.jobs, timeout=args.timeout)
+    return [{"item": r["game_folder_path"], "ok": r["success"], "result": None, "error": r["error"]} for r in results]
+
+###################
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="xsolla_tools_cli", description="Headless interface for Xsolla Tools.")
+    parser.add_argument("--api-key", default=os.environ.get("XSOLLA_API_KEY"), help="Xsolla API key (default: $XSOLLA_API_KEY)")
+    parser.add_argument("--project-id", default=os.environ.get("XSOLLA_PROJECT_ID"), help="Xsolla project ID (default: $XSOLLA_PROJECT_ID)")
+    parser.add_argument("--jobs", "-j", type=int, default=1, help="number of items processed concurrently")
+    parser.add_argument("--pretty", action="store_true", help="indent the JSON output")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    parser.add_argument("--log-levels", default="", metavar="MODULE=LEVEL,...", help="per module levels, e.g. steam_api=DEBUG,xsolla_api=WARNING")
+    parser.add_argument("--log-file", metavar="FILE", help="also append structured log records to FILE, as JSON lines")
+    parser.add_argument("--trace", metavar="FILE", help="write a Chrome trace (chrome://tracing, ui.perfetto.dev) of the run to FILE")
+    parser.add_argument("--profile", action="store_true", help="attach cProfile and tracemalloc summaries to each operation, printed to stderr")
+    parser.add_argument("--http-timeout", type=float, default=None, metavar="SECONDS", help="read timeout of the Xsolla and Steam calls (default: 30)")
+    parser.add_argument("--hedge", action="store_true", help="send a duplicate of GET calls slower than the p95 latency of their host, the first answer wins")
+    parser.add_argument("--xsolla-rate", type=float, default=None, metavar="CALLS",
+                        help="maximum Xsolla calls per second, shared with the other processes of the host (default: no limit)")
+    parser.add_argument("--rate-budget-dir", default=None, metavar="DIR",
+                        help="directory of the Steam and Xsolla call budgets shared by the processes of the host (default: in the temp directory)")
+    parser.add_argument("--write-behind", action="store_true",
+                        help="buffer the game and bundle updates and write each SKU once, merging its updates, at the end of the run")
+    parser.add_argument("--write-behind-interval", type=float, default=None, metavar="SECONDS",
+                        help="with --write-behind, also write the buffered updates every SECONDS")
+    parser.add_argument("--price-history", default="price_history", metavar="DIR", help="directory of the Steam price history")
+    parser.add_argument("--no-price-history", action="store_true", help="do not record the Steam prices that are fetched")
+    parser.add_argument("--app-index", default="steam_app_index", metavar="DIR", help="directory of the Steam app name index")
+    parser.add_argument("--transport", default="requests", choices=["requests", "httpx", "http2"],
+                        help="HTTP client of the Xsolla API: requests, a pool of HTTP/1.1 connections (httpx) or one multiplexed HTTP/2 connection (http2)")
+    parser.add_argument("--compress-requests", action="store_true", help="gzip the JSON bodies sent to the Xsolla API")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_batch(p: argparse.ArgumentParser, item_help: str) -> None:
+        p.add_argument("items", nargs="*", help=item_help)
+        p.add_argument("--input", "-i", help="file with one item per line (or a CSV, first columns are used)")
+
+    p = sub.add_parser("import-from-steam", help="import Steam games as game key SKUs")
+    add_batch(p, "Steam app IDs or names")
+    p.set_defaults(func=cmd_import_from_steam)
+
+    p = sub.add_parser("update-prices", help="apply Steam prices to game SKUs")
+    add_batch(p, "SKU:APPID pairs (or sku,appid rows in --input), the app can be given by name")
+    p.set_defaults(func=cmd_update_prices)
+
+    p = sub.add_parser("search-apps", help="find Steam app ids by name, in the local index of the Steam app list")
+    add_batch(p, "app names")
+    p.add_argument("--limit", type=int, default=5, help="matches per name")
+    p.add_argument("--refresh", action="store_true", help="download the Steam app list to update the index first")
+    p.set_defaults(func=cmd_search_apps)
+
+    p = sub.add_parser("prices", help="query the Steam price history, without calling Steam")
+    add_batch(p, "Steam app IDs (default: every app, for the latest prices and --since)")
+    p.add_argument("--currency", default=None, help="currencies, separated by comma (default: all)")
+    p.add_argument("--since", default=None, metavar="DATE", help="list the price changes since DATE (YYYY-MM-DD[THH:MM])")
+    p.add_argument("--history", action="store_true", help="list every recorded price of the given apps")
+    p.set_defaults(func=cmd_prices)
+
+    p = sub.add_parser("export-csv", help="export gamekey prices to a CSV file")
+    p.add_argument("fn")
+    p.set_defaults(func=cmd_export_csv)
+
+    p = sub.add_parser("import-csv", help="import gamekey prices from a CSV file")
+    p.add_argument("fn")
+    p.set_defaults(func=cmd_import_csv)
+
+    p = sub.add_parser("delete", help="delete game SKUs")
+    add_batch(p, "game SKUs, or patterns such as retired_* resolved against the game list")
+    p.add_argument("--rate", type=float, default=None, help="maximum delete calls per second, across jobs (default: 10)")
+    p.add_argument("--retries", type=int, default=None, help="retries of a throttled, failing or timed out call (default: 3)")
+    p.add_argument("--verify", action="store_true", help="fetch the game list again afterwards and check the SKUs are gone")
+    p.add_argument("--dry-run", action="store_true", help="only list the SKUs that would be deleted")
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser("recalc-bundle", help="recalculate bundle prices from their contents")
+    add_batch(p, "bundle SKUs")
+    p.add_argument("--discount", type=float, default=0, help="discount in %% (0-99)")
+    p.set_defaults(func=cmd_recalc_bundle)
+
+    p = sub.add_parser("build-bundles", help="create bundles from a CSV or JSON file of definitions, priced from their content")
+    p.add_argument("fn")
+    p.add_argument("--dry-run", action="store_true", help="only validate and price the bundles")
+    p.set_defaults(func=cmd_build_bundles)
+
+    p = sub.add_parser("simulate-discounts", help="price bundles at several discount tiers without submitting")
+    add_batch(p, "bundle SKUs (default: all bundles)")
+    p.add_argument("--discounts", default="15,20,25", help="discount tiers in %%, separated by comma")
+    p.set_defaults(func=cmd_simulate_discounts)
+
+    p = sub.add_parser("mirror", help="make the catalog of --project-id match the one of --source-project-id")
+    p.add_argument("--source-project-id", default=os.environ.get("XSOLLA_SOURCE_PROJECT_ID"), help="project to copy from (default: $XSOLLA_SOURCE_PROJECT_ID)")
+    p.add_argument("--source-api-key", default=os.environ.get("XSOLLA_SOURCE_API_KEY"), help="API key of the source project (default: $XSOLLA_SOURCE_API_KEY, or --api-key)")
+    p.add_argument("--types", default=None, help="item types to mirror, separated by comma (default: game,bundle)")
+    p.add_argument("--delete-missing", action="store_true", help="delete items of the target project that are not in the source project")
+    p.add_argument("--dry-run", action="store_true", help="only list the changes that would be made")
+    p.add_argument("--plan", metavar="FILE", help="write the dry-run plan to FILE as JSON instead of applying it")
+    p.set_defaults(func=cmd_mirror)
+
+    p = sub.add_parser("keys", help="generate Launcher keys")
+    p.add_argument("fn")
+    p.add_argument("--count", "-n", type=int, required=True)
+    p.add_argument("--registry", default="key_registry", help="key registry directory")
+    p.add_argument("--no-registry", action="store_true", help="do not check or record keys in the registry")
+    p.set_defaults(func=cmd_keys)
+
+    p = sub.add_parser("qrcode", help="generate PayStation QR codes")
+    add_batch(p, "SKUs")
+    p.add_argument("--type", default="game", choices=["game", "bundle"])
+    p.add_argument("--output", "-o", required=True, help="output directory, or a .zip file")
+    p.set_defaults(func=cmd_qrcode)
+
+    p = sub.add_parser("publish-build", help="upload game folders with build_loader")
+    add_batch(p, "game folder paths")
+    p.add_argument("--launcher-key", default=os.environ.get("XSOLLA_LAUNCHER_KEY"), help="Launcher API key (default: $XSOLLA_LAUNCHER_KEY)")
+    p.add_argument("--build-loader", required=True, help="path to build_loader")
+    p.add_argument("--description", default=None)
+    p.add_argument("--set-as", default=None, choices=["draft", "published"])
+    p.add_argument("--timeout", type=float, default=None, help="seconds before a build_loader run is killed")
+    p.add_argument("--force", action="store_true", help="upload even if the folder did not change since the last upload")
+    p.set_defaults(func=cmd_publish_build)
+
+    return parser
+
+def _write_trace(args) -> None:
+    import tracing
+    if args.trace:
+        tracing.TRACER.export_chrome_trace(args.trace)
+        print(f"Trace written to {args.trace}")
+    if args.profile:
+        import resilience
+        print(tracing.TRACER.summary())
+        for host in resilience.stats():
+            print(f"{host['host']}: {host['calls']} calls, p95 {host['p95_ms'] or 0:.0f} ms, {host['hedges']} hedged ({host['hedge_wins']} won), "
+                  f"{host['rejected']} rejected by the circuit breaker ({host['state']})")
+        import steam_api
+        for lane in steam_api.SCHEDULER.stats():
+            if lane["calls"]:
+                print(f"steam {lane['lane']} lane: {lane['calls']} calls, wait avg {lane['wait_avg_ms']:.0f} ms, p95 {lane['wait_p95_ms']:.0f} ms, "
+                      f"max {lane['wait_max_ms']:.0f} ms, up to {lane['max_queued']} queued")
+
+def _configure_logging(args) -> None:
+    import structured_log
+    structured_log.configure(args.log_level, structured_log.parse_module_levels(args.log_levels))
+    structured_log.add_stream_sink(sys.stderr)
+    if args.log_file:
+        structured_log.add_json_file_sink(args.log_file)
+
+def _write_behind_result(r: dict) -> dict:
+    return {"item": f"write {r['type']} {r['sku']}", "ok": r["ok"], "result": {"updates": r["updates"]}, "error": r["error"]}
+
+def main(argv: list[str] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        _configure_logging(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.transport != "requests" or args.compress_requests:
+        import http_transport
+        try:
+            http_transport.configure(args.transport, args.compress_requests)
+        except ImportError as e:
+            import structured_log
+            logger.error(str(e), extra=fields(transport=args.transport))
+            structured_log.shutdown()
+            return EXIT_USAGE
+    if args.http_timeout or args.hedge:
+        import resilience
+        if args.http_timeout:
+            resilience.TIMEOUT = (resilience.TIMEOUT[0], args.http_timeout)
+        resilience.HEDGING = args.hedge
+    if args.xsolla_rate or args.rate_budget_dir:
+        import xsolla_api, rate_budget
+        if args.xsolla_rate:
+            xsolla_api.XSOLLA_API_CALL_DELAY = 1 / args.xsolla_rate
+        if args.rate_budget_dir:
+            rate_budget.configure(args.rate_budget_dir)
+    if args.write_behind:
+        import xsolla_api
+        xsolla_api.WRITE_BEHIND_AUTO = (max(4, args.jobs), args.write_behind_interval)
+    if args.trace or args.profile:
+        import tracing
+        tracing.enable(profile=args.profile)
+
+    # Everything the core prints is progress information, keep stdout for the JSON result
+    with contextlib.redirect_stdout(sys.stderr):
+        results = None
+        try:
+            results = args.func(args)
+        except ValueError as e:
+            logger.error(str(e), extra=fields(command=args.command))
+            return EXIT_USAGE
+        finally:
+            if args.write_behind:
+                # Written even when the command failed, the updates it buffered were reported as done
+                import write_behind
+                written = [_write_behind_result(r) for r in write_behind.stop_all()]
+                if results is not None:
+                    results = results + written
+            if args.trace or args.profile:
+                _write_trace(args)
+            import structured_log, http_transport
+            structured_log.shutdown()
+            http_transport.close()
+
+    ok = all(r["ok"] for r in results)
+    output = {"command": args.command, "ok": ok, "results": results}
+    json.dump(output, sys.stdout, indent=2 if args.pretty else None, default=str)
+    sys.stdout.write("\n")
+    return EXIT_OK if ok else EXIT_FAILED
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,153 @@
 import flet as ft
-import re, sys, configparser, os
-from xsolla_tools import generate_keys, generate_qrcode, import_from_steam, delete_game, publish_launcher_build, recalculate_bundle, update_prices, export_gamekey_prices_to_csv, import_gamekey_prices_from_csv
+import re, sys, configparser, os, threading, time, itertools, atexit
+from collections import deque
+from job_runner import Job, JobRunner, JobStatus
+import tracing
+import structured_log
+
+# xsolla_tools pulls in requests, and its features pull in qrcode/PIL, ulid and numpy.
+# Nothing of that is needed to show the window, so it is imported on first use.
+_PRICE_HISTORY_LOCK = threading.Lock()
+def tools():
+    import xsolla_tools, steam_api
+    # Steam prices fetched from the GUI go to the price history, unless price_history = 0 in the settings
+    with _PRICE_HISTORY_LOCK:
+        if steam_api.PRICE_HISTORY is None and get_config("price_history") != "0":
+            from price_history import PriceHistory
+            steam_api.PRICE_HISTORY = PriceHistory(get_config("price_history") or PRICE_HISTORY_DEFAULT_PATH)
+    return xsolla_tools
+
+APP_INDEX = None
+_APP_INDEX_LOCK = threading.Lock()
+def app_index():
+    # Opened on the first Steam name lookup, the app list is downloaded when the index is missing or stale
+    global APP_INDEX
+    with _APP_INDEX_LOCK:
+        if APP_INDEX is None:
+            import app_search
+            APP_INDEX = app_search.open_index(get_config("app_index") or APP_INDEX_DEFAULT_PATH)
+        return APP_INDEX
 
 class XsollaTool():
     def __init__(self):
         pass
 
 TERMINAL = None
+LOG_FN = "xsolla_tools.log"
+LOG_JSON_FN = "xsolla_tools.log.jsonl"
+
+class TerminalLine():
+    def __init__(self, text: str, url: str = None) -> None:
+        self.text = text
+        self.url = url
+        self.control = None
 
 class StdoutRedirector:
-    progress_bar_regex = r"\[\=*\s*\] % \d{1,3}\.\d{2}"
-    links_regex = r'(https?://[^\s<>"]+|www\.[^\s<>"]+)'
+    progress_bar_regex = re.compile(r"\[\=*\s*\] % \d{1,3}\.\d{2}")
+    links_regex = re.compile(r'(https?://[^\s<>"]+|www\.[^\s<>"]+)')
+    max_lines = 5000
+    visible_lines = 300
+    frame_interval = 1 / 15
 
-    def __init__(self) -> None:
+    def __init__(self, log_fn: str = LOG_FN) -> None:
         self.last_line = ""
+        self.lines = deque(maxlen=self.max_lines)
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.log_fn = log_fn
+        self.log_file = None
+        threading.Thread(target=self._frame_loop, daemon=True).start()
+
+    def _log(self, text: str) -> None:
+        if self.log_fn is None:
+            return
+        if self.log_file is None:
+            self.log_file = open(self.log_fn, mode="a", encoding="utf_8", buffering=1)
+        self.log_file.write(text + "\n")
 
     def write(self, text) -> None:
         if text.strip():
             stripped_text = text.strip()
-            if re.match(self.progress_bar_regex, self.last_line) and re.match(self.progress_bar_regex, text):
-                TERMINAL.controls.pop()
-            self.last_line = stripped_text
-
-            text_e = ft.Text(font_family="DroidSansMono")
-            split_text = re.split(self.links_regex, stripped_text)
-            for t in split_text:
-                if re.match(self.links_regex, t):
-                    text_e.spans.append(ft.TextSpan(
-                        t,
-                        url=t,
-                        style=ft.TextStyle(
-                            decoration=ft.TextDecoration.UNDERLINE,
-                            decoration_color="lightblue",
-                            color="lightblue"
-                        )
-                    ))
-                else:
-                    text_e.spans.append(ft.TextSpan(
-                        t,
-                        style=ft.TextStyle(color="white")
-                    ))
-
-            TERMINAL.controls.append(text_e)
-            TERMINAL.update()
+            with self.lock:
+                is_progress_bar = self.progress_bar_regex.match(stripped_text) is not None
+                if is_progress_bar and self.progress_bar_regex.match(self.last_line) and self.lines:
+                    self.lines.pop()
+                elif not is_progress_bar:
+                    self._log(stripped_text)
+                self.last_line = stripped_text
+                self.lines.append(TerminalLine(stripped_text))
+                self.dirty = True
+
+    def write_link(self, text: str, url: str) -> None:
+        with self.lock:
+            self._log(f"{text} <{url}>")
+            self.last_line = text
+            self.lines.append(TerminalLine(text, url))
+            self.dirty = True
 
     def flush(self) -> None:
-        pass
+        if self.log_file is not None:
+            self.log_file.flush()
+
+    def _build_control(self, line: TerminalLine) -> ft.Text:
+        if line.url is not None:
+            return ft.Text(
+                spans=[ft.TextSpan(
+                    line.text,
+                    url=line.url,
+                    style=ft.TextStyle(
+                        decoration=ft.TextDecoration.UNDERLINE,
+                        decoration_color="lightblue",
+                        color="lightblue",
+                        font_family="DroidSansMono")
+                    )
+                ],
+            )
+
+        text_e = ft.Text(font_family="DroidSansMono")
+        for t in self.links_regex.split(line.text):
+            if self.links_regex.fullmatch(t):
+                text_e.spans.append(ft.TextSpan(
+                    t,
+                    url=t,
+                    style=ft.TextStyle(
+                        decoration=ft.TextDecoration.UNDERLINE,
+                        decoration_color="lightblue",
+                        color="lightblue"
+                    )
+                ))
+            elif t:
+                text_e.spans.append(ft.TextSpan(
+                    t,
+                    style=ft.TextStyle(color="white")
+                ))
+        return text_e
+
+    def _frame_loop(self) -> None:
+        # Coalesce everything printed during a frame into a single terminal update
+        while True:
+            time.sleep(self.frame_interval)
+            if not self.dirty or TERMINAL is None or TERMINAL.page is None:
+                continue
+            with self.lock:
+                window = list(itertools.islice(self.lines, max(0, len(self.lines) - self.visible_lines), None))
+                self.dirty = False
+            with tracing.span("terminal frame", "render", lines=len(window)):
+                for line in window:
+                    if line.control is None:
+                        line.control = self._build_control(line)
+                TERMINAL.controls = [line.control for line in window]
+                try:
+                    TERMINAL.update()
+                except Exception:
+                    pass
 sys.stdout = StdoutRedirector()
 
 CONFIG = None
 CONFIG_FN = "xsolla_tools_gui.ini"
+KEY_REGISTRY_DEFAULT_PATH = "key_registry"
+PRICE_HISTORY_DEFAULT_PATH = "price_history"
+APP_INDEX_DEFAULT_PATH = "steam_app_index"
 def init_config() -> None:
     global CONFIG
     CONFIG = configparser.ConfigParser()
@@ -70,36 +168,83 @@ def set_config(key: str, value: str) -> None:
         CONFIG.write(f)
 
 def print_link(text: str, url: str) -> None:
-    e = ft.Text(
-        spans=[ft.TextSpan(
-            text,
-            url=url,
-            style=ft.TextStyle(
-                decoration=ft.TextDecoration.UNDERLINE,
-                decoration_color="lightblue",
-                color="lightblue",
-                font_family="DroidSansMono")
-            )
-        ],
-    )
-    TERMINAL.controls.append(e)
-    TERMINAL.update()
+    sys.stdout.write_link(text, url)
+
+JOBS: JobRunner = None
+JOBS_PANEL = None
+JOBS_DIRTY = False
+
+def jobs_changed(job: Job) -> None:
+    global JOBS_DIRTY
+    JOBS_DIRTY = True
+
+def submit_job(name: str, fn, *args) -> Job:
+    job = JOBS.submit(name, fn, *args)
+    print(f"Queued job #{job.id}: {name}")
+    return job
+
+def build_job_row(job: Job) -> ft.Row:
+    return ft.Row([
+        ft.Text(str(job), expand=True),
+        ft.ProgressBar(value=job.progress() if job.status != JobStatus.queued else 0, width=150),
+        ft.IconButton(icon=ft.Icons.CANCEL, tooltip="Cancel", disabled=not job.is_active() or job.cancel_event.is_set(), on_click=lambda e: job.cancel())
+    ])
+
+def jobs_panel_loop() -> None:
+    global JOBS_DIRTY
+    while True:
+        time.sleep(0.25)
+        running = any(j.status == JobStatus.running and j.total for j in JOBS.jobs())
+        # Running jobs are redrawn even without changes so their ETA keeps ticking
+        if (not JOBS_DIRTY and not running) or JOBS_PANEL is None or JOBS_PANEL.page is None:
+            continue
+        JOBS_DIRTY = False
+        JOBS.clear_finished(keep=5)
+        JOBS_PANEL.controls = [build_job_row(j) for j in JOBS.jobs()] + build_steam_queue_rows()
+        try:
+            JOBS_PANEL.update()
+        except Exception:
+            pass
+
+def build_steam_queue_rows() -> list[ft.Row]:
+    # Only once a job called Steam, importing steam_api here would pull in requests at startup
+    steam_api = sys.modules.get("steam_api")
+    lanes = [l for l in steam_api.SCHEDULER.stats() if l["queued"]] if steam_api is not None else []
+    if not lanes:
+        return []
+    waiting = ", ".join(f"{l['queued']} {l['lane']} (p95 wait {(l['wait_p95_ms'] or 0) / 1000:.1f}s)" for l in lanes)
+    return [ft.Row([ft.Text(f"Steam calls waiting: {waiting}", italic=True)])]
+
+def steam_lane(job: Job, items: list):
+    # A job on a single game has someone waiting on it, its Steam calls go ahead of the bulk jobs'
+    import request_scheduler
+    lane = request_scheduler.INTERACTIVE if len(items) == 1 else request_scheduler.BACKGROUND
+    return request_scheduler.lane(lane, job=f"job {job.id}")
+
+def _steam_appid(text: str) -> str:
+    if text.isdigit():
+        return text
+    appid, name = app_index().resolve(text)
+    print(f"\"{text}\" is Steam app {appid} ({name})")
+    return str(appid)
+
+def import_from_steam_job(job: Job, api_key, project_id, steam_app_ids):
+    # Names are looked up in the Steam app index, ids are used as they are
+    with steam_lane(job, steam_app_ids):
+        job.for_each(steam_app_ids, lambda id: tools().import_from_steam(api_key, project_id, _steam_appid(id)))
 
 def import_from_steam_modal_confirm(page, modal, api_key, project_id, steam_app_ids):
     page.close(modal)
-    for id in steam_app_ids:
-        import_from_steam(api_key, project_id, id)
+    submit_job(f"Import {len(steam_app_ids)} Steam games", import_from_steam_job, api_key, project_id, steam_app_ids)
 
 def import_from_steam_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail):
     api_key = c.controls[2].value
     project_id = c.controls[3].value
     steam_app_ids: str = c.controls[4].controls[0].value
-    steam_app_ids = steam_app_ids.replace(" ","").split(",")
+    steam_app_ids = [i.strip() for i in steam_app_ids.split(",") if i.strip()]
 
-    rail.disabled = True
-    c.disabled = True
     if len(steam_app_ids) == 1:
-        import_from_steam(api_key, project_id, steam_app_ids[0])
+        submit_job(f"Import Steam game {steam_app_ids[0]}", import_from_steam_job, api_key, project_id, steam_app_ids)
     else:
         modal = ft.AlertDialog(
             modal=True,
@@ -113,15 +258,16 @@ def import_from_steam_button_click(page: ft.Page, c: ft.Column, rail: ft.Navigat
         ]
         rail.page.open(modal)
 
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
+def delete_game_job(job: Job, api_key, project_id, ids) -> list[dict]:
+    # Patterns are resolved inside delete_games, so the job has no total: it counts the SKUs as they go
+    results = tools().delete_games(api_key, project_id, ids, workers=4, verify=True, cancel_event=job.cancel_event, on_progress=lambda r: job.advance())
+    job.check_cancelled()
+    job.failures = sum(1 for r in results if not r["ok"])
+    return results
 
 def delete_game_modal_confirm(page, modal, api_key, project_id, ids) -> None:
     page.close(modal)
-    for id in ids:
-        delete_game(api_key, project_id, id)
+    submit_job(f"Delete {len(ids)} SKUs", delete_game_job, api_key, project_id, ids)
 
 def delete_game_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail):
     api_key = c.controls[2].value
@@ -129,11 +275,8 @@ def delete_game_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRai
     game_skus = c.controls[4].controls[0].value
     game_skus = game_skus.replace(" ","").split(",")
 
-    rail.disabled = True
-    c.disabled = True
-
     if len(game_skus) == 1:
-        delete_game(api_key, project_id, game_skus[0])
+        submit_job(f"Delete SKU {game_skus[0]}", delete_game_job, api_key, project_id, game_skus)
     else:
         modal = ft.AlertDialog(
             modal=True,
@@ -146,52 +289,43 @@ def delete_game_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRai
             ft.TextButton("No", on_click=lambda e: page.close(modal))
         ]
         rail.page.open(modal)
-    
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
 
-def export_to_csv_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
-    rail.disabled = True
-    c.disabled = True
+def export_to_csv_job(job: Job, api_key, project_id, fn: str) -> int:
+    rows = tools().export_gamekey_prices_to_csv(api_key, project_id, fn, cancel_event=job.cancel_event)
+    job.check_cancelled()
+    return rows
+
+def import_from_csv_job(job: Job, api_key, project_id, fn: str) -> int:
+    # Stops between rows on cancel, the rows already imported stay
+    rows = tools().import_gamekey_prices_from_csv(api_key, project_id, fn, cancel_event=job.cancel_event)
+    job.check_cancelled()
+    return rows
 
+def export_to_csv_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
     api_key = c.controls[2].value
     project_id = c.controls[3].value
 
     def fp_on_result(e: ft.FilePickerResultEvent) -> None:
         if e.path:
-            export_gamekey_prices_to_csv(api_key, project_id, e.path)
+            submit_job(f"Export prices of project {project_id}", export_to_csv_job, api_key, project_id, e.path)
     fp = ft.FilePicker(on_result=fp_on_result)
     page.overlay.append(fp)
     page.update()
     fp.save_file(dialog_title="Select where you want to save the CSV file", allowed_extensions=["csv"])
 
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
-
 def import_from_csv_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
-    rail.disabled = True
-    c.disabled = True
-
     api_key = c.controls[2].value
     project_id = c.controls[3].value
 
     def fp_on_result(e: ft.FilePickerResultEvent) -> None:
         if len(e.files) > 0:
-            import_gamekey_prices_from_csv(api_key, project_id, e.files[0].path)
+            fn = e.files[0].path
+            submit_job(f"Import prices into project {project_id}", import_from_csv_job, api_key, project_id, fn)
     fp = ft.FilePicker(on_result=fp_on_result)
     page.overlay.append(fp)
     page.update()
     fp.pick_files(dialog_title="Select the CSV file whose prices you want to import", allowed_extensions=["csv"], allow_multiple=False)
 
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
-
 
 def update_prices_button_click(c: ft.Column, rail: ft.NavigationRail) -> None:
     api_key = c.controls[2].value
@@ -199,20 +333,14 @@ def update_prices_button_click(c: ft.Column, rail: ft.NavigationRail) -> None:
     game_sku = c.controls[4].controls[0].value
     steam_app_id = c.controls[4].controls[1].value
 
-    rail.disabled = True
-    c.disabled = True
+    submit_job(f"Update prices of {game_sku}", update_prices_job, api_key, project_id, [(game_sku, steam_app_id)])
 
-    update_prices(api_key, project_id, game_sku, steam_app_id)
-    
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
+def recalculate_bundle_job(job: Job, api_key: str, project_id: str, bundle_skus: list[str], discount: float):
+    job.for_each(bundle_skus, lambda sku: tools().recalculate_bundle(api_key, project_id, sku, discount))
 
 def recalculate_bundle_modal_confirm(page: ft.Page, modal: ft.AlertDialog, api_key: str, project_id: str, bundle_skus: list[str], discount: float):
     page.close(modal)
-    for sku in bundle_skus:
-        recalculate_bundle(api_key, project_id, sku, discount)
+    submit_job(f"Recalculate {len(bundle_skus)} bundles", recalculate_bundle_job, api_key, project_id, bundle_skus, discount)
 
 def recalculate_bundle_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
     api_key = c.controls[2].value
@@ -230,10 +358,8 @@ def recalculate_bundle_button_click(page: ft.Page, c: ft.Column, rail: ft.Naviga
 
     bundle_skus = bundle_skus.replace(" ","").split(",")
 
-    rail.disabled = True
-    c.disabled = True
     if len(bundle_skus) == 1:
-        recalculate_bundle(api_key, project_id, bundle_skus[0], discount)
+        submit_job(f"Recalculate bundle {bundle_skus[0]}", recalculate_bundle_job, api_key, project_id, bundle_skus, discount)
     else:
         modal = ft.AlertDialog(
             modal=True,
@@ -247,10 +373,32 @@ def recalculate_bundle_button_click(page: ft.Page, c: ft.Column, rail: ft.Naviga
         ]
         rail.page.open(modal)
 
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
+def simulate_bundle_discounts_job(job: Job, api_key, project_id, discounts: list[float], bundle_skus: list[str]) -> dict:
+    result = tools().simulate_bundle_discounts(api_key, project_id, discounts, bundle_skus, cancel_event=job.cancel_event)
+    job.check_cancelled()
+    return result
+
+def simulate_bundle_discounts_button_click(c: ft.Column, rail: ft.NavigationRail) -> None:
+    api_key = c.controls[2].value
+    project_id = c.controls[3].value
+    bundle_skus = c.controls[4].controls[0].value
+    try:
+        discounts = [float(d) / 100 for d in c.controls[5].controls[0].value.replace(" ","").split(",")]
+        if any(d > 0.99 or d < 0 for d in discounts):
+            raise Exception()
+    except:
+        print("Invalid discount tiers. Please insert real numbers from 0 to 100, separated by comma.")
+        return
+
+    bundle_skus = bundle_skus.replace(" ","").split(",") if bundle_skus else None
+
+    submit_job("Simulate bundle discounts", simulate_bundle_discounts_job, api_key, project_id, discounts, bundle_skus)
+
+def publish_launcher_build_job(job: Job, launcher_key, game_folder_path, build_loader_path, build_description, set_as_value) -> None:
+    from subprocess_runner import SubprocessRunner
+    # Cancelling the job kills build_loader instead of waiting for the upload to end
+    runner = SubprocessRunner(cancel_event=job.cancel_event)
+    tools().publish_launcher_build(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value, runner=runner)
 
 def publish_launcher_build_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
     launcher_key = c.controls[2].value
@@ -258,16 +406,16 @@ def publish_launcher_build_button_click(page: ft.Page, c: ft.Column, rail: ft.Na
     build_loader_path = c.controls[3].controls[2].value
     build_description = c.controls[4].controls[0].value
     set_as_value = c.controls[4].controls[1].value
-    
-    rail.disabled = True
-    c.disabled = True
 
-    publish_launcher_build(launcher_key, game_folder_path, build_loader_path, build_description, set_as_value)
-    
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
+    submit_job(f"Upload build from {game_folder_path}", publish_launcher_build_job, launcher_key, game_folder_path, build_loader_path, build_description, set_as_value)
+
+def generate_keys_job(job: Job, fn: str, num_of_keys: int) -> None:
+    from key_registry import KeyRegistry
+    registry = KeyRegistry(get_config("key_registry") or KEY_REGISTRY_DEFAULT_PATH)
+    try:
+        tools().generate_keys(fn, num_of_keys, registry)
+    finally:
+        registry.close()
 
 def generate_keys_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
     try:
@@ -276,58 +424,137 @@ def generate_keys_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationR
         print("Error - invalid number of keys")
         return
 
-    rail.disabled = True
-    c.disabled = True
-
     def fp_on_result(e: ft.FilePickerResultEvent) -> None:
         if e.path:
-            generate_keys(e.path, num_of_keys)
+            submit_job(f"Generate {num_of_keys} keys", generate_keys_job, e.path, num_of_keys)
 
     fp = ft.FilePicker(on_result=fp_on_result)
     page.overlay.append(fp)
     page.update()
     fp.save_file(dialog_title="Select where you want to save the keys", allowed_extensions=["csv", "txt"])
-    
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
 
 def generate_qrcode_button_click(page: ft.Page, c: ft.Column, rail: ft.NavigationRail) -> None:
     project_id = c.controls[2].controls[0].value
-    sku = c.controls[2].controls[1].value
+    skus = c.controls[2].controls[1].value
+    skus = skus.replace(" ","").split(",")
     sku_type = c.controls[2].controls[2].value
 
-    rail.disabled = True
-    c.disabled = True
-
-    def fp_on_result(e: ft.FilePickerResultEvent) -> None:
-        if e.path:
-            if e.path[-4:] != ".png":
-                e.path = e.path + ".png"
-            generate_qrcode(project_id, sku, sku_type, e.path)
-    fp = ft.FilePicker(on_result=fp_on_result)
-    page.overlay.append(fp)
-    page.update()
-    fp.save_file(dialog_title="Select where you want the QR Code image", allowed_extensions=["png"])
-
-    rail.disabled = False
-    c.disabled = False
-    rail.update()
-    c.update()
+    if len(skus) == 1:
+        def fp_on_result(e: ft.FilePickerResultEvent) -> None:
+            if e.path:
+                fn = e.path if e.path[-4:] == ".png" else e.path + ".png"
+                submit_job(f"Generate QR Code for {skus[0]}", lambda job: tools().generate_qrcode(project_id, skus[0], sku_type, fn))
+        fp = ft.FilePicker(on_result=fp_on_result)
+        page.overlay.append(fp)
+        page.update()
+        fp.save_file(dialog_title="Select where you want the QR Code image", allowed_extensions=["png"])
+    else:
+        def fp_on_result(e: ft.FilePickerResultEvent) -> None:
+            if e.path:
+                fn = e.path if e.path[-4:] == ".zip" else e.path + ".zip"
+                submit_job(f"Generate {len(skus)} QR Codes", lambda job: tools().generate_qrcodes([(project_id, sku, sku_type) for sku in skus], fn))
+        fp = ft.FilePicker(on_result=fp_on_result)
+        page.overlay.append(fp)
+        page.update()
+        fp.save_file(dialog_title="Select where you want the ZIP file with the QR Code images", allowed_extensions=["zip"])
+
+CATALOG_ROWS_PER_PAGE = 50
+
+def load_catalog_job(job: Job, api_key, project_id, index, on_page) -> int:
+    from xsolla_api import XsollaProjectAPI
+    x = XsollaProjectAPI(api_key, project_id)
+    index.clear()
+    print(f"Loading catalog of project {project_id}...")
+    for item_type in ["game", "bundle", "virtual_item"]:
+        for items in x.iter_item_pages(item_type):
+            job.check_cancelled()
+            index.add_items(items, item_type)
+            job.advance()
+            on_page(False)
+    on_page(True)
+    print(f"Catalog loaded: {len(index)} items.")
+    return len(index)
+
+def update_prices_job(job: Job, api_key, project_id, sku_appid_pairs: list[tuple[str, str]]) -> None:
+    with steam_lane(job, sku_appid_pairs):
+        job.for_each(sku_appid_pairs, lambda p: tools().update_prices(api_key, project_id, p[0], p[1]))
+
+def confirm_and_submit(page: ft.Page, question: str, name: str, fn, *args) -> None:
+    modal = ft.AlertDialog(
+        modal=True,
+        title=ft.Text("Confirmation"),
+        content=ft.Text(question),
+        actions_alignment=ft.MainAxisAlignment.END
+    )
+    def on_yes(e) -> None:
+        page.close(modal)
+        submit_job(name, fn, *args)
+    modal.actions = [
+        ft.TextButton("Yes", on_click=on_yes),
+        ft.TextButton("No", on_click=lambda e: page.close(modal))
+    ]
+    page.open(modal)
+
+PAGES = {}
+def get_page(builder) -> ft.Column:
+    # Pages are only built the first time they are selected
+    if builder not in PAGES:
+        PAGES[builder] = builder()
+    return PAGES[builder]
 
 def activate_page(content_column, control):
-    section = control.destinations[control.selected_index].data
+    section = get_page(control.destinations[control.selected_index].data)
     content_column.controls.pop()
     content_column.controls.append(section)
     content_column.update()
 
 def main(page: ft.Page):
-    global TERMINAL
-    TERMINAL = ft.Column(expand=True, auto_scroll=True, scroll=ft.ScrollMode.ALWAYS, alignment=ft.VerticalAlignment.START)
+    global TERMINAL, JOBS, JOBS_PANEL
+    TERMINAL = ft.ListView(expand=True, auto_scroll=True, spacing=0)
     
     init_config()
 
+    # Optional tracing, set trace_file (and profile = 1) in the settings to get a Chrome trace on exit
+    if get_config("trace_file"):
+        tracing.enable(profile=get_config("profile") == "1")
+        atexit.register(tracing.TRACER.export_chrome_trace, get_config("trace_file"))
+
+    # Core modules log through a queue, the terminal and the JSON log file are fed from the listener thread
+    structured_log.configure(get_config("log_level") or structured_log.DEFAULT_LEVEL, structured_log.parse_module_levels(get_config("log_levels")))
+    structured_log.add_stream_sink(sys.stdout)
+    structured_log.add_json_file_sink(LOG_JSON_FN)
+
+    # Read timeout of the Xsolla and Steam calls (http_timeout, in seconds) and hedging of slow GETs (hedge_requests = 1)
+    if get_config("http_timeout") or get_config("hedge_requests") == "1":
+        import resilience
+        if get_config("http_timeout"):
+            resilience.TIMEOUT = (resilience.TIMEOUT[0], float(get_config("http_timeout")))
+        resilience.HEDGING = get_config("hedge_requests") == "1"
+
+    # Xsolla calls per second (xsolla_rate) and directory of the call budgets shared with CLI runs (rate_budget_dir)
+    if get_config("xsolla_rate") or get_config("rate_budget_dir"):
+        import xsolla_api, rate_budget
+        if get_config("xsolla_rate"):
+            xsolla_api.XSOLLA_API_CALL_DELAY = 1 / float(get_config("xsolla_rate"))
+        if get_config("rate_budget_dir"):
+            rate_budget.configure(get_config("rate_budget_dir"))
+
+    # Buffer the game and bundle updates and write each SKU once every write_behind_interval seconds,
+    # merging the updates it got meanwhile. What is left is written on exit
+    if get_config("write_behind_interval"):
+        import xsolla_api, write_behind
+        xsolla_api.WRITE_BEHIND_AUTO = (4, float(get_config("write_behind_interval")))
+        atexit.register(write_behind.stop_all)
+
+    # Optional transport of the Xsolla API: transport = httpx or http2 (needs httpx), compress_requests = 1
+    if get_config("transport") or get_config("compress_requests") == "1":
+        import http_transport
+        http_transport.configure(get_config("transport") or "requests", get_config("compress_requests") == "1")
+
+    JOBS = JobRunner(max_workers=int(get_config("max_jobs") or 3), on_change=jobs_changed)
+    JOBS_PANEL = ft.Column(spacing=0)
+    threading.Thread(target=jobs_panel_loop, daemon=True).start()
+
     page.fonts = { "DroidSansMono": "/fonts/DroidSansMono.ttf" }
     page.title = "Xsolla Tools"
     page.vertical_alignment = ft.MainAxisAlignment.START
@@ -336,129 +563,299 @@ def main(page: ft.Page):
     project_id_field = ft.TextField(label="Xsolla Project ID")
     rail = None
 
-    import_from_steam_column = ft.Column([
-        ft.Text("Import game from Steam", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Quickly imports a Steam game as a SKU onto a Xsolla PA project", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        api_key_field,
-        project_id_field,
-        ft.Row([
-            ft.TextField(label="Steam App IDs (separated by comma)"),
-            ft.Button(text="Import", on_click=lambda e: import_from_steam_button_click(page, import_from_steam_column, rail))
-        ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    delete_game_column = ft.Column([
-        ft.Text("Delete SKU", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Deletes one or more SKUs from a specific project. Please ensure that all keys have been removed before deleting it.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        api_key_field,
-        project_id_field,
-        ft.Row([            
-            ft.TextField(label="Xsolla Game SKUs (separated by comma)"),
-            ft.Button(text="Delete", on_click=lambda e: delete_game_button_click(page, delete_game_column, rail))
-        ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    update_prices_column = ft.Column([
-        ft.Text("Update prices from Steam", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Applies new prices to a SKU based on its pricing on Steam.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        api_key_field,
-        project_id_field,
-        ft.Row([
-            ft.TextField(label="Game SKU"),
-            ft.TextField(label="Steam App ID"),        
-            ft.Button(text="Update", on_click=lambda e: update_prices_button_click(update_prices_column, rail))
-        ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    import_export_gamedata_csv_column = ft.Column([
-        ft.Text("Import/export gamekey prices CSV", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Allows you to quickly export the pricing for all gamekeys of a specific project to a CSV, and then import that data back into PA. Somewhat compatible with Steam price export sheets.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        api_key_field,
-        project_id_field,
-        ft.Row([
-            ft.Button(text="Export gamekey prices to CSV", on_click=lambda e: export_to_csv_button_click(page, import_export_gamedata_csv_column, rail), expand=1),
-            ft.Button(text="Import gamekey prices from CSV", on_click=lambda e: import_from_csv_button_click(page, import_export_gamedata_csv_column, rail), expand=1)
-        ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-
-    publish_launcher_game_folder_field = ft.TextField(label="Game folder path", disabled=True, expand=3)
-    publish_launcher_build_loader_field = ft.TextField(label="build_loader.exe path", disabled=True, expand=3)
-    publish_launcher_build_loader_field.value = get_config("build_loader")
-    def publish_launcher_game_folder_file_picker_on_result(e: ft.FilePickerResultEvent) -> None:
-        publish_launcher_game_folder_field.value = e.path
-        publish_launcher_game_folder_field.update()
-    def publish_launcher_build_loader_file_picker_on_result(e: ft.FilePickerResultEvent) -> None:
-        if e.files:
-            set_config("build_loader", e.files[0].path)
-            publish_launcher_build_loader_field.value = e.files[0].path
-            publish_launcher_build_loader_field.update()
-    publish_launcher_game_folder_file_picker = ft.FilePicker(on_result=publish_launcher_game_folder_file_picker_on_result)
-    publish_launcher_build_loader_file_picker = ft.FilePicker(on_result=publish_launcher_build_loader_file_picker_on_result)
-    page.overlay.append(publish_launcher_game_folder_file_picker)
-    page.overlay.append(publish_launcher_build_loader_file_picker)
-    
-    publish_launcher_build_column = ft.Column([
-        ft.Text("Publish build on Launcher", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Provides a graphical interface for the build_loader.exe utility, publishing new builds on Launcher.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+    def build_import_from_steam_column() -> ft.Column:
+        import_from_steam_column = ft.Column([
+            ft.Text("Import game from Steam", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Quickly imports a Steam game as a SKU onto a Xsolla PA project", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([
+                ft.TextField(label="Steam App IDs or names (separated by comma)"),
+                ft.Button(text="Import", on_click=lambda e: import_from_steam_button_click(page, import_from_steam_column, rail))
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return import_from_steam_column
+
+    def build_delete_game_column() -> ft.Column:
+        delete_game_column = ft.Column([
+            ft.Text("Delete SKU", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Deletes one or more SKUs from a specific project. Please ensure that all keys have been removed before deleting it.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([            
+                ft.TextField(label="Xsolla Game SKUs or patterns such as retired_* (separated by comma)"),
+                ft.Button(text="Delete", on_click=lambda e: delete_game_button_click(page, delete_game_column, rail))
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return delete_game_column
+
+    def build_update_prices_column() -> ft.Column:
+        update_prices_column = ft.Column([
+            ft.Text("Update prices from Steam", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Applies new prices to a SKU based on its pricing on Steam.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([
+                ft.TextField(label="Game SKU"),
+                ft.TextField(label="Steam App ID"),        
+                ft.Button(text="Update", on_click=lambda e: update_prices_button_click(update_prices_column, rail))
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return update_prices_column
+
+    def build_import_export_gamedata_csv_column() -> ft.Column:
+        import_export_gamedata_csv_column = ft.Column([
+            ft.Text("Import/export gamekey prices CSV", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Allows you to quickly export the pricing for all gamekeys of a specific project to a CSV, and then import that data back into PA. Somewhat compatible with Steam price export sheets.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([
+                ft.Button(text="Export gamekey prices to CSV", on_click=lambda e: export_to_csv_button_click(page, import_export_gamedata_csv_column, rail), expand=1),
+                ft.Button(text="Import gamekey prices from CSV", on_click=lambda e: import_from_csv_button_click(page, import_export_gamedata_csv_column, rail), expand=1)
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return import_export_gamedata_csv_column
+
+
+    def build_publish_launcher_build_column() -> ft.Column:
+        publish_launcher_game_folder_field = ft.TextField(label="Game folder path", disabled=True, expand=3)
+        publish_launcher_build_loader_field = ft.TextField(label="build_loader.exe path", disabled=True, expand=3)
+        publish_launcher_build_loader_field.value = get_config("build_loader")
+        def publish_launcher_game_folder_file_picker_on_result(e: ft.FilePickerResultEvent) -> None:
+            publish_launcher_game_folder_field.value = e.path
+            publish_launcher_game_folder_field.update()
+        def publish_launcher_build_loader_file_picker_on_result(e: ft.FilePickerResultEvent) -> None:
+            if e.files:
+                set_config("build_loader", e.files[0].path)
+                publish_launcher_build_loader_field.value = e.files[0].path
+                publish_launcher_build_loader_field.update()
+        publish_launcher_game_folder_file_picker = ft.FilePicker(on_result=publish_launcher_game_folder_file_picker_on_result)
+        publish_launcher_build_loader_file_picker = ft.FilePicker(on_result=publish_launcher_build_loader_file_picker_on_result)
+        page.overlay.append(publish_launcher_game_folder_file_picker)
+        page.overlay.append(publish_launcher_build_loader_file_picker)
+        page.update()
         
-        ft.TextField(label="Launcher API Key", password=True, can_reveal_password=True),
-        ft.Row([
-            publish_launcher_game_folder_field,
-            ft.Button(text="Browse...", expand=1, on_click=lambda e: publish_launcher_game_folder_file_picker.get_directory_path(dialog_title="Select the directory where the game build is located...")),
-            publish_launcher_build_loader_field,
-            ft.Button(text="Browse...", expand=1, on_click=lambda e: publish_launcher_build_loader_file_picker.pick_files(dialog_title="Select the location of the build_loader.exe executable...", allow_multiple=False))
-        ]),
-        ft.Row([
-            ft.TextField(label="Build description", expand=3),
-            ft.Dropdown(editable=True, label="Set build as...", options=[
-                ft.DropdownOption(key="", text="(None)"),
-                ft.DropdownOption(key="draft", text="Draft"),
-                ft.DropdownOption(key="published", text="Published")
-            ], expand=3),
-            ft.Button(text="Upload build", on_click=lambda e: publish_launcher_build_button_click(page, publish_launcher_build_column, rail), expand=1)
-        ]),
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    generate_keys_column = ft.Column([
-        ft.Text("Generate Launcher keys", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Generates random Launcher keys for DRM-free SKUs.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        ft.Row([            
-            ft.TextField(label="Number of keys"),
-            ft.Button(text="Generate", on_click=lambda e: generate_keys_button_click(page, generate_keys_column, rail))
-        ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    recalculate_bundle_column = ft.Column([
-        ft.Text("Recalculate bundle prices", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Calculates bundle pricing as the sum of the prices of the items included in it. Pricing is provided for a certain currency only if all included items also provide individual prices for said currency.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        api_key_field,
-        project_id_field,
-        ft.Row([            
-            ft.TextField(label="Bundle SKUs (separated by comma)"),
-            ft.TextField(label="Discount (in %)", value="0"),
-            ft.Button(text="Recalculate", on_click=lambda e: recalculate_bundle_button_click(page, recalculate_bundle_column, rail))
+        publish_launcher_build_column = ft.Column([
+            ft.Text("Publish build on Launcher", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Provides a graphical interface for the build_loader.exe utility, publishing new builds on Launcher.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            
+            ft.TextField(label="Launcher API Key", password=True, can_reveal_password=True),
+            ft.Row([
+                publish_launcher_game_folder_field,
+                ft.Button(text="Browse...", expand=1, on_click=lambda e: publish_launcher_game_folder_file_picker.get_directory_path(dialog_title="Select the directory where the game build is located...")),
+                publish_launcher_build_loader_field,
+                ft.Button(text="Browse...", expand=1, on_click=lambda e: publish_launcher_build_loader_file_picker.pick_files(dialog_title="Select the location of the build_loader.exe executable...", allow_multiple=False))
+            ]),
+            ft.Row([
+                ft.TextField(label="Build description", expand=3),
+                ft.Dropdown(editable=True, label="Set build as...", options=[
+                    ft.DropdownOption(key="", text="(None)"),
+                    ft.DropdownOption(key="draft", text="Draft"),
+                    ft.DropdownOption(key="published", text="Published")
+                ], expand=3),
+                ft.Button(text="Upload build", on_click=lambda e: publish_launcher_build_button_click(page, publish_launcher_build_column, rail), expand=1)
+            ]),
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return publish_launcher_build_column
+
+    def build_generate_keys_column() -> ft.Column:
+        generate_keys_column = ft.Column([
+            ft.Text("Generate Launcher keys", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Generates random Launcher keys for DRM-free SKUs. Every batch is checked against and added to the local key registry, so a key is never issued twice.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            ft.Row([            
+                ft.TextField(label="Number of keys"),
+                ft.Button(text="Generate", on_click=lambda e: generate_keys_button_click(page, generate_keys_column, rail))
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return generate_keys_column
+
+    def build_recalculate_bundle_column() -> ft.Column:
+        recalculate_bundle_column = ft.Column([
+            ft.Text("Recalculate bundle prices", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Calculates bundle pricing as the sum of the prices of the items included in it. Pricing is provided for a certain currency only if all included items also provide individual prices for said currency. Simulate previews several discount tiers for the listed bundles (or all bundles if empty) without submitting anything.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([            
+                ft.TextField(label="Bundle SKUs (separated by comma)"),
+                ft.TextField(label="Discount (in %)", value="0"),
+                ft.Button(text="Recalculate", on_click=lambda e: recalculate_bundle_button_click(page, recalculate_bundle_column, rail))
+            ]),
+            ft.Row([
+                ft.TextField(label="Discount tiers to simulate (in %, separated by comma)", value="15,20,25"),
+                ft.Button(text="Simulate", on_click=lambda e: simulate_bundle_discounts_button_click(recalculate_bundle_column, rail))
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return recalculate_bundle_column
+
+    def build_catalog_browser_column() -> ft.Column:
+        from catalog_index import CatalogIndex
+        index = CatalogIndex()
+        selected = set()
+        state = {"offset": 0, "results": [], "last_refresh": 0}
+
+        status_text = ft.Text()
+        rows_view = ft.ListView(expand=True, spacing=0)
+        search_field = ft.TextField(label="Filter by SKU or name", expand=3, on_change=lambda e: refresh(reset_offset=True))
+        type_dropdown = ft.Dropdown(label="Type", value="", expand=1, on_change=lambda e: refresh(reset_offset=True), options=[
+            ft.DropdownOption(key="", text="All"),
+            ft.DropdownOption(key="game", text="Game"),
+            ft.DropdownOption(key="bundle", text="Bundle"),
+            ft.DropdownOption(key="virtual_item", text="Virtual item")
         ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    generate_qrcode_column = ft.Column([
-        ft.Text("Generate QR Codes for PayStation", theme_style=ft.TextThemeStyle.TITLE_LARGE),
-        ft.Text("Generates QR Codes that can be published on social media or printed at events, sending users directly to a checkout page for a game key. Only works with game keys since they don't require Login.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
-        ft.Row([
-            ft.TextField(label="Project ID", expand=3),
-            ft.TextField(label="Game key SKU", expand=3),
-            ft.Dropdown(editable=True, label="SKU Type", options=[
-                ft.DropdownOption(key="game", text="Game"),
-                ft.DropdownOption(key="bundle", text="Bundle")
-            ], expand=3),
-            ft.Button(text="Generate", on_click=lambda e: generate_qrcode_button_click(page, generate_qrcode_column, rail), expand=1)
+        sort_dropdown = ft.Dropdown(label="Sort by", value="sku", expand=1, on_change=lambda e: refresh(reset_offset=True), options=[
+            ft.DropdownOption(key="sku", text="SKU"),
+            ft.DropdownOption(key="name", text="Name"),
+            ft.DropdownOption(key="type", text="Type"),
+            ft.DropdownOption(key="price", text="Default price")
         ])
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
-
-    test_terminal_column = ft.Column([
-        ft.Text("Delete game"),
-        ft.Button(text="Test Terminal", on_click=lambda e: print("This is https://Zombo.com"))
-    ], expand=True, alignment=ft.MainAxisAlignment.START)
+        discount_field = ft.TextField(label="Discount (in %)", value="0", expand=1)
+
+        def update_status() -> None:
+            results = state["results"]
+            offset = state["offset"]
+            shown = f"showing {offset + 1}-{min(offset + CATALOG_ROWS_PER_PAGE, len(results))}" if results else "nothing to show"
+            status_text.value = f"{len(results)} of {len(index)} items match, {shown}. {len(selected)} selected."
+
+        def toggle(sku: str, value: bool) -> None:
+            if value:
+                selected.add(sku)
+            else:
+                selected.discard(sku)
+            update_status()
+            status_text.update()
+
+        def build_row(entry) -> ft.Row:
+            price = f"{entry.price[0]} {entry.price[1]}" if entry.price else ""
+            return ft.Row([
+                ft.Checkbox(value=entry.sku in selected, on_change=lambda e: toggle(entry.sku, e.control.value)),
+                ft.Text(entry.type, width=100),
+                ft.Text(entry.sku, expand=2, selectable=True),
+                ft.Text(entry.name, expand=3),
+                ft.Text(price, width=110)
+            ])
+
+        def refresh(reset_offset: bool = False) -> None:
+            if reset_offset:
+                state["offset"] = 0
+            results = index.query(search_field.value or "", type_dropdown.value or None, sort_dropdown.value or "sku")
+            state["results"] = results
+            state["offset"] = max(0, min(state["offset"], (len(results) - 1) // CATALOG_ROWS_PER_PAGE * CATALOG_ROWS_PER_PAGE))
+            # Only the rows of the current window are turned into controls
+            window = results[state["offset"]:state["offset"] + CATALOG_ROWS_PER_PAGE]
+            rows_view.controls = [build_row(e) for e in window]
+            update_status()
+            if catalog_browser_column.page is not None:
+                catalog_browser_column.update()
+
+        def on_page_loaded(final: bool) -> None:
+            # Pages can arrive faster than it makes sense to redraw
+            now = time.monotonic()
+            if final or now - state["last_refresh"] > 0.5:
+                state["last_refresh"] = now
+                refresh()
+
+        def move(delta: int) -> None:
+            state["offset"] = max(0, state["offset"] + delta * CATALOG_ROWS_PER_PAGE)
+            refresh()
+
+        def select_all(value: bool) -> None:
+            if value:
+                selected.update(e.sku for e in state["results"])
+            else:
+                selected.clear()
+            refresh()
+
+        def selected_entries(type: str) -> list:
+            return [e for e in index.snapshot() if e.sku in selected and e.type == type]
+
+        def load_click() -> None:
+            selected.clear()
+            submit_job(f"Load catalog of project {project_id_field.value}", load_catalog_job, api_key_field.value, project_id_field.value, index, on_page_loaded)
+
+        def delete_click() -> None:
+            skus = [e.sku for e in selected_entries("game")]
+            if not skus:
+                print("Select at least one game SKU to delete.")
+                return
+            confirm_and_submit(page, f"Do you want to delete {len(skus)} SKUs?", f"Delete {len(skus)} SKUs",
+                               delete_game_job, api_key_field.value, project_id_field.value, skus)
+
+        def update_prices_click() -> None:
+            games = selected_entries("game")
+            pairs = [(e.sku, e.steam_appid) for e in games if e.steam_appid]
+            if len(pairs) < len(games):
+                print(f"{len(games) - len(pairs)} selected SKUs don't start with a Steam App ID and will be skipped.")
+            if not pairs:
+                return
+            confirm_and_submit(page, f"Do you want to update prices of {len(pairs)} SKUs from Steam?", f"Update prices of {len(pairs)} SKUs",
+                               update_prices_job, api_key_field.value, project_id_field.value, pairs)
+
+        def recalculate_click() -> None:
+            skus = [e.sku for e in selected_entries("bundle")]
+            try:
+                discount = float(discount_field.value)
+                if discount > 99 or discount < 0:
+                    raise Exception()
+                discount = discount / 100
+            except:
+                print("Invalid discount value. Please insert a real number from 0 to 100.")
+                return
+            if not skus:
+                print("Select at least one bundle to recalculate.")
+                return
+            confirm_and_submit(page, f"Do you want to recalculate prices for {len(skus)} bundles?", f"Recalculate {len(skus)} bundles",
+                               recalculate_bundle_job, api_key_field.value, project_id_field.value, skus, discount)
+
+        catalog_browser_column = ft.Column([
+            ft.Text("Browse catalog", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Loads the game keys, bundles and virtual items of a project in the background. Filter and sort locally, then act on the selected SKUs.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            api_key_field,
+            project_id_field,
+            ft.Row([
+                ft.Button(text="Load catalog", on_click=lambda e: load_click()),
+                search_field,
+                type_dropdown,
+                sort_dropdown
+            ]),
+            ft.Row([
+                status_text,
+                ft.TextButton("Select all", on_click=lambda e: select_all(True)),
+                ft.TextButton("Clear selection", on_click=lambda e: select_all(False)),
+                ft.IconButton(icon=ft.Icons.CHEVRON_LEFT, on_click=lambda e: move(-1)),
+                ft.IconButton(icon=ft.Icons.CHEVRON_RIGHT, on_click=lambda e: move(1))
+            ]),
+            ft.Container(rows_view, height=360),
+            ft.Row([
+                ft.Button(text="Delete selected", on_click=lambda e: delete_click(), expand=1),
+                ft.Button(text="Update prices from Steam", on_click=lambda e: update_prices_click(), expand=1),
+                discount_field,
+                ft.Button(text="Recalculate bundles", on_click=lambda e: recalculate_click(), expand=1)
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        update_status()
+        return catalog_browser_column
+
+    def build_generate_qrcode_column() -> ft.Column:
+        generate_qrcode_column = ft.Column([
+            ft.Text("Generate QR Codes for PayStation", theme_style=ft.TextThemeStyle.TITLE_LARGE),
+            ft.Text("Generates QR Codes that can be published on social media or printed at events, sending users directly to a checkout page for a game key. Only works with game keys since they don't require Login.", theme_style=ft.TextThemeStyle.LABEL_LARGE),
+            ft.Row([
+                ft.TextField(label="Project ID", expand=3),
+                ft.TextField(label="Game key SKUs (separated by comma)", expand=3),
+                ft.Dropdown(editable=True, label="SKU Type", options=[
+                    ft.DropdownOption(key="game", text="Game"),
+                    ft.DropdownOption(key="bundle", text="Bundle")
+                ], expand=3),
+                ft.Button(text="Generate", on_click=lambda e: generate_qrcode_button_click(page, generate_qrcode_column, rail), expand=1)
+            ])
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
+        return generate_qrcode_column
+
+    def build_test_terminal_column() -> ft.Column:
+        return ft.Column([
+            ft.Text("Delete game"),
+            ft.Button(text="Test Terminal", on_click=lambda e: print("This is https://Zombo.com"))
+        ], expand=True, alignment=ft.MainAxisAlignment.START)
 
     rail = ft.NavigationRail(
         selected_index=0,
@@ -470,61 +867,67 @@ def main(page: ft.Page):
                 icon=ft.Icons.IMPORT_EXPORT,
                 selected_icon=ft.Icons.IMPORT_EXPORT_OUTLINED,
                 label="Import game from Steam",
-                data=import_from_steam_column
+                data=build_import_from_steam_column
+            ),
+            ft.NavigationRailDestination(
+                icon=ft.Icons.LIST_ALT,
+                selected_icon=ft.Icons.LIST_ALT_OUTLINED,
+                label="Browse catalog",
+                data=build_catalog_browser_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.PRICE_CHANGE,
                 selected_icon=ft.Icons.PRICE_CHANGE_OUTLINED,
                 label="Update prices from Steam",
-                data=update_prices_column
+                data=build_update_prices_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.BACKUP_TABLE,
                 selected_icon=ft.Icons.BACKUP_TABLE_OUTLINED,
                 label="Import/export prices from CSV",
-                data=import_export_gamedata_csv_column
+                data=build_import_export_gamedata_csv_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.DELETE,
                 selected_icon=ft.Icons.DELETE_OUTLINED,
                 label="Delete SKU",
-                data=delete_game_column
+                data=build_delete_game_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.CALCULATE,
                 selected_icon=ft.Icons.CALCULATE_OUTLINED,
                 label="Calculate bundle prices",
-                data=recalculate_bundle_column
+                data=build_recalculate_bundle_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.ROCKET_LAUNCH,
                 selected_icon=ft.Icons.ROCKET_LAUNCH_OUTLINED,
                 label="Submit Launcher build",
-                data=publish_launcher_build_column
+                data=build_publish_launcher_build_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.VPN_KEY,
                 selected_icon=ft.Icons.VPN_KEY_OUTLINED,
                 label="Generate Launcher gamekeys",
-                data=generate_keys_column
+                data=build_generate_keys_column
             ),
             ft.NavigationRailDestination(
                 icon=ft.Icons.QR_CODE,
                 selected_icon=ft.Icons.QR_CODE,
                 label="Generate PayStation QR",
-                data=generate_qrcode_column
+                data=build_generate_qrcode_column
             ),
             # ft.NavigationRailDestination(
             #     icon=ft.Icons.VPN_KEY,
             #     selected_icon=ft.Icons.VPN_KEY_OUTLINED,
             #     label="Test terminal",
-            #     data=test_terminal_column
+            #     data=build_test_terminal_column
             # ),
         ],
         on_change=lambda e: activate_page(input_column, e.control),
     )
 
-    input_column = ft.Column([ import_from_steam_column ], alignment=ft.MainAxisAlignment.START)
+    input_column = ft.Column([ get_page(build_import_from_steam_column) ], alignment=ft.MainAxisAlignment.START)
 
     page.add(ft.Row([
         rail,
@@ -532,9 +935,13 @@ def main(page: ft.Page):
         ft.Column([
             input_column,
             ft.Divider(),
+            JOBS_PANEL,
             ft.Container(TERMINAL, bgcolor="black", padding=10, border_radius=10, expand=True, alignment=ft.alignment.top_left)
         ], expand=True)
     ], expand=True))
 
+    # Warm up the core module once the window is on screen, so the first click doesn't pay for it
+    threading.Thread(target=tools, daemon=True).start()
+
 if __name__ == "__main__":
     ft.app(main, assets_dir="assets")
\ No newline at end of file